@@ -1,6 +1,59 @@
-from .cafe_io import CafeIO
-from .cafe_order_handler import CafeOrderHandler
-from .cafe_protocol_client import CafeProtocolClient, CafeClientError, CafeServerError
-from .cafe_protocol_server import CafeProtocolServer
-from .cafe_service import CafeService
+import importlib
 
+# The public names of the package, by the module that defines them. A module is
+# imported when one of its names is first used (PEP 562), so a program that
+# uses only a client or only a server doesn't pay to import the other, nor
+# asyncio, http.server and the rest of their dependencies.
+_MODULES = {
+    "async_cafe_io": ("AsyncCafeIO",),
+    "async_cafe_protocol_client": ("AsyncCafeProtocolClient",),
+    "async_cafe_server": ("AsyncCafeServer", "run_async_server"),
+    "cafe_client_pool": ("CafeClientPool",),
+    "cafe_codec": ("CafeCodec", "TextCafeCodec", "BinaryCafeCodec"),
+    "cafe_connection": ("CafeConnection", "CafeServerConnection", "CafeClientConnection", "NEED_DATA"),
+    "cafe_io": ("CafeIO",),
+    "cafe_limits": ("CafeLimits", "TokenBucket"),
+    "cafe_menu": ("CafeMenu", "CafeMenuItem"),
+    "cafe_menu_cache": ("CafeMenuCache",),
+    "cafe_metrics": ("CafeMetrics",),
+    "cafe_order": ("CafeOrder",),
+    "cafe_order_handler": ("CafeOrderHandler",),
+    "cafe_pricing": ("ComboRule", "QuantityDiscount", "PricingTable", "RunningTotal"),
+    "cafe_protocol_client": ("CafeProtocolClient", "CafePipeline"),
+    "cafe_protocol_server": ("CafeProtocolServer",),
+    "cafe_response_decoder": ("CafeResponseDecoder", "CafeClientError", "CafeServerError"),
+    "cafe_service": ("CafeService",),
+    "cafe_service_router": ("CafeServiceRouter",),
+    "cafe_session": ("CafeSession",),
+    "cafe_session_store": ("CafeSessionStore", "SqliteCafeSessionStore"),
+    "fulfillment_queue": ("FulfillmentQueue",),
+    "fulfillment_sink": ("FulfillmentOrder", "FulfillmentSink", "PrintFulfillmentSink", "FileFulfillmentSink",
+                         "SocketFulfillmentSink", "SqliteFulfillmentSink"),
+    "order_journal": ("OrderJournal",),
+    "order_number_allocator": ("OrderNumberAllocator", "LocalOrderNumberAllocator", "SharedOrderNumberAllocator",
+                               "SnowflakeOrderNumberAllocator", "BlockOrderNumberAllocator"),
+    "prefork_cafe_server": ("PreforkCafeServer",),
+    "socket_cafe_io": ("SocketCafeIO",),
+    "threaded_cafe_server": ("ThreadedCafeServer", "serve_connection"),
+    "traffic_capture": ("TrafficRecorder", "RecordingCafeIO", "CapturedSession", "CapturedExchange",
+                        "read_capture"),
+    "worker_launcher": ("WarmWorkerLauncher",),
+}
+
+_EXPORTS = {name: module for module, names in _MODULES.items() for name in names}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name: str):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{module}", __name__), name)
+    # later lookups find the name without calling this function
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> list[str]:
+    return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,156 @@
+import asyncio
+
+from .cafe_codec import CafeCodec
+from .cafe_connection import CafeConnection
+from .cafe_limits import MAX_MESSAGE_SIZE
+
+
+class AsyncCafeIO:
+    """
+    A communication channel over asyncio streams. It has the same writing interface
+    as `CafeIO`, so it can be given to the protocol interpreters, but reading is a
+    coroutine and must be awaited by the caller.
+
+    Framing and buffering are done by a `CafeConnection`, so this class only moves
+    bytes between it and the streams. Output is handed to the stream transport in
+    one piece when `flush` is called. Callers should await `drain` after each
+    flush so that a peer that isn't reading exerts backpressure rather than
+    growing the transport's buffer without limit.
+
+    Messages are framed as lines of text unless another `CafeCodec` is selected
+    with `set_codec`.
+    """
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter,
+                 encoding: str = "utf-8", max_message_size: int = MAX_MESSAGE_SIZE):
+        """
+        Initializes this channel.
+        :param reader: the stream from which messages are read
+        :param writer: the stream to which messages are written
+        :param encoding: the character encoding used for lines of text
+        :param max_message_size: the maximum size in bytes of a received message;
+            no limit if None
+        """
+        self._reader = reader
+        self._writer = writer
+        self._connection = CafeConnection(encoding, max_message_size)
+
+    @classmethod
+    async def connect(cls, host: str, port: int) -> "AsyncCafeIO":
+        """
+        Opens a client connection to a Cafe server.
+        :param host: host name or address of the server
+        :param port: TCP port on which the server is listening
+        :return: a channel for the new connection
+        """
+        reader, writer = await asyncio.open_connection(host, port)
+        return cls(reader, writer)
+
+    @property
+    def codec(self) -> CafeCodec:
+        """
+        Gets the codec used to frame messages.
+        :return: the current codec
+        """
+        return self._connection.codec
+
+    def set_codec(self, codec: CafeCodec):
+        """
+        Selects the codec used to frame messages from now on. Output already
+        written is unaffected, and input that is already buffered is decoded
+        using the new codec.
+        :param codec: the codec to use
+        :return: None
+        """
+        self._connection.set_codec(codec)
+
+    @property
+    def bytes_received(self) -> int:
+        """
+        Gets the number of bytes received on this channel so far.
+        :return: number of bytes
+        """
+        return self._connection.bytes_received
+
+    @property
+    def bytes_sent(self) -> int:
+        """
+        Gets the number of bytes sent on this channel so far.
+        :return: number of bytes
+        """
+        return self._connection.bytes_sent
+
+    async def read_string(self) -> str:
+        """
+        Reads a non-empty message from the stream.
+        :return: a non-empty string with leading and trailing whitespace removed
+        :raises EOFError: if the peer closes the connection
+        :raises ValueError: if a message exceeds the maximum message size
+        """
+        connection = self._connection
+        s = connection.next_message()
+        while s is None:
+            connection.receive_data(await self._reader.read(65536))
+            s = connection.next_message()
+        return s
+
+    def write_string(self, s: str):
+        """
+        Writes the given string to the write buffer as a message.
+        :param s: is the string to write; must consist only of printing characters
+        :return: None
+        :raises: ValueError if `s` is None or an empty string
+        """
+        self._connection.write_string(s)
+
+    def block_key(self) -> object:
+        """
+        Identifies how this channel encodes blocks of lines.
+        :return: a hashable key
+        """
+        return self._connection.block_key()
+
+    def encode_block(self, lines: list[str]) -> bytes:
+        """
+        Encodes a block of lines for later output by `write_block`.
+        :param lines: the lines of the block
+        :return: the encoded block
+        """
+        return self._connection.encode_block(lines)
+
+    def write_block(self, block: bytes):
+        """
+        Writes a block of lines encoded by `encode_block`.
+        :param block: the encoded block
+        :return: None
+        """
+        self._connection.write_block(block)
+
+    def flush(self):
+        """
+        Hands the buffered output to the stream transport.
+        :return: None
+        """
+        self._connection.flush()
+        data = self._connection.data_to_send()
+        if data:
+            self._writer.write(data)
+
+    async def drain(self):
+        """
+        Waits until the stream transport's buffer is below its high-water mark.
+        :return: None
+        """
+        await self._writer.drain()
+
+    async def close(self):
+        """
+        Flushes any buffered output and closes the stream.
+        :return: None
+        """
+        try:
+            self.flush()
+            self._writer.close()
+            await self._writer.wait_closed()
+        except ConnectionError:
+            pass
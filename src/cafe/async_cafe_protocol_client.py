@@ -0,0 +1,233 @@
+from typing import Generator
+
+from .async_cafe_io import AsyncCafeIO
+from .cafe_codec import CODECS
+from .cafe_connection import CafeClientConnection, NEED_DATA
+from .cafe_menu_cache import CafeMenuCache
+from .cafe_response_decoder import CafeClientError
+
+
+class AsyncCafeProtocolClient(CafeClientConnection):
+    """
+    An interpreter for the client side of the Sad Cafe protocol over asyncio
+    streams. It has the same methods as `CafeProtocolClient`, as coroutines, and
+    queues and decodes responses the same way, so one process can hold thousands
+    of concurrent conversations (e.g. to simulate customers for load testing).
+    """
+
+    def __init__(self, io: AsyncCafeIO, menu_cache: CafeMenuCache = None):
+        """
+        Initializes this instance of the protocol interpreter.
+        :param io: the I/O channel to use in receiving and sending protocol
+            messages to the server
+        :param menu_cache: a cache used by `send_menu_items_request`, which may
+            be shared with other clients; if not specified, the menu is fetched
+            from the server on every request
+        """
+        super().__init__(menu_cache, io=io)
+
+    @classmethod
+    async def connect(cls, host: str, port: int, menu_cache: CafeMenuCache = None) -> "AsyncCafeProtocolClient":
+        """
+        Opens a connection to a Cafe server, and creates a client for it.
+        :param host: host name or address of the server
+        :param port: TCP port on which the server is listening
+        :param menu_cache: a menu cache, which may be shared with other clients
+        :return: a client for the new connection
+        """
+        return cls(await AsyncCafeIO.connect(host, port), menu_cache)
+
+    async def close(self):
+        """
+        Closes the client's connection.
+        :return: None
+        """
+        await self._io.close()
+
+    async def _receive_response(self):
+        """
+        Reads messages from the channel until the response to the oldest request
+        awaiting one has been decoded.
+        :return: the decoded response
+        :raises CafeClientError: if the server's response is ERROR
+        :raises CafeServerError: if the server's response is unrecognized
+        """
+        result = NEED_DATA
+        while result is NEED_DATA:
+            result = self.receive_message(await self._io.read_string())
+        return result
+
+    async def _call(self, request: str, decoder: Generator):
+        """
+        Sends a request message to the server, waits until the stream has room for
+        more output, and reads the response.
+        :param request: the complete request message
+        :param decoder: a newly created decoder for the response (e.g. from `_decode_response`)
+        :return: the decoded response
+        :raises CafeClientError: if the server's response is ERROR
+        :raises CafeServerError: if the server's response is unrecognized
+        """
+        self.send_request(request, decoder)
+        await self._io.drain()
+        return await self._receive_response()
+
+    async def negotiate_codec(self, name: str = "BINARY") -> bool:
+        """
+        Asks the server to switch to another codec for the rest of the conversation.
+        This should be done at the start of the conversation. If the server doesn't
+        support the codec, the conversation continues using text.
+        :param name: the name of the codec (e.g. BINARY)
+        :return: True if the codec is now in use
+        :raises CafeServerError: if the server response is invalid
+        """
+        codec = CODECS.get(name.upper())
+        if codec is None:
+            return False
+        try:
+            await self._call(f"CODEC {codec.name}", self._decode_response())
+        except CafeClientError:
+            return False
+        self._io.set_codec(codec)
+        return True
+
+    async def send_menu_items_request(self) -> list[tuple[int, str]]:
+        """
+        Sends a request for the available menu items. If this client has a menu
+        cache, a fresh cached menu is returned without sending a request, and
+        otherwise the request is conditional, so that the server only sends the
+        menu if it differs from the cached version.
+        :return: list of tuples, each containing an item number and string label
+        :raises CafeClientError: if the server response is ERROR
+        :raises CafeServerError: if the server response is invalid
+        """
+        if self._menu_cache is None:
+            return await self._call("LIST MENU", self._decode_list_response())
+        items = self._menu_cache.fresh_items(self._location)
+        if items is not None:
+            return list(items)
+        return await self._call(f"LIST MENU IF-NOT {self._menu_cache.version_at(self._location)}",
+                                self._decode_menu_response())
+
+    async def send_order_items_request(self) -> list[tuple[int, int, int]]:
+        """
+        Sends a request for the items in the client's order.
+        :return: list of tuples, each containing a line index, a menu item ID and
+            the quantity ordered
+        :raises CafeClientError: if the server response is ERROR
+        :raises CafeServerError: if the server response is invalid
+        """
+        return await self._call("LIST ORDER", self._decode_order_response())
+
+    async def send_add_item_request(self, item_number: int):
+        """
+        Sends a request to add an item to the order.
+        :param item_number: the menu item number to add
+        :return: None
+        :raises CafeClientError: if the server response is ERROR
+        :raises CafeServerError: if the server response is invalid
+        """
+        return await self._call(f"ADD {item_number}", self._decode_response())
+
+    async def send_remove_item_request(self, item_number: int):
+        """
+        Sends a request to remove one unit of an item from the order.
+        :param item_number: the index of the order line from which to remove a unit
+        :return: None
+        :raises CafeClientError: if the server response is ERROR
+        :raises CafeServerError: if the server response is invalid
+        """
+        return await self._call(f"REMOVE {item_number}", self._decode_response())
+
+    async def send_add_items_request(self, item_numbers: list[int]):
+        """
+        Sends a request to add several items to the order. The server adds either
+        all of the items or none of them.
+        :param item_numbers: the menu item numbers to add
+        :return: None
+        :raises ValueError: if `item_numbers` is empty
+        :raises CafeClientError: if the server response is ERROR
+        :raises CafeServerError: if the server response is invalid
+        """
+        if not item_numbers:
+            raise ValueError("no item numbers to add")
+        return await self._call(f"ADD {' '.join(str(n) for n in item_numbers)}", self._decode_response())
+
+    async def send_remove_items_request(self, item_numbers: list[int]):
+        """
+        Sends a request to remove several items from the order. The item numbers
+        are indices into the order as it was before the request. The server removes
+        either all of the items or none of them.
+        :param item_numbers: the indices of the item numbers to remove; no index
+            may appear more than once
+        :return: None
+        :raises ValueError: if `item_numbers` is empty
+        :raises CafeClientError: if the server response is ERROR
+        :raises CafeServerError: if the server response is invalid
+        """
+        if not item_numbers:
+            raise ValueError("no item numbers to remove")
+        return await self._call(f"REMOVE {' '.join(str(n) for n in item_numbers)}", self._decode_response())
+
+    async def send_commit_order_response(self, settlement_token: str) -> int:
+        """
+        Sends a request to commit the order.
+        :param settlement_token: some token that proves the customer paid for the order
+        :return: reference number for the order
+        :raises CafeClientError: if the server response is ERROR
+        :raises CafeServerError: if the server response is invalid
+        """
+        return await self._call(f"COMMIT {settlement_token}", self._decode_commit_response())
+
+    async def send_cancel_order_response(self):
+        """
+        Sends a request to cancel the order.
+        :return: None
+        :raises CafeClientError: if the server response is ERROR
+        :raises CafeServerError: if the server response is invalid
+        """
+        return await self._call("CANCEL", self._decode_cancel_response())
+
+    async def send_session_request(self) -> str:
+        """
+        Sends a request for a session token, with which the order in progress can
+        be resumed on a new connection if this one is interrupted.
+        :return: the session token
+        :raises CafeClientError: if the server response is ERROR (e.g. because the
+            server doesn't support resuming sessions)
+        :raises CafeServerError: if the server response is invalid
+        """
+        return await self._call("SESSION", self._decode_response())
+
+    async def send_resume_request(self, session_token: str):
+        """
+        Sends a request to resume an interrupted session, replacing the order on
+        this connection with the order in progress when it was interrupted.
+        :param session_token: the token obtained with `send_session_request`
+        :return: None
+        :raises CafeClientError: if the server response is ERROR (e.g. because the
+            session has expired)
+        :raises CafeServerError: if the server response is invalid
+        """
+        return await self._call(f"RESUME {session_token}", self._decode_response())
+
+    async def send_location_request(self, location: str):
+        """
+        Sends a request to place the order at another of the server's locations.
+        This must be done before any items are added to the order.
+        :param location: the name of the location
+        :return: None
+        :raises CafeClientError: if the server response is ERROR (e.g. because
+            there is no such location, or the order has already been started)
+        :raises CafeServerError: if the server response is invalid
+        """
+        return await self._call(f"LOCATION {location}", self._decode_location_response(location))
+
+    async def send_total_request(self) -> int:
+        """
+        Sends a request for the price of the order, after combos and discounts.
+        :return: the price in cents
+        :raises CafeClientError: if the server response is ERROR (e.g. because the
+            server doesn't price orders)
+        :raises CafeServerError: if the server response is invalid
+        """
+        return await self._call("TOTAL", self._decode_number_response())
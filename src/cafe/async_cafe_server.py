@@ -0,0 +1,211 @@
+import asyncio
+from typing import Callable
+
+from .cafe_connection import CafeServerConnection
+from .cafe_io import CafeIO
+from .cafe_limits import CafeLimits, MAX_MESSAGE_SIZE
+from .cafe_metrics import CafeMetrics
+from .cafe_session import CafeSession
+
+# the transport's high-water mark when the limits don't give one (asyncio's default)
+_DEFAULT_WRITE_HIGH_WATER = 65536
+
+
+class _CafeServerProtocol(asyncio.Protocol):
+    """
+    Moves bytes between an asyncio transport and the `CafeServerConnection` that
+    serves a client. While the transport's write buffer is above its high-water
+    mark, or the session has deferred a response, reading is paused and no more
+    requests are served; a deferred response is completed on the event loop.
+    """
+
+    def __init__(self, session_factory: Callable[[CafeIO], CafeSession], limits: CafeLimits,
+                 metrics: CafeMetrics):
+        self._session_factory = session_factory
+        self._limits = limits
+        self._metrics = metrics
+        self._high_water = limits.write_high_water or _DEFAULT_WRITE_HIGH_WATER
+        self._transport: asyncio.Transport = None
+        self._connection: CafeServerConnection = None
+        self._paused = False
+        self._waiting = False
+        self._idle_timer: asyncio.TimerHandle = None
+        self._write_timer: asyncio.TimerHandle = None
+
+    def connection_made(self, transport: asyncio.Transport):
+        self._transport = transport
+        transport.set_write_buffer_limits(high=self._high_water)
+        self._connection = CafeServerConnection(self._session_factory, self._limits)
+        if self._metrics is not None:
+            self._metrics.session_opened()
+        self._start_idle_timer()
+
+    def data_received(self, data: bytes):
+        self._connection.receive_data(data)
+        self._serve()
+
+    def eof_received(self) -> bool:
+        self._connection.receive_data(b"")
+        self._serve()
+        # the transport closes itself once the responses have been written
+        return False
+
+    def _serve(self):
+        connection = self._connection
+        transport = self._transport
+        served = False
+        while not self._paused and connection.serve_next_request():
+            served = True
+            if connection.output_size >= self._high_water:
+                transport.write(connection.data_to_send())
+        if connection.pending is not None and not self._waiting:
+            self._waiting = True
+            transport.pause_reading()
+            loop = asyncio.get_running_loop()
+            connection.pending.add_done_callback(lambda future: loop.call_soon_threadsafe(self._complete))
+        data = connection.data_to_send()
+        if data:
+            transport.write(data)
+        if connection.done:
+            transport.close()
+        elif served:
+            self._start_idle_timer()
+
+    def _complete(self):
+        self._waiting = False
+        self._connection.complete_pending()
+        if self._transport.is_closing():
+            return
+        if not self._paused:
+            self._transport.resume_reading()
+        self._serve()
+
+    def _start_idle_timer(self):
+        # the client must complete its next request within the idle timeout
+        if self._idle_timer is not None:
+            self._idle_timer.cancel()
+        if self._limits.idle_timeout is not None:
+            self._idle_timer = asyncio.get_running_loop().call_later(
+                self._limits.idle_timeout, self._transport.close)
+
+    def pause_writing(self):
+        self._paused = True
+        self._transport.pause_reading()
+        if self._limits.write_timeout is not None:
+            # closing would wait for the unsent output to be read
+            self._write_timer = asyncio.get_running_loop().call_later(
+                self._limits.write_timeout, self._transport.abort)
+
+    def resume_writing(self):
+        self._paused = False
+        if self._write_timer is not None:
+            self._write_timer.cancel()
+            self._write_timer = None
+        if not self._transport.is_closing():
+            if not self._waiting:
+                self._transport.resume_reading()
+            self._serve()
+
+    def connection_lost(self, exc: Exception):
+        for timer in (self._idle_timer, self._write_timer):
+            if timer is not None:
+                timer.cancel()
+        self._connection.close()
+        if self._metrics is not None:
+            io = self._connection.io
+            self._metrics.session_closed(io.bytes_received, io.bytes_sent)
+
+
+class AsyncCafeServer:
+    """
+    A server that holds many concurrent client sessions in a single thread using
+    asyncio. Each connection is served by an asyncio protocol that feeds the bytes
+    it receives to a `CafeServerConnection`, so a client that is slow to send
+    requests or to read responses only delays its own session. The protocol uses
+    only the transport interface, so it runs on any asyncio event loop (e.g. uvloop).
+
+    Memory per connection is bounded by the maximum message size and by pausing
+    while the transport's write buffer is above its high-water mark. Given
+    `CafeLimits`, the server also closes the connections of clients that take too
+    long to send a request or to read a response, and limits each session's
+    request rate.
+    """
+
+    def __init__(self, session_factory: Callable[[CafeIO], CafeSession],
+                 host: str = "", port: int = 0, max_message_size: int = MAX_MESSAGE_SIZE,
+                 metrics: CafeMetrics = None, limits: CafeLimits = None):
+        """
+        Initializes this server.
+        :param session_factory: called with the channel for each accepted
+            connection to create the session that will serve it
+        :param host: the address on which to listen; all interfaces if empty
+        :param port: the TCP port on which to listen; any free port if zero
+        :param max_message_size: the maximum size in bytes of a request message,
+            if not given `limits`
+        :param metrics: where to count sessions and the bytes transferred
+        :param limits: the limits placed on each session; if not specified, only
+            the size of a request message is limited
+        """
+        self._session_factory = session_factory
+        self._host = host
+        self._port = port
+        self._metrics = metrics
+        if limits is None:
+            limits = CafeLimits(idle_timeout=None, max_message_size=max_message_size,
+                                write_high_water=None, write_timeout=None)
+        self._limits = limits
+        self._server: asyncio.AbstractServer = None
+
+    @property
+    def port(self) -> int:
+        """
+        Gets the port on which the server is listening, once started.
+        :return: TCP port number
+        """
+        return self._server.sockets[0].getsockname()[1]
+
+    async def start(self):
+        """
+        Starts listening for connections.
+        :return: None
+        """
+        self._server = await asyncio.get_running_loop().create_server(
+            lambda: _CafeServerProtocol(self._session_factory, self._limits, self._metrics),
+            self._host or None, self._port)
+
+    async def serve_forever(self):
+        """
+        Starts the server if needed, and serves connections until canceled.
+        :return: None
+        """
+        if self._server is None:
+            await self.start()
+        await self._server.serve_forever()
+
+    async def close(self):
+        """
+        Stops listening for connections.
+        :return: None
+        """
+        self._server.close()
+        await self._server.wait_closed()
+
+
+def run_async_server(session_factory: Callable[[CafeIO], CafeSession],
+                     host: str = "", port: int = 0, metrics: CafeMetrics = None,
+                     limits: CafeLimits = None):
+    """
+    Runs an `AsyncCafeServer` in a new event loop until interrupted.
+    :param session_factory: called with the channel for each accepted
+        connection to create the session that will serve it
+    :param host: the address on which to listen; all interfaces if empty
+    :param port: the TCP port on which to listen
+    :param metrics: where to count sessions and the bytes transferred
+    :param limits: the limits placed on each session
+    :return: None
+    """
+    server = AsyncCafeServer(session_factory, host, port, metrics=metrics, limits=limits)
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,292 @@
+"""
+A load generator for measuring the throughput and latency of a Cafe server.
+
+Simulated customers each place orders in a loop, on a new connection per order:
+LIST MENU, a number of ADD requests for random menu items, then COMMIT. The
+latency of every request is recorded, and requests per second and latency
+percentiles are reported, overall and per request verb.
+
+The server to measure is started in a subprocess by the command given with
+`--server`, in which `{port}` stands for a free port on the loopback interface,
+e.g. for the demo server
+
+    PYTHONPATH=./src python3 -m cafe.bench --customers 200 --duration 10 \
+        --server "python3 -m demo --serve threaded --host 127.0.0.1 --port {port}"
+
+Use `--connect HOST:PORT` to drive a server that is already running instead,
+and `--json PATH` to also write the results as JSON, for comparing versions.
+"""
+import argparse
+import asyncio
+import json
+import random
+import shlex
+import signal
+import socket
+import subprocess
+import time
+
+from .async_cafe_protocol_client import AsyncCafeProtocolClient
+from .cafe_protocol_client import CafeClientError, CafeServerError
+
+# the latency percentiles reported
+PERCENTILES = (50.0, 99.0, 99.9)
+
+
+def percentile(sorted_values: list[float], p: float) -> float:
+    """
+    Computes a percentile of some values by the nearest-rank method.
+    :param sorted_values: the values, in ascending order
+    :param p: the percentile, from 0 to 100
+    :return: the smallest value that is at least `p` percent of the values
+        when they are ranked; zero if there are no values
+    """
+    if not sorted_values:
+        return 0.0
+    rank = max(1, -(-len(sorted_values) * p // 100))
+    return sorted_values[min(int(rank), len(sorted_values)) - 1]
+
+
+def summarize(latencies: dict[str, list[float]], errors: int, elapsed: float) -> dict:
+    """
+    Summarizes the latencies recorded in a run.
+    :param latencies: the latency in seconds of each request, by request verb
+    :param errors: the number of requests that failed
+    :param elapsed: the duration of the run in seconds
+    :return: a dictionary of results, which can be serialized as JSON; latencies
+        are in milliseconds
+    """
+    def stats(values: list[float]) -> dict:
+        values = sorted(values)
+        result = {"requests": len(values),
+                  "requests_per_sec": len(values) / elapsed if elapsed > 0 else 0.0}
+        for p in PERCENTILES:
+            result[f"p{p:g}_ms".replace(".", "")] = percentile(values, p) * 1000.0
+        return result
+
+    everything = [latency for values in latencies.values() for latency in values]
+    summary = stats(everything)
+    summary["errors"] = errors
+    summary["elapsed_sec"] = elapsed
+    summary["verbs"] = {verb: stats(values) for verb, values in sorted(latencies.items())}
+    return summary
+
+
+class LoadGenerator:
+    """
+    Drives a Cafe server with concurrent simulated customers, recording the
+    latency of each request.
+    """
+
+    def __init__(self, host: str, port: int, customers: int = 50, items_per_order: int = 3,
+                 codec: str = None, seed: int = None):
+        """
+        Initializes this load generator.
+        :param host: host name or address of the server
+        :param port: TCP port on which the server is listening
+        :param customers: the number of customers placing orders concurrently
+        :param items_per_order: the number of ADD requests in each order
+        :param codec: the name of a codec to negotiate on each connection (e.g.
+            BINARY); text is used if not specified
+        :param seed: seed for the random choice of menu items
+        """
+        self._host = host
+        self._port = port
+        self._customers = customers
+        self._items_per_order = items_per_order
+        self._codec = codec
+        self._random = random.Random(seed)
+        self.latencies: dict[str, list[float]] = {}
+        self.errors = 0
+        self.orders = 0
+
+    async def _timed(self, verb: str, request):
+        start = time.perf_counter()
+        try:
+            return await request
+        finally:
+            self.latencies.setdefault(verb, []).append(time.perf_counter() - start)
+
+    async def _place_order(self):
+        client = await AsyncCafeProtocolClient.connect(self._host, self._port)
+        try:
+            if self._codec:
+                await client.negotiate_codec(self._codec)
+            menu = await self._timed("LIST", client.send_menu_items_request())
+            if not menu and self._items_per_order:
+                # every order would fail the same way, so the run is stopped
+                raise ValueError("the server's menu is empty, so no orders can be placed")
+            for _ in range(self._items_per_order):
+                item_id, _ = self._random.choice(menu)
+                await self._timed("ADD", client.send_add_item_request(item_id))
+            await self._timed("COMMIT", client.send_commit_order_response("bench"))
+            self.orders += 1
+        finally:
+            await client.close()
+
+    async def _customer(self, deadline: float):
+        while time.monotonic() < deadline:
+            try:
+                await self._place_order()
+            except (CafeClientError, CafeServerError, OSError, EOFError):
+                self.errors += 1
+
+    async def run(self, duration: float) -> dict:
+        """
+        Runs the customers for a while, and summarizes the results.
+        :param duration: the number of seconds for which to start new orders
+        :return: the summary produced by `summarize`
+        :raises ValueError: if the server's menu is empty
+        """
+        start = time.monotonic()
+        await asyncio.gather(*(self._customer(start + duration) for _ in range(self._customers)))
+        summary = summarize(self.latencies, self.errors, time.monotonic() - start)
+        summary["orders"] = self.orders
+        return summary
+
+
+def free_port() -> int:
+    """
+    Finds a TCP port on the loopback interface that is free for a server.
+    :return: the port number
+    """
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _wait_for_server(port: int, process: subprocess.Popen, timeout: float = 10.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"server exited with status {process.returncode}")
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=1.0).close()
+            return
+        except OSError:
+            time.sleep(0.05)
+    raise TimeoutError("server didn't start listening")
+
+
+def start_server(command: list[str], port: int) -> subprocess.Popen:
+    """
+    Starts a server in a subprocess, and waits until it accepts connections on
+    the loopback interface.
+    :param command: the program and arguments that start the server, in which
+        `{port}` is replaced by the port on which it should listen
+    :param port: TCP port on which the server should listen
+    :return: the server process
+    :raises RuntimeError: if the server exits
+    :raises TimeoutError: if the server doesn't start listening
+    """
+    process = subprocess.Popen([arg.replace("{port}", str(port)) for arg in command],
+                               stdout=subprocess.DEVNULL)
+    try:
+        _wait_for_server(port, process)
+    except BaseException:
+        stop_server(process)
+        raise
+    return process
+
+
+def stop_server(process: subprocess.Popen):
+    """
+    Interrupts a server started by `start_server`, and waits for it to exit.
+    :param process: the server process
+    :return: None
+    """
+    if process.poll() is None:
+        process.send_signal(signal.SIGINT)
+        try:
+            process.wait(10.0)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+
+
+def add_server_arguments(parser: argparse.ArgumentParser):
+    """
+    Adds the options that choose the server to drive to a benchmark's parser:
+    `--server COMMAND` to start one, or `--connect HOST:PORT` to use a running one.
+    :param parser: the parser
+    :return: None
+    """
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument("--server", metavar="COMMAND", type=shlex.split,
+                       help="command that starts the server, with {port} for the port it should listen on")
+    group.add_argument("--connect", metavar="HOST:PORT",
+                       help="drive a running server instead of starting one")
+
+
+def start_or_connect(args: argparse.Namespace) -> tuple[str, int, subprocess.Popen]:
+    """
+    Starts the server chosen by the options added by `add_server_arguments`, or
+    finds the running one.
+    :param args: the parsed options
+    :return: the host and port of the server, and the process started, if any
+    """
+    if args.connect:
+        host, _, port = args.connect.rpartition(":")
+        return host, int(port), None
+    port = free_port()
+    return "127.0.0.1", port, start_server(args.server, port)
+
+
+def format_stats(summary: dict, label: str) -> str:
+    """
+    Formats the latency statistics of a summary as a row of the report table.
+    :param summary: the summary of a run, or of one verb
+    :param label: the label of the row
+    :return: the row, without a line terminator
+    """
+    return (f"{label:<8} {summary['requests']:>9} {summary['requests_per_sec']:>10.1f} "
+            f"{summary['p50_ms']:>9.3f} {summary['p99_ms']:>9.3f} {summary['p999_ms']:>9.3f}")
+
+
+def print_report(summary: dict):
+    """
+    Prints a summary of a run as a table.
+    :param summary: the summary produced by `LoadGenerator.run`
+    :return: None
+    """
+    print(f"{summary['orders']} orders in {summary['elapsed_sec']:.1f}s, {summary['errors']} errors")
+    print(f"{'verb':<8} {'requests':>9} {'req/s':>10} {'p50 ms':>9} {'p99 ms':>9} {'p99.9 ms':>9}")
+    for verb, stats in summary["verbs"].items():
+        print(format_stats(stats, verb))
+    print(format_stats(summary, "all"))
+
+
+def main(argv: list[str] = None):
+    parser = argparse.ArgumentParser(prog="cafe.bench", description="Sad Cafe load generator")
+    add_server_arguments(parser)
+    parser.add_argument("--customers", type=int, default=50,
+                        help="number of concurrent customers (default: 50)")
+    parser.add_argument("--duration", type=float, default=10.0,
+                        help="number of seconds to run (default: 10)")
+    parser.add_argument("--items", type=int, default=3, help="items added to each order (default: 3)")
+    parser.add_argument("--codec", help="codec to negotiate on each connection (e.g. BINARY)")
+    parser.add_argument("--seed", type=int, help="seed for the choice of menu items")
+    parser.add_argument("--json", metavar="PATH", help="also write the results to a JSON file")
+    args = parser.parse_args(argv)
+
+    host, port, process = start_or_connect(args)
+    try:
+        generator = LoadGenerator(host, port, args.customers, args.items, args.codec, args.seed)
+        summary = asyncio.run(generator.run(args.duration))
+    except ValueError as err:
+        parser.exit(1, f"{parser.prog}: {err}\n")
+    finally:
+        if process is not None:
+            stop_server(process)
+
+    summary["config"] = {"server": args.server, "connect": args.connect,
+                         "customers": args.customers, "duration": args.duration,
+                         "items": args.items, "codec": args.codec}
+    print_report(summary)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(summary, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+A micro-benchmark of request dispatch in `CafeProtocolServer`, comparing the
+table-driven dispatch with the if/elif chain it replaced. The channel and the
+order handler do nothing, so only parsing and dispatch are timed; the best of
+several rounds is reported.
+
+    PYTHONPATH=./src python3 -m cafe.bench_dispatch --requests 100000 --rounds 5
+"""
+import argparse
+import timeit
+
+from .bench_parsing import NullCafeOrderHandler
+from .cafe_io import CafeIO
+from .cafe_order_handler import CafeOrderHandler
+from .cafe_protocol_server import CafeProtocolServer
+
+# the requests dispatched in each round, in order
+REQUESTS = ["LIST MENU", "ADD 4", "ADD 12", "REMOVE 0", "LIST ORDER", "COMMIT AbC123", "CANCEL"]
+
+
+class _NullCafeIO(CafeIO):
+    def read_string(self) -> str:
+        raise EOFError
+
+    def write_string(self, s: str):
+        pass
+
+
+def _legacy_item_number(s: str) -> int:
+    item_number = int(s)
+    if item_number < 0:
+        raise ValueError
+    return item_number
+
+
+def legacy_dispatch(handler: CafeOrderHandler, io: CafeIO, request: str):
+    """
+    Dispatches a request as `CafeProtocolServer` did before the dispatch table was
+    introduced (without the error responses, since the benchmark's requests are
+    all valid).
+    :param handler: the handler to call
+    :param io: the channel to flush after the request
+    :param request: the request
+    :return: None
+    """
+    assert request is not None and request.strip() != ""
+    words = [word.upper() for word in request.split()]
+    if words[0] == "LIST":
+        if len(words) == 2 and words[1] == "MENU":
+            handler.handle_list_menu()
+        elif len(words) == 2 and words[1] == "ORDER":
+            handler.handle_list_order()
+    elif words[0] == "ADD":
+        if len(words) == 2:
+            handler.handle_add_item(_legacy_item_number(words[1]))
+    elif words[0] == "REMOVE":
+        if len(words) == 2:
+            handler.handle_remove_item(_legacy_item_number(words[1]))
+    elif words[0] == "COMMIT":
+        if len(words) == 2:
+            handler.handle_commit_order(words[1])
+    elif words[0] == "CANCEL":
+        if len(words) == 1:
+            handler.handle_cancel_order()
+    io.flush()
+
+
+def time_dispatch(count: int, rounds: int = 5) -> dict[str, float]:
+    """
+    Times each way of dispatching the benchmark's requests.
+    :param count: the number of times the requests are dispatched in a round
+    :param rounds: the number of rounds, of which the fastest counts
+    :return: the nanoseconds per request of each way, by name
+    """
+    handler = NullCafeOrderHandler()
+    io = _NullCafeIO()
+    server = CafeProtocolServer(handler, io)
+
+    def run_legacy():
+        for request in REQUESTS:
+            legacy_dispatch(handler, io, request)
+
+    def run_table():
+        for request in REQUESTS:
+            server.dispatch_request(request)
+
+    results = {}
+    for name, run in (("if/elif chain", run_legacy), ("dispatch table", run_table)):
+        seconds = min(timeit.repeat(run, number=count, repeat=rounds))
+        results[name] = seconds / (count * len(REQUESTS)) * 1e9
+    return results
+
+
+def main(argv: list[str] = None):
+    parser = argparse.ArgumentParser(prog="cafe.bench_dispatch", description="request dispatch benchmark")
+    parser.add_argument("--requests", type=int, default=100_000,
+                        help="number of times the requests are dispatched in a round (default: 100000)")
+    parser.add_argument("--rounds", type=int, default=5, help="number of rounds (default: 5)")
+    args = parser.parse_args(argv)
+    for name, per_request in time_dispatch(args.requests, args.rounds).items():
+        print(f"{name:>16}: {per_request:7.1f} ns/request")
+
+
+if __name__ == "__main__":
+    main()
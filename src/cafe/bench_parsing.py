@@ -0,0 +1,104 @@
+"""
+A micro-benchmark of the server's read path, as every server transport runs it:
+framing each request received by a `CafeServerConnection`, parsing it and
+dispatching it with `CafeProtocolServer`, and taking the (empty) response to
+send. The handler does nothing and no socket is involved, so the times are those
+of the connection and the interpreter alone. Each request is timed separately,
+and the best of several rounds is reported, to compare versions of the read path.
+
+    PYTHONPATH=./src python3 -m cafe.bench_parsing --requests 20000 --rounds 15
+"""
+import argparse
+import time
+
+from .cafe_connection import CafeServerConnection
+from .cafe_io import CafeIO
+from .cafe_order_handler import CafeOrderHandler
+from .cafe_protocol_server import CafeProtocolServer
+from .cafe_session import CafeSession
+
+# the requests timed, each separately
+REQUESTS = ["ADD 4", "ADD 1 2 3", "REMOVE 0", "LIST MENU", "LIST MENU IF-NOT 3", "COMMIT tok-123"]
+
+# the number of requests received at a time
+BATCH_SIZE = 1000
+
+
+class NullCafeOrderHandler(CafeOrderHandler):
+    """
+    An order handler that does nothing, so that a benchmark times only the
+    parsing and dispatch of requests.
+    """
+
+    def handle_list_menu(self):
+        pass
+
+    def handle_list_order(self):
+        pass
+
+    def handle_add_item(self, item_number: int):
+        pass
+
+    def handle_remove_item(self, item_number: int):
+        pass
+
+    def handle_add_items(self, item_numbers: list[int]):
+        pass
+
+    def handle_remove_items(self, item_numbers: list[int]):
+        pass
+
+    def handle_commit_order(self, settlement_token: str):
+        pass
+
+    def handle_cancel_order(self):
+        pass
+
+
+class _NullSession(CafeSession):
+    def __init__(self, io: CafeIO):
+        self._interpreter = CafeProtocolServer(NullCafeOrderHandler(), io)
+
+    @property
+    def done(self) -> bool:
+        return False
+
+    def serve_request(self, request: str):
+        self._interpreter.dispatch_request(request)
+
+
+def time_requests(request: str, count: int) -> float:
+    """
+    Times framing and dispatching copies of a request.
+    :param request: the request message
+    :param count: the number of copies
+    :return: the mean time per request in nanoseconds
+    """
+    connection = CafeServerConnection(_NullSession)
+    batch = (request + "\n").encode("utf-8") * BATCH_SIZE
+    num_batches = max(1, count // BATCH_SIZE)
+    elapsed = 0
+    for _ in range(num_batches):
+        connection.receive_data(batch)
+        start = time.perf_counter_ns()
+        while connection.serve_next_request():
+            pass
+        connection.data_to_send()
+        elapsed += time.perf_counter_ns() - start
+    return elapsed / (num_batches * BATCH_SIZE)
+
+
+def main(argv: list[str] = None):
+    parser = argparse.ArgumentParser(prog="cafe.bench_parsing", description="server read path benchmark")
+    parser.add_argument("--requests", type=int, default=20000,
+                        help="number of copies of each request timed in a round (default: 20000)")
+    parser.add_argument("--rounds", type=int, default=15, help="number of rounds (default: 15)")
+    args = parser.parse_args(argv)
+    print(f"{'request':<20} {'ns/request':>10}")
+    for request in REQUESTS:
+        best = min(time_requests(request, args.requests) for _ in range(args.rounds))
+        print(f"{request:<20} {best:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+"""
+A benchmark of the cost of starting a process that uses the cafe package.
+
+For each scenario (a statement importing part of the package), the time spent
+importing modules is measured with `python -X importtime`, counting only the
+modules the bare interpreter doesn't already import. The time to start a worker
+process that is ready to serve is also measured, both as a new interpreter and
+when launched by a `WarmWorkerLauncher`, e.g.
+
+    PYTHONPATH=./src python3 -m cafe.bench_startup --runs 10 --budget-ms 10
+
+With `--budget-ms`, the exit status is 1 if importing the package itself
+(`import cafe`) takes longer than the budget, so the check can guard against a
+module that is imported eagerly again.
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+
+from .worker_launcher import DEFAULT_PRELOAD, WarmWorkerLauncher
+
+# statements importing the parts of the package used by different kinds of process
+SCENARIOS = {
+    "package": "import cafe",
+    "client": "from cafe import CafeProtocolClient, SocketCafeIO",
+    "server": "from cafe import CafeProtocolServer, CafeService, ThreadedCafeServer",
+    "async server": "from cafe import AsyncCafeServer",
+}
+
+# the statement run by a worker to be ready to serve
+WORKER_STATEMENT = SCENARIOS["server"]
+
+
+def parse_importtime(output: str) -> dict[str, int]:
+    """
+    Parses the report written to stderr by `python -X importtime`.
+    :param output: the text of the report
+    :return: the time in microseconds spent importing each module itself,
+        excluding the modules it imports, by module name
+    """
+    times = {}
+    for line in output.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        fields = line[len("import time:"):].split("|")
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue   # the heading
+        times[fields[2].strip()] = int(fields[0])
+    return times
+
+
+def _importtime(statement: str) -> dict[str, int]:
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", statement],
+                            capture_output=True, text=True, check=True)
+    return parse_importtime(result.stderr)
+
+
+def import_cost(statement: str, baseline: set[str]) -> tuple[float, int]:
+    """
+    Measures the cost of the imports made by a statement in a new interpreter.
+    :param statement: the statement to run
+    :param baseline: the names of the modules the bare interpreter imports
+    :return: a tuple containing the time in milliseconds spent importing the
+        modules that aren't in the baseline, and the number of those modules
+    """
+    times = _importtime(statement)
+    added = [us for module, us in times.items() if module not in baseline]
+    return sum(added) / 1000, len(added)
+
+
+def _ready():
+    # the worker's target; it is preloaded, so the worker is ready as soon as it starts
+    pass
+
+
+def time_cold_start() -> float:
+    """
+    Measures the time to start a new interpreter that imports what a worker
+    needs, and to wait for it to exit.
+    :return: the time in milliseconds
+    """
+    started = time.perf_counter()
+    subprocess.run([sys.executable, "-c", WORKER_STATEMENT], check=True)
+    return (time.perf_counter() - started) * 1000
+
+
+def time_warm_start(launcher: WarmWorkerLauncher) -> float:
+    """
+    Measures the time to launch a worker from a launcher's template, and to
+    wait for it to exit.
+    :param launcher: a started launcher
+    :return: the time in milliseconds
+    """
+    started = time.perf_counter()
+    launcher.launch(_ready).join()
+    return (time.perf_counter() - started) * 1000
+
+
+def run(runs: int) -> dict:
+    """
+    Runs every measurement several times.
+    :param runs: the number of times to run each measurement
+    :return: a dictionary of results, which can be serialized as JSON; each
+        time is the best of the runs, in milliseconds
+    """
+    baseline = set(_importtime("pass"))
+    results = {"imports": {}}
+    for name, statement in SCENARIOS.items():
+        costs = [import_cost(statement, baseline) for _ in range(runs)]
+        best = min(costs)
+        results["imports"][name] = {"statement": statement, "ms": best[0], "modules": best[1]}
+    launcher = WarmWorkerLauncher(DEFAULT_PRELOAD + (__name__,))
+    launcher.start()
+    cold = [time_cold_start() for _ in range(runs)]
+    warm = [time_warm_start(launcher) for _ in range(runs)]
+    results["worker_start"] = {
+        "cold_ms": min(cold), "cold_median_ms": statistics.median(cold),
+        "warm_ms": min(warm), "warm_median_ms": statistics.median(warm),
+        "start_method": launcher.start_method,
+    }
+    return results
+
+
+def print_report(results: dict):
+    print(f"{'imports':<14}{'ms':>9}{'modules':>9}")
+    for name, result in results["imports"].items():
+        print(f"{name:<14}{result['ms']:>9.2f}{result['modules']:>9}")
+    start = results["worker_start"]
+    print()
+    print(f"{'worker start':<14}{'best ms':>9}{'median':>9}")
+    print(f"{'new process':<14}{start['cold_ms']:>9.2f}{start['cold_median_ms']:>9.2f}")
+    print(f"{start['start_method']:<14}{start['warm_ms']:>9.2f}{start['warm_median_ms']:>9.2f}")
+
+
+def main(argv: list[str] = None) -> int:
+    parser = argparse.ArgumentParser(prog="cafe.bench_startup", description="Sad Cafe startup benchmark")
+    parser.add_argument("--runs", type=int, default=5, help="times to run each measurement (default: 5)")
+    parser.add_argument("--budget-ms", type=float,
+                        help="fail if importing the package takes longer than this")
+    parser.add_argument("--json", metavar="PATH", help="also write the results to a JSON file")
+    args = parser.parse_args(argv)
+
+    results = run(args.runs)
+    print_report(results)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    package_ms = results["imports"]["package"]["ms"]
+    if args.budget_ms is not None and package_ms > args.budget_ms:
+        print(f"importing the package took {package_ms:.2f} ms, over the budget of {args.budget_ms} ms")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
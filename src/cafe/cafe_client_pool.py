@@ -0,0 +1,221 @@
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Iterator
+
+from .cafe_menu_cache import CafeMenuCache
+from .cafe_protocol_client import CafeProtocolClient
+from .socket_cafe_io import SocketCafeIO
+
+
+class CafeClientPool:
+    """
+    A pool of client connections to a Cafe server, for placing orders from many
+    threads. Because the server ends each conversation once its order is
+    committed or canceled, a connection carries one order: the pool keeps a number
+    of connections open ahead of demand (warm), so that an order doesn't wait for
+    a connection to be set up, and opens a replacement in the background whenever
+    one is handed out.
+
+    The number of connections (warm and in use) is bounded, so a burst of orders
+    waits for a connection rather than opening an unbounded number of sockets.
+    Warm connections are checked periodically, and again before they are handed
+    out, and discarded if the server has closed them. Every call on a pooled
+    connection has a deadline, so a call can't block indefinitely on an
+    unresponsive server, or on one that trickles its response.
+
+    A client obtained from the pool must only be used by one thread at a time.
+    """
+
+    def __init__(self, host: str, port: int, size: int = 4, max_connections: int = 32,
+                 call_timeout: float = 5.0, health_check_interval: float = 10.0,
+                 codec: str = None, menu_cache: CafeMenuCache = None):
+        """
+        Initializes this pool. No connections are opened until `start` is called.
+        :param host: host name or address of the server
+        :param port: TCP port on which the server is listening
+        :param size: the number of warm connections to keep open
+        :param max_connections: the maximum number of connections open at once
+        :param call_timeout: the limit in seconds for connecting, and for each call
+            (sending a request and receiving its response)
+        :param health_check_interval: the number of seconds between checks of
+            the warm connections
+        :param codec: the name of a codec to negotiate on each connection (e.g.
+            BINARY); text is used if not specified or not supported
+        :param menu_cache: a menu cache to be shared by the pool's clients
+        """
+        self._host = host
+        self._port = port
+        self._size = size
+        self._max_connections = max(size, max_connections)
+        self._call_timeout = call_timeout
+        self._health_check_interval = health_check_interval
+        self._codec = codec
+        self._menu_cache = menu_cache
+        self._condition = threading.Condition()
+        self._idle: deque[SocketCafeIO] = deque()
+        self._in_use: dict[CafeProtocolClient, SocketCafeIO] = {}
+        # all the connections: warm, in use, or being opened
+        self._num_connections = 0
+        self._closed = False
+        self._maintainer: threading.Thread = None
+
+    def __enter__(self) -> "CafeClientPool":
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    @property
+    def num_idle(self) -> int:
+        """
+        Gets the number of warm connections ready to be handed out.
+        :return: number of connections
+        """
+        return len(self._idle)
+
+    def start(self):
+        """
+        Starts the background thread that opens and checks the warm connections.
+        :return: None
+        """
+        self._maintainer = threading.Thread(target=self._maintain, name="cafe-client-pool", daemon=True)
+        self._maintainer.start()
+
+    def _open(self) -> SocketCafeIO:
+        io = SocketCafeIO.connect(self._host, self._port, self._call_timeout)
+        try:
+            if self._codec:
+                CafeProtocolClient(io, call_timeout=self._call_timeout).negotiate_codec(self._codec)
+        except BaseException:
+            io.close()
+            raise
+        return io
+
+    def _discard(self, io: SocketCafeIO):
+        # called with the condition's lock held
+        io.close()
+        self._num_connections -= 1
+        self._condition.notify_all()
+
+    def _maintain(self):
+        while True:
+            with self._condition:
+                while not self._closed:
+                    for io in [io for io in self._idle if not io.is_idle()]:
+                        self._idle.remove(io)
+                        self._discard(io)
+                    needed = min(self._size - len(self._idle),
+                                 self._max_connections - self._num_connections)
+                    if needed > 0:
+                        break
+                    self._condition.wait(self._health_check_interval)
+                if self._closed:
+                    return
+                self._num_connections += needed
+            for _ in range(needed):
+                try:
+                    io = self._open()
+                except Exception:
+                    with self._condition:
+                        self._num_connections -= 1
+                        self._condition.notify_all()
+                        # wait a while before retrying, unless the pool is closed
+                        self._condition.wait(1.0)
+                    continue
+                with self._condition:
+                    if self._closed:
+                        self._discard(io)
+                    else:
+                        self._idle.append(io)
+                        self._condition.notify_all()
+
+    def acquire(self, timeout: float = None) -> CafeProtocolClient:
+        """
+        Obtains a client with a connection of its own, on which one order can be
+        placed. The client must be given back with `release` when the order is
+        finished (or abandoned).
+        :param timeout: the maximum number of seconds to wait for a connection;
+            no limit if not specified
+        :return: a client
+        :raises TimeoutError: if no connection became available in time
+        :raises OSError: if a connection couldn't be opened
+        :raises RuntimeError: if the pool has been closed
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._condition:
+            while True:
+                if self._closed:
+                    raise RuntimeError("client pool is closed")
+                while self._idle:
+                    io = self._idle.popleft()
+                    if io.is_idle():
+                        # wake the maintainer to open a replacement
+                        self._condition.notify_all()
+                        return self._lend(io)
+                    self._discard(io)
+                if self._num_connections < self._max_connections:
+                    self._num_connections += 1
+                    break
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise TimeoutError("no connection available")
+                self._condition.wait(remaining)
+        # no warm connection is ready, but there's room to open one
+        try:
+            io = self._open()
+        except BaseException:
+            with self._condition:
+                self._num_connections -= 1
+                self._condition.notify_all()
+            raise
+        with self._condition:
+            return self._lend(io)
+
+    def _lend(self, io: SocketCafeIO) -> CafeProtocolClient:
+        # called with the condition's lock held
+        client = CafeProtocolClient(io, self._menu_cache, self._call_timeout)
+        self._in_use[client] = io
+        return client
+
+    def release(self, client: CafeProtocolClient):
+        """
+        Gives back a client obtained from `acquire`. Its connection is closed,
+        since the server ends the conversation once the order is finished; if the
+        order wasn't finished, closing the connection abandons it.
+        :param client: the client
+        :return: None
+        """
+        with self._condition:
+            self._discard(self._in_use.pop(client))
+
+    @contextmanager
+    def order(self, timeout: float = None) -> Iterator[CafeProtocolClient]:
+        """
+        Obtains a client for placing one order, for use in a `with` statement,
+        which gives the client back when the statement ends.
+        :param timeout: the maximum number of seconds to wait for a connection;
+            no limit if not specified
+        :return: a context manager that produces the client
+        """
+        client = self.acquire(timeout)
+        try:
+            yield client
+        finally:
+            self.release(client)
+
+    def close(self):
+        """
+        Closes the warm connections and stops opening new ones. Connections in
+        use are closed when they are released.
+        :return: None
+        """
+        with self._condition:
+            self._closed = True
+            while self._idle:
+                self._discard(self._idle.popleft())
+            self._condition.notify_all()
+        if self._maintainer is not None:
+            self._maintainer.join()
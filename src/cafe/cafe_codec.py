@@ -0,0 +1,194 @@
+from abc import ABC, abstractmethod
+
+
+class CafeCodec(ABC):
+    """
+    Converts between protocol messages and their representation on the wire.
+    A message is a line of text (e.g. `ADD 4` or `OK order has 2 item(s)`); a
+    codec determines how each message is framed and encoded as bytes.
+    """
+
+    # the name used to select the codec when negotiating with the peer
+    name: str = None
+
+    @property
+    def key(self) -> object:
+        """
+        Identifies the encoding produced by this codec; codecs with equal keys
+        produce identical bytes for the same messages.
+        :return: a hashable key
+        """
+        return self.name
+
+    @abstractmethod
+    def encode(self, message: str, out: bytearray):
+        """
+        Appends the encoded frame for a message to an output buffer.
+        :param message: the message to encode; must not contain a newline
+        :param out: the buffer to which the frame is appended
+        :return: None
+        """
+        pass
+
+    @abstractmethod
+    def frame_bounds(self, buffer: bytearray, start: int, end: int) -> tuple[int, int, int]:
+        """
+        Locates the first complete frame in a region of an input buffer.
+        :param buffer: the input buffer
+        :param start: index of the first byte of the region
+        :param end: index just past the last byte of the region
+        :return: a tuple containing the start and end indices of the frame's
+            payload, and the index just past the frame; or None if the region
+            doesn't contain a complete frame
+        """
+        pass
+
+    @abstractmethod
+    def decode(self, payload) -> str:
+        """
+        Decodes the payload of a frame located by `frame_bounds`.
+        :param payload: a bytes-like object containing the payload
+        :return: the message
+        :raises ValueError: if the payload is malformed
+        """
+        pass
+
+
+class TextCafeCodec(CafeCodec):
+    """
+    The original text encoding of the protocol: each message is a line of text
+    terminated by a newline.
+    """
+
+    name = "TEXT"
+
+    def __init__(self, encoding: str = "utf-8"):
+        """
+        Initializes this codec.
+        :param encoding: the character encoding used for lines of text
+        """
+        self._encoding = encoding
+
+    @property
+    def key(self) -> object:
+        return self.name, self._encoding
+
+    def encode(self, message: str, out: bytearray):
+        out += message.encode(self._encoding)
+        out += b"\n"
+
+    def frame_bounds(self, buffer: bytearray, start: int, end: int) -> tuple[int, int, int]:
+        newline = buffer.find(b"\n", start, end)
+        if newline < 0:
+            return None
+        return start, newline, newline + 1
+
+    def decode(self, payload) -> str:
+        return str(payload, self._encoding)
+
+
+# Words that the binary encoding represents with a single byte. The position of
+# each word is its code on the wire, so new words may only be appended.
+KEYWORDS = (
+    "OK", "ERROR", "LIST", "MENU", "ORDER", "ADD", "REMOVE", "COMMIT", "CANCEL",
+    "CODEC", "TEXT", "BINARY", "order", "has", "item(s)", "removed", "item", "items",
+    "canceled", "IF-NOT", "NOT-MODIFIED", "VERSION", "SESSION", "RESUME",
+    "LOCATION", "TOTAL",
+)
+
+_TAG_INTEGER = 0x80
+_TAG_STRING = 0x81
+
+
+def _encode_varint(n: int, out: bytearray):
+    while n > 0x7F:
+        out.append((n & 0x7F) | 0x80)
+        n >>= 7
+    out.append(n)
+
+
+def _decode_varint(buffer, i: int, end: int) -> tuple[int, int]:
+    # returns -1 for a varint that doesn't end before `end`
+    n = 0
+    shift = 0
+    while i < end:
+        b = buffer[i]
+        i += 1
+        n |= (b & 0x7F) << shift
+        if b < 0x80:
+            return n, i
+        shift += 7
+    return -1, i
+
+
+class BinaryCafeCodec(CafeCodec):
+    """
+    A compact binary encoding. Each frame is a varint payload length followed by
+    the payload. The payload encodes the words of the message (separated by single
+    spaces) as a sequence of tokens, each starting with a tag byte:
+
+    * a tag below 0x80 is the code of a word in `KEYWORDS` (e.g. a verb or status)
+    * tag 0x80 is followed by a non-negative integer encoded as a varint
+    * tag 0x81 is followed by a varint length and that many bytes of UTF-8 text
+
+    Decoding a frame reproduces the message exactly.
+    """
+
+    name = "BINARY"
+
+    def __init__(self):
+        self._keyword_codes = {word: code for code, word in enumerate(KEYWORDS)}
+
+    def encode(self, message: str, out: bytearray):
+        payload = bytearray()
+        for word in message.split(" "):
+            code = self._keyword_codes.get(word)
+            if code is not None:
+                payload.append(code)
+            elif word.isdigit() and word.isascii() and (word[0] != "0" or word == "0"):
+                payload.append(_TAG_INTEGER)
+                _encode_varint(int(word), payload)
+            else:
+                data = word.encode("utf-8")
+                payload.append(_TAG_STRING)
+                _encode_varint(len(data), payload)
+                payload += data
+        _encode_varint(len(payload), out)
+        out += payload
+
+    def frame_bounds(self, buffer: bytearray, start: int, end: int) -> tuple[int, int, int]:
+        length, payload_start = _decode_varint(buffer, start, end)
+        if length < 0 or payload_start + length > end:
+            return None
+        return payload_start, payload_start + length, payload_start + length
+
+    def decode(self, payload) -> str:
+        words = []
+        i = 0
+        end = len(payload)
+        while i < end:
+            tag = payload[i]
+            i += 1
+            if tag < len(KEYWORDS):
+                words.append(KEYWORDS[tag])
+            elif tag == _TAG_INTEGER:
+                n, i = _decode_varint(payload, i, end)
+                if n < 0:
+                    raise ValueError("truncated integer")
+                words.append(str(n))
+            elif tag == _TAG_STRING:
+                length, i = _decode_varint(payload, i, end)
+                if length < 0 or i + length > end:
+                    raise ValueError("truncated string")
+                words.append(str(payload[i:i + length], "utf-8"))
+                i += length
+            else:
+                raise ValueError(f"invalid token tag {tag:#x}")
+        return " ".join(words)
+
+
+# the codecs that may be negotiated, by name
+CODECS: dict[str, CafeCodec] = {
+    TextCafeCodec.name: TextCafeCodec(),
+    BinaryCafeCodec.name: BinaryCafeCodec(),
+}
@@ -0,0 +1,445 @@
+import math
+from collections import deque
+from concurrent.futures import Future
+from typing import Callable, Generator
+
+from .cafe_codec import CafeCodec, TextCafeCodec
+from .cafe_io import CafeIO
+from .cafe_limits import CafeLimits, TOO_MANY_REQUESTS
+from .cafe_menu_cache import CafeMenuCache
+from .cafe_response_decoder import CafeResponseDecoder
+from .cafe_session import CafeSession
+
+
+class _NeedData:
+    def __repr__(self) -> str:
+        return "NEED_DATA"
+
+
+# returned by `CafeClientConnection.next_response` until a whole response has been received
+NEED_DATA = _NeedData()
+
+
+class CafeConnection(CafeIO):
+    """
+    A communication channel that does no I/O of its own ("sans-I/O"). The
+    transport that owns it passes it each chunk of bytes received from the peer
+    with `receive_data`, takes complete messages from it with `next_message`, and
+    sends the bytes returned by `data_to_send`. Messages are framed and encoded
+    by a `CafeCodec`, as they are by the other channels.
+
+    Because it never waits, the same protocol logic can be driven by a blocking
+    socket, a thread pool, asyncio, or any other event loop (e.g. one built on
+    `selectors`), which only has to move bytes.
+
+    Output written with `write_string` becomes data to send when `flush` is
+    called, at the end of each complete message, as with the other channels.
+    """
+
+    def __init__(self, encoding: str = "utf-8", max_message_size: int = None):
+        """
+        Initializes this channel.
+        :param encoding: the character encoding used for lines of text
+        :param max_message_size: the maximum size in bytes of a received message;
+            no limit if not specified
+        """
+        self._codec: CafeCodec = TextCafeCodec(encoding)
+        self._max_message_size = max_message_size if max_message_size is not None else math.inf
+        self._read_buffer = bytearray()
+        self._read_start = 0
+        self._eof = False
+        # output up to `_flushed` is ready to send; the rest is a partial response
+        self._write_buffer = bytearray()
+        self._flushed = 0
+        self._bytes_received = 0
+        self._bytes_sent = 0
+
+    @property
+    def codec(self) -> CafeCodec:
+        """
+        Gets the codec used to frame messages.
+        :return: the current codec
+        """
+        return self._codec
+
+    def set_codec(self, codec: CafeCodec):
+        """
+        Selects the codec used to frame messages from now on. Output already
+        written is unaffected, and input that is already buffered is decoded
+        using the new codec.
+        :param codec: the codec to use
+        :return: None
+        """
+        self._codec = codec
+
+    @property
+    def bytes_received(self) -> int:
+        """
+        Gets the number of bytes received on this channel so far.
+        :return: number of bytes
+        """
+        return self._bytes_received
+
+    @property
+    def bytes_sent(self) -> int:
+        """
+        Gets the number of bytes taken from this channel to be sent so far.
+        :return: number of bytes
+        """
+        return self._bytes_sent
+
+    def receive_data(self, data: bytes):
+        """
+        Adds bytes received from the peer to the input.
+        :param data: the bytes received; empty if the peer has closed the connection
+        :return: None
+        """
+        if not data:
+            self._eof = True
+            return
+        if self._read_start:
+            del self._read_buffer[:self._read_start]
+            self._read_start = 0
+        self._read_buffer += data
+        self._bytes_received += len(data)
+
+    @property
+    def input_size(self) -> int:
+        """
+        Gets the number of bytes received that haven't been taken as messages.
+        :return: number of bytes
+        """
+        return len(self._read_buffer) - self._read_start
+
+    def next_message(self) -> str:
+        """
+        Takes the next complete, non-empty message from the input.
+        :return: the message with leading and trailing whitespace removed; or
+            None if more data must be received first
+        :raises EOFError: if the peer has closed the connection and no complete
+            message remains
+        :raises ValueError: if a message exceeds the maximum message size
+        """
+        buffer = self._read_buffer
+        while True:
+            bounds = self._codec.frame_bounds(buffer, self._read_start, len(buffer))
+            if bounds is None:
+                if len(buffer) - self._read_start > self._max_message_size:
+                    raise ValueError("message too long")
+                if self._eof:
+                    raise EOFError("connection closed by peer")
+                return None
+            payload_start, payload_end, self._read_start = bounds
+            if payload_end - payload_start > self._max_message_size:
+                raise ValueError("message too long")
+            s = self._codec.decode(buffer[payload_start:payload_end]).strip()
+            if s:
+                return s
+
+    def read_string(self) -> str:
+        """
+        Takes the next message from the input, which must already have been received.
+        :return: a non-empty string with leading and trailing whitespace removed
+        :raises BlockingIOError: if no complete message has been received
+        :raises EOFError: if the peer has closed the connection
+        """
+        s = self.next_message()
+        if s is None:
+            raise BlockingIOError("no complete message has been received")
+        return s
+
+    def write_string(self, s: str):
+        if not s:
+            raise ValueError("cannot write an empty string")
+        self._codec.encode(s, self._write_buffer)
+
+    def block_key(self) -> object:
+        return self._codec.key
+
+    def encode_block(self, lines: list[str]) -> bytes:
+        out = bytearray()
+        for line in lines:
+            self._codec.encode(line, out)
+        return bytes(out)
+
+    def write_block(self, block: bytes):
+        self._write_buffer += block
+
+    def flush(self):
+        self._flushed = len(self._write_buffer)
+
+    @property
+    def output_size(self) -> int:
+        """
+        Gets the number of bytes waiting to be taken by `data_to_send`.
+        :return: number of bytes
+        """
+        return self._flushed
+
+    def data_to_send(self) -> bytes:
+        """
+        Takes the output that has been flushed, for the transport to send.
+        :return: the bytes to send; empty if there are none
+        """
+        if not self._flushed:
+            return b""
+        data = bytes(self._write_buffer[:self._flushed])
+        del self._write_buffer[:self._flushed]
+        self._bytes_sent += self._flushed
+        self._flushed = 0
+        return data
+
+
+class CafeServerConnection:
+    """
+    The server side of a connection, as a state machine that does no I/O: bytes
+    received from the client go in with `receive_data`, each complete request is
+    served by a `CafeSession` when `serve_next_request` is called, and the bytes
+    of the responses come out of `data_to_send`. Every server transport drives
+    one of these, so the limits on request size and rate are applied the same
+    way in every server mode; limits that depend on time (e.g. the idle timeout)
+    are left to the transport, which owns the clock.
+
+    Serving one request at a time lets the transport stop when its output is
+    backing up (e.g. at a write buffer's high-water mark), leaving the rest of
+    the requests buffered until the client has caught up. It also lets a session
+    defer a response (see `CafeSession.serve_request`): no more requests are
+    served until the transport has seen the `pending` future done and called
+    `complete_pending`.
+    """
+
+    def __init__(self, session_factory: Callable[[CafeIO], CafeSession], limits: CafeLimits = None):
+        """
+        Initializes this connection.
+        :param session_factory: called with the connection's channel to create
+            the session that will serve it
+        :param limits: the limits placed on the session; only the maximum
+            message size and the request rate apply here
+        """
+        if limits is None:
+            self._io = CafeConnection()
+            self._rate_limiter = None
+        else:
+            self._io = CafeConnection(max_message_size=limits.max_message_size)
+            self._rate_limiter = limits.rate_limiter()
+        self._session = session_factory(self._io)
+        self._pending: Future = None
+        self._broken = False
+        self._closed = False
+
+    @property
+    def io(self) -> CafeConnection:
+        """
+        Gets the channel through which the session communicates.
+        :return: the channel
+        """
+        return self._io
+
+    @property
+    def done(self) -> bool:
+        """
+        Indicates whether the connection should be closed, once the data to send
+        has been sent: because the session is done, or the client has closed
+        the connection or sent an overlong message. A connection with a deferred
+        response isn't done until the response has been completed.
+        :return: True if no more requests will be served
+        """
+        return self._pending is None and (self._broken or self._session.done)
+
+    @property
+    def pending(self) -> Future:
+        """
+        Gets the future of the response the session has deferred, if any.
+        :return: the future; or None if no response is deferred
+        """
+        return self._pending
+
+    def complete_pending(self):
+        """
+        Has the session complete its deferred response, once the `pending` future
+        is done. The transport must call this on the thread that serves requests.
+        :return: None
+        """
+        future, self._pending = self._pending, None
+        self._session.complete_request(future)
+
+    def receive_data(self, data: bytes):
+        """
+        Adds bytes received from the client to the input.
+        :param data: the bytes received; empty if the client has closed the connection
+        :return: None
+        """
+        self._io.receive_data(data)
+
+    def serve_next_request(self) -> bool:
+        """
+        Serves the next complete request in the input, if there is one. A request
+        beyond the rate limit is answered with an ERROR response instead.
+        :return: True if a request was served; False if more data must be received
+            first, a response is deferred, or the connection is done
+        """
+        if self._pending is not None or self.done:
+            return False
+        try:
+            request = self._io.next_message()
+        except (EOFError, ValueError):
+            self._broken = True
+            return False
+        if request is None:
+            return False
+        if self._rate_limiter is None or self._rate_limiter.take():
+            self._pending = self._session.serve_request(request)
+        else:
+            self._io.write_string(TOO_MANY_REQUESTS)
+            self._io.flush()
+        return True
+
+    @property
+    def output_size(self) -> int:
+        """
+        Gets the number of bytes waiting to be taken by `data_to_send`.
+        :return: number of bytes
+        """
+        return self._io.output_size
+
+    def data_to_send(self) -> bytes:
+        """
+        Takes the bytes of the responses that have been served, for the transport to send.
+        :return: the bytes to send; empty if there are none
+        """
+        return self._io.data_to_send()
+
+    def close(self):
+        """
+        Tells the session that the connection has ended. Only the first call has
+        any effect.
+        :return: None
+        """
+        if not self._closed:
+            self._closed = True
+            self._session.close()
+
+
+class CafeClientConnection(CafeResponseDecoder):
+    """
+    The client side of a connection, as a state machine that does no I/O. Each
+    request is given with the decoder for its response (one of the decoders this
+    class inherits); the bytes of the requests come out of `data_to_send`, bytes
+    received from the server go in with `receive_data`, and decoded responses
+    come out of `next_response`, in the order in which the requests were made.
+    Requests may be pipelined.
+
+    A client that reads whole messages from a channel of its own (as
+    `CafeProtocolClient` and `AsyncCafeProtocolClient` do) gives that channel to
+    this class, which writes the requests to it, and passes each message it reads
+    to `receive_message` instead.
+    """
+
+    def __init__(self, menu_cache: CafeMenuCache = None, encoding: str = "utf-8", io: CafeIO = None):
+        """
+        Initializes this connection.
+        :param menu_cache: the cache updated by the menu decoders
+        :param encoding: the character encoding used for lines of text
+        :param io: the channel to which requests are written; if not specified, a
+            `CafeConnection` whose bytes are exchanged with `data_to_send` and
+            `receive_data`, which are only available then
+        """
+        super().__init__(menu_cache)
+        self._io = io if io is not None else CafeConnection(encoding)
+        self._decoders: deque[Generator] = deque()
+
+    @property
+    def pending(self) -> int:
+        """
+        Gets the number of requests whose responses haven't been returned.
+        :return: number of requests
+        """
+        return len(self._decoders)
+
+    def set_codec(self, codec: CafeCodec):
+        """
+        Selects the codec used from now on, e.g. once the server has accepted a
+        CODEC request.
+        :param codec: the codec to use
+        :return: None
+        """
+        self._io.set_codec(codec)
+
+    def send_request(self, request: str, decoder: Generator):
+        """
+        Writes a request and flushes it.
+        :param request: the complete request message (e.g. `ADD 4`)
+        :param decoder: a newly created decoder for the response (e.g. from
+            `_decode_response`)
+        :return: None
+        """
+        self._io.write_string(request)
+        self._io.flush()
+        self._expect_response(decoder)
+
+    def _expect_response(self, decoder: Generator):
+        """
+        Queues the decoder for the response to a request that has been written.
+        :param decoder: a newly created decoder for the response
+        :return: None
+        """
+        next(decoder)
+        self._decoders.append(decoder)
+
+    def data_to_send(self) -> bytes:
+        """
+        Takes the bytes of the requests that have been made, for the transport to send.
+        :return: the bytes to send; empty if there are none
+        """
+        return self._io.data_to_send()
+
+    def receive_data(self, data: bytes):
+        """
+        Adds bytes received from the server to the input.
+        :param data: the bytes received; empty if the server has closed the connection
+        :return: None
+        """
+        self._io.receive_data(data)
+
+    def receive_message(self, message: str) -> object:
+        """
+        Passes a message received from the server to the decoder of the oldest
+        request whose response hasn't been returned.
+        :param message: the message
+        :return: the decoded response, if the message completes it; otherwise `NEED_DATA`
+        :raises CafeClientError: if the response is ERROR
+        :raises CafeServerError: if the response is invalid
+        :raises RuntimeError: if there is no request awaiting a response
+        """
+        if not self._decoders:
+            raise RuntimeError("no request is awaiting a response")
+        try:
+            self._decoders[0].send(message)
+        except StopIteration as stop:
+            self._decoders.popleft()
+            return stop.value
+        except Exception:
+            self._decoders.popleft()
+            raise
+        return NEED_DATA
+
+    def next_response(self) -> object:
+        """
+        Decodes the response to the oldest request whose response hasn't been
+        returned, as far as the input allows.
+        :return: the decoded response; or `NEED_DATA` if more data must be
+            received first
+        :raises CafeClientError: if the response is ERROR
+        :raises CafeServerError: if the response is invalid
+        :raises EOFError: if the server has closed the connection
+        :raises RuntimeError: if there is no request awaiting a response
+        """
+        if not self._decoders:
+            raise RuntimeError("no request is awaiting a response")
+        while True:
+            message = self._io.next_message()
+            if message is None:
+                return NEED_DATA
+            response = self.receive_message(message)
+            if response is not NEED_DATA:
+                return response
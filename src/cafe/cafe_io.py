@@ -28,3 +28,40 @@ class CafeIO(ABC):
         """
         pass
 
+    def flush(self):
+        """
+        Sends any output that has been buffered by previous calls to `write_string`.
+        The protocol interpreters call this at the end of each complete message, so an
+        implementation that buffers its output only needs to transmit at those points.
+        The default implementation does nothing, which suits an unbuffered channel.
+        :return: None
+        """
+        pass
+
+    def block_key(self) -> object:
+        """
+        Identifies how this channel encodes blocks of lines. Channels that return
+        equal keys can share blocks encoded by `encode_block`, so a response that
+        is sent often can be encoded once and reused.
+        :return: a hashable key
+        """
+        return CafeIO
+
+    def encode_block(self, lines: list[str]) -> object:
+        """
+        Encodes a block of lines for later output by `write_block`. The default
+        implementation keeps the lines as they are.
+        :param lines: the lines of the block
+        :return: the encoded block
+        """
+        return tuple(lines)
+
+    def write_block(self, block: object):
+        """
+        Writes a block of lines encoded by `encode_block` (by this channel or one
+        with the same `block_key`). The default implementation writes each line.
+        :param block: the encoded block
+        :return: None
+        """
+        for line in block:
+            self.write_string(line)
@@ -0,0 +1,100 @@
+import time
+from typing import Callable
+
+# the response sent in place of serving a request that exceeds the rate limit
+TOO_MANY_REQUESTS = "ERROR too many requests"
+
+# the default maximum size in bytes of a request message
+MAX_MESSAGE_SIZE = 4096
+
+
+class TokenBucket:
+    """
+    A token bucket that limits the rate of some event while allowing short bursts.
+    The bucket holds up to `burst` tokens and is refilled at `rate` tokens per
+    second; each event takes one token, and is refused when the bucket is empty.
+    """
+
+    def __init__(self, rate: float, burst: int, clock: Callable[[], float] = time.monotonic):
+        """
+        Initializes this bucket, full of tokens.
+        :param rate: the number of tokens added per second
+        :param burst: the most tokens the bucket can hold
+        :param clock: a function that returns the current time in seconds
+        """
+        if rate <= 0 or burst < 1:
+            raise ValueError("rate and burst must be positive")
+        self._rate = rate
+        self._burst = burst
+        self._clock = clock
+        self._tokens = float(burst)
+        self._updated = clock()
+
+    def take(self) -> bool:
+        """
+        Takes a token from the bucket, if it has one.
+        :return: True if a token was taken; False if the event should be refused
+        """
+        now = self._clock()
+        self._tokens = min(self._burst, self._tokens + (now - self._updated) * self._rate)
+        self._updated = now
+        if self._tokens < 1:
+            return False
+        self._tokens -= 1
+        return True
+
+
+class CafeLimits:
+    """
+    The limits a server places on each client session, so that clients that are
+    abandoned, slow or misbehaving are shed before they exhaust the server's
+    file descriptors, threads or memory. The same limits apply in every server
+    mode. Each limit can be disabled by setting it to None.
+
+    * `idle_timeout` is a deadline for each complete request, starting when the
+      server begins waiting for it, so it also stops a client that sends a
+      request a byte at a time; the connection is closed when it passes
+    * `max_message_size` bounds the buffered bytes of a request; a longer request
+      closes the connection
+    * `request_rate` and `request_burst` configure a token bucket for each
+      session; a request that finds the bucket empty is answered with
+      `ERROR too many requests` instead of being served
+    * `write_high_water` bounds the output buffered for a client that pipelines
+      requests; once reached, the output is sent instead of being held for the
+      rest of the batch (for asyncio, it is the transport's high-water mark)
+    * `write_timeout` limits how long sending a response may wait for a client
+      that isn't reading; the connection is closed when it passes
+    """
+
+    def __init__(self, idle_timeout: float = 300.0, max_message_size: int = MAX_MESSAGE_SIZE,
+                 request_rate: float = None, request_burst: int = 20,
+                 write_high_water: int = 65536, write_timeout: float = 30.0):
+        """
+        Initializes these limits.
+        :param idle_timeout: the number of seconds a client may take to send each
+            request, including the time before it starts
+        :param max_message_size: the maximum size in bytes of a request message
+        :param request_rate: the sustained number of requests per second allowed
+            in each session
+        :param request_burst: the number of requests a session may send at once
+            before the rate applies; used only with `request_rate`
+        :param write_high_water: the number of bytes of buffered output at which
+            it is sent even while more requests are waiting
+        :param write_timeout: the number of seconds sending a response may wait
+            for the client
+        """
+        self.idle_timeout = idle_timeout
+        self.max_message_size = max_message_size
+        self.request_rate = request_rate
+        self.request_burst = request_burst
+        self.write_high_water = write_high_water
+        self.write_timeout = write_timeout
+
+    def rate_limiter(self) -> TokenBucket:
+        """
+        Creates the token bucket that limits the request rate of one session.
+        :return: a new bucket; or None if the request rate isn't limited
+        """
+        if self.request_rate is None:
+            return None
+        return TokenBucket(self.request_rate, self.request_burst)
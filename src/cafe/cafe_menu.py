@@ -0,0 +1,144 @@
+import hashlib
+from typing import NamedTuple, Union
+
+
+class CafeMenuItem(NamedTuple):
+    """
+    An item in the menu catalog. The item ID is the number that clients use to
+    order the item, and doesn't change when other items are added, removed or
+    updated.
+    """
+    # the item's stable identifier
+    item_id: int
+    # the name of the item shown to customers
+    label: str
+    # the price of the item in cents
+    price: int = 0
+    # whether the item can currently be ordered; an item that is out of stock
+    # remains in the catalog, but isn't listed on the menu sent to clients
+    available: bool = True
+
+
+class CafeMenu:
+    """
+    An immutable snapshot of the menu catalog at one version. When the menu
+    changes, the service replaces its snapshot with a new one at the next version,
+    so a snapshot can be shared by many sessions and never needs to be locked.
+
+    Items are indexed by ID, so looking up or validating an item takes constant
+    time however large the catalog is.
+
+    A snapshot also holds encoded responses for its items (e.g. the complete
+    LIST MENU response for each channel encoding), so that they are produced
+    once per version rather than once per request. Replacing the snapshot
+    discards them all at once.
+
+    The version number only orders the snapshots of one service in one process:
+    a restarted server, another worker process or another host may hold a
+    different menu at the same version. Clients are sent the `etag` instead,
+    which is derived from the items themselves, so equal tags mean equal menus
+    wherever they were produced.
+    """
+
+    def __init__(self, version: int, items: list[Union[CafeMenuItem, str]]):
+        """
+        Initializes this snapshot.
+        :param version: the version number of the menu
+        :param items: the menu items, in the order in which they are listed; an
+            item given as a string is an available item whose ID is its position
+            in the list
+        :raises ValueError: if two items have the same ID
+        """
+        self._version = version
+        self._items = tuple(item if isinstance(item, CafeMenuItem) else CafeMenuItem(i, item)
+                            for i, item in enumerate(items))
+        self._items_by_id = {item.item_id: item for item in self._items}
+        if len(self._items_by_id) != len(self._items):
+            raise ValueError("menu item IDs must be unique")
+        self._available_items = tuple(item for item in self._items if item.available)
+        # the repr of the items is the same in every process, unlike their hash
+        digest = hashlib.blake2b(repr(self._items).encode("utf-8"), digest_size=8).digest()
+        self._etag = int.from_bytes(digest, "big") >> 1 or 1
+        self._encoded: dict[object, object] = {}
+
+    @property
+    def version(self) -> int:
+        """
+        Gets the version number of this menu. A later version has a larger number;
+        the number is only meaningful within the process that created the menu.
+        :return: version number
+        """
+        return self._version
+
+    @property
+    def etag(self) -> int:
+        """
+        Gets a tag identifying the contents of this menu, which is the same for
+        equal menus in any process, and (almost certainly) differs for menus that
+        differ in any item. It is the version number sent to clients.
+        :return: a positive integer of at most 63 bits
+        """
+        return self._etag
+
+    @property
+    def items(self) -> tuple[CafeMenuItem, ...]:
+        """
+        Gets all the items in the catalog, including those that are unavailable.
+        :return: tuple of menu items
+        """
+        return self._items
+
+    @property
+    def available_items(self) -> tuple[CafeMenuItem, ...]:
+        """
+        Gets the items that can currently be ordered.
+        :return: tuple of menu items
+        """
+        return self._available_items
+
+    def item(self, item_id: int) -> CafeMenuItem:
+        """
+        Looks up an item by ID.
+        :param item_id: the item's ID
+        :return: the item, or None if there is no item with the given ID
+        """
+        return self._items_by_id.get(item_id)
+
+    def is_available(self, item_id: int) -> bool:
+        """
+        Determines whether an item can currently be ordered.
+        :param item_id: the item's ID
+        :return: True if there is an available item with the given ID
+        """
+        item = self._items_by_id.get(item_id)
+        return item is not None and item.available
+
+    def updated(self, items: list[CafeMenuItem]) -> "CafeMenu":
+        """
+        Creates the next version of this menu, in which the given items are
+        added, or replace the existing items with the same IDs. Existing items
+        keep their place in the list, and new items are added at the end.
+        :param items: the items to add or replace
+        :return: the new menu
+        """
+        changes = {item.item_id: item for item in items}
+        new_items = [changes.pop(item.item_id, item) for item in self._items]
+        new_items.extend(changes.values())
+        return CafeMenu(self._version + 1, new_items)
+
+    def encoded_response(self, key) -> object:
+        """
+        Gets an encoded response previously stored for this menu.
+        :param key: identifies the response and its encoding
+        :return: the encoded response, or None if none was stored
+        """
+        return self._encoded.get(key)
+
+    def store_encoded_response(self, key, response: object):
+        """
+        Stores an encoded response for this menu, for reuse by later requests.
+        :param key: identifies the response and its encoding
+        :param response: the encoded response
+        :return: None
+        """
+        self._encoded[key] = response
@@ -0,0 +1,100 @@
+import threading
+import time
+from typing import Callable
+
+
+class CafeMenuCache:
+    """
+    A client-side copy of the server's menu, which may be shared by many clients
+    (and so by many connections and sessions), safe for use by many threads.
+
+    A cached menu is used without contacting the server until it is older than
+    the time to live. After that, a client revalidates it with a conditional
+    request that carries the cached version, and the server only sends the menu
+    again if it has changed.
+
+    A server that takes orders for several locations has a menu for each, whose
+    versions are numbered independently, so a menu is cached for each location a
+    client chooses (with a LOCATION request). The location None stands for the
+    server's default location.
+    """
+
+    def __init__(self, ttl: float = 60.0, clock: Callable[[], float] = time.monotonic):
+        """
+        Initializes this cache, which is initially empty.
+        :param ttl: the number of seconds for which a menu may be used without
+            being revalidated; if zero, every use is revalidated
+        :param clock: a function that returns the current time in seconds
+        """
+        self._ttl = ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+        # maps each location to (version, items, time validated)
+        self._menus: dict[str, tuple[int, list[tuple[int, str]], float]] = {}
+
+    @property
+    def version(self) -> int:
+        """
+        Gets the version of the menu cached for the default location.
+        :return: the version number, or zero if the cache is empty or the server
+            didn't provide a version
+        """
+        return self.version_at(None)
+
+    def version_at(self, location: str) -> int:
+        """
+        Gets the version of the menu cached for a location.
+        :param location: the name of the location; None for the default location
+        :return: the version number, or zero if no menu is cached for the location
+            or the server didn't provide a version
+        """
+        with self._lock:
+            return self._menus.get(location, (0, None, 0.0))[0]
+
+    def fresh_items(self, location: str = None) -> list[tuple[int, str]]:
+        """
+        Gets the menu items cached for a location, if they may be used without
+        revalidation.
+        :param location: the name of the location; None for the default location
+        :return: list of tuples, each containing an item number and string label;
+            or None if no menu is cached for the location or its time to live has expired
+        """
+        with self._lock:
+            menu = self._menus.get(location)
+            if menu is None or self._clock() - menu[2] >= self._ttl:
+                return None
+            return menu[1]
+
+    def revalidate(self, location: str = None) -> list[tuple[int, str]]:
+        """
+        Records that the server confirmed the menu cached for a location is still current.
+        :param location: the name of the location; None for the default location
+        :return: the cached menu items
+        :raises LookupError: if no menu is cached for the location
+        """
+        with self._lock:
+            menu = self._menus.get(location)
+            if menu is None:
+                raise LookupError("no menu is cached")
+            self._menus[location] = (menu[0], menu[1], self._clock())
+            return menu[1]
+
+    def store(self, version: int, items: list[tuple[int, str]], location: str = None):
+        """
+        Replaces the menu cached for a location with one received from the server.
+        :param version: the version of the menu; zero if the server didn't
+            provide a version, in which case the next use will fetch it again
+        :param items: list of tuples, each containing an item number and string label
+        :param location: the name of the location; None for the default location
+        :return: None
+        """
+        with self._lock:
+            self._menus[location] = (version, items, self._clock() if version else float("-inf"))
+
+    def clear(self):
+        """
+        Discards the cached menus.
+        :return: None
+        """
+        with self._lock:
+            self._menus.clear()
@@ -0,0 +1,216 @@
+import threading
+import time
+from bisect import bisect_left
+from typing import TYPE_CHECKING, Callable
+
+if TYPE_CHECKING:
+    from http.server import ThreadingHTTPServer
+
+# upper bounds in seconds of the latency histogram buckets; the last bucket is unbounded
+LATENCY_BUCKETS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005,
+                   0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+# the phases of serving a request, each with its own latency histogram; sending
+# the response is left to the transport, which often sends the responses to
+# several requests at once, so it isn't attributed to a verb
+PHASES = ("parse", "handle")
+
+
+class _Histogram:
+    __slots__ = ("counts", "sum")
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.sum = 0.0
+
+    def observe(self, seconds: float):
+        self.counts[bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        self.sum += seconds
+
+    def snapshot(self) -> dict:
+        return {"buckets": list(self.counts), "sum": self.sum}
+
+
+class _VerbStats:
+    __slots__ = ("requests", "errors", "phases")
+
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.phases = tuple(_Histogram() for _ in PHASES)
+
+
+class CafeMetrics:
+    """
+    Counters and latency histograms describing the work of a Cafe server. For each
+    request verb it counts requests and ERROR responses, and records the time taken
+    to parse the request and to handle it, including encoding its response into
+    the connection's buffer. It also counts live sessions and the bytes received
+    and sent.
+
+    Recording a request costs a lock acquisition and a few additions, so the
+    metrics can be left on in production. They can be pulled in the Prometheus
+    text format from a local HTTP endpoint started with `serve_http`, or pushed to
+    a callback periodically with `start_reporting`.
+
+    One instance may be shared by all the sessions of a process. With a pre-fork
+    server, each worker process has its own counts.
+    """
+
+    def __init__(self, clock: Callable[[], float] = time.perf_counter):
+        """
+        Initializes this instance with every count at zero.
+        :param clock: a function that returns the current time in seconds, used
+            to time the phases of a request
+        """
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._verbs: dict[str, _VerbStats] = {}
+        self._live_sessions = 0
+        self._sessions = 0
+        self._bytes_received = 0
+        self._bytes_sent = 0
+
+    def record_request(self, verb: str, error: bool, parse: float, handle: float):
+        """
+        Records a request that has been served.
+        :param verb: the request verb (e.g. ADD)
+        :param error: whether an ERROR response was sent
+        :param parse: the number of seconds spent parsing the request
+        :param handle: the number of seconds spent handling it, including
+            writing its response to the channel
+        :return: None
+        """
+        with self._lock:
+            stats = self._verbs.get(verb)
+            if stats is None:
+                stats = self._verbs[verb] = _VerbStats()
+            stats.requests += 1
+            if error:
+                stats.errors += 1
+            parse_histogram, handle_histogram = stats.phases
+            parse_histogram.observe(parse)
+            handle_histogram.observe(handle)
+
+    def session_opened(self):
+        """
+        Records that a session has started.
+        :return: None
+        """
+        with self._lock:
+            self._live_sessions += 1
+            self._sessions += 1
+
+    def session_closed(self, bytes_received: int, bytes_sent: int):
+        """
+        Records that a session has ended.
+        :param bytes_received: the number of bytes received on its connection
+        :param bytes_sent: the number of bytes sent on its connection
+        :return: None
+        """
+        with self._lock:
+            self._live_sessions -= 1
+            self._bytes_received += bytes_received
+            self._bytes_sent += bytes_sent
+
+    def snapshot(self) -> dict:
+        """
+        Gets a consistent copy of every count.
+        :return: a dictionary, which can be serialized as JSON; each histogram
+            gives the count in each bucket of `LATENCY_BUCKETS` (not cumulative),
+            followed by the count above the last bound, and the sum in seconds
+        """
+        with self._lock:
+            return {
+                "live_sessions": self._live_sessions,
+                "sessions": self._sessions,
+                "bytes_received": self._bytes_received,
+                "bytes_sent": self._bytes_sent,
+                "verbs": {
+                    verb: {"requests": stats.requests, "errors": stats.errors,
+                           **{phase: histogram.snapshot() for phase, histogram in zip(PHASES, stats.phases)}}
+                    for verb, stats in self._verbs.items()
+                },
+            }
+
+    def render_prometheus(self) -> str:
+        """
+        Formats the current counts in the Prometheus text exposition format.
+        :return: the text of the exposition
+        """
+        snapshot = self.snapshot()
+        lines = [
+            "# TYPE cafe_live_sessions gauge",
+            f"cafe_live_sessions {snapshot['live_sessions']}",
+            "# TYPE cafe_sessions_total counter",
+            f"cafe_sessions_total {snapshot['sessions']}",
+            "# TYPE cafe_received_bytes_total counter",
+            f"cafe_received_bytes_total {snapshot['bytes_received']}",
+            "# TYPE cafe_sent_bytes_total counter",
+            f"cafe_sent_bytes_total {snapshot['bytes_sent']}",
+            "# TYPE cafe_requests_total counter",
+        ]
+        verbs = sorted(snapshot["verbs"].items())
+        lines.extend(f'cafe_requests_total{{verb="{verb}"}} {stats["requests"]}' for verb, stats in verbs)
+        lines.append("# TYPE cafe_request_errors_total counter")
+        lines.extend(f'cafe_request_errors_total{{verb="{verb}"}} {stats["errors"]}' for verb, stats in verbs)
+        lines.append("# TYPE cafe_request_phase_seconds histogram")
+        for verb, stats in verbs:
+            for phase in PHASES:
+                labels = f'verb="{verb}",phase="{phase}"'
+                histogram = stats[phase]
+                cumulative = 0
+                for bound, count in zip(LATENCY_BUCKETS + ("+Inf",), histogram["buckets"]):
+                    cumulative += count
+                    lines.append(f'cafe_request_phase_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+                lines.append(f"cafe_request_phase_seconds_sum{{{labels}}} {histogram['sum']}")
+                lines.append(f"cafe_request_phase_seconds_count{{{labels}}} {cumulative}")
+        return "\n".join(lines) + "\n"
+
+    def serve_http(self, host: str = "127.0.0.1", port: int = 0) -> "ThreadingHTTPServer":
+        """
+        Starts an HTTP server on a background thread, which answers every GET
+        request with the current counts in the Prometheus text format.
+        :param host: the address on which to listen; the loopback interface by default
+        :param port: the TCP port on which to listen; any free port if zero
+        :return: the HTTP server, whose `server_address` gives the port, and
+            whose `shutdown` method stops it
+        """
+        # imported here, since most processes that record metrics never serve them
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = metrics.render_prometheus().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, name="cafe-metrics-http", daemon=True).start()
+        return server
+
+    def start_reporting(self, callback: Callable[[dict], None], interval: float = 10.0) -> threading.Event:
+        """
+        Starts a background thread that calls a function with a snapshot of the
+        counts periodically (e.g. to push them to a monitoring system).
+        :param callback: called with the result of `snapshot`
+        :param interval: the number of seconds between calls
+        :return: an event which, when set, stops the reporting
+        """
+        stopped = threading.Event()
+
+        def report():
+            while not stopped.wait(interval):
+                callback(self.snapshot())
+
+        threading.Thread(target=report, name="cafe-metrics-report", daemon=True).start()
+        return stopped
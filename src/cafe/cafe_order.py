@@ -0,0 +1,118 @@
+from array import array
+
+
+class CafeOrder:
+    """
+    The items on an order in progress, as a list of lines, each giving a menu
+    item ID and the quantity ordered. Adding an item that is already on the order
+    increases the quantity on its line, so an order of 40 coffees is one line.
+
+    The lines are held in two compact arrays rather than in Python objects, so an
+    order takes a few dozen bytes plus a few bytes per line, which matters when
+    tens of thousands of sessions are live. A dictionary from item ID to line
+    index finds an item's line without scanning the lines.
+    """
+
+    __slots__ = ("_item_ids", "_quantities", "_lines", "_num_items")
+
+    # the most units of one item that may be on an order
+    MAX_QUANTITY = 0xFFFF
+
+    def __init__(self):
+        self._item_ids = array("I")
+        self._quantities = array("H")
+        # the index of the line of each item on the order, by item ID
+        self._lines: dict[int, int] = {}
+        self._num_items = 0
+
+    def __len__(self) -> int:
+        """
+        Gets the number of units on the order (e.g. 3 for 2 coffees and a tea).
+        :return: total quantity of all the lines
+        """
+        return self._num_items
+
+    @property
+    def num_lines(self) -> int:
+        """
+        Gets the number of lines on the order.
+        :return: the number of different items ordered
+        """
+        return len(self._item_ids)
+
+    def lines(self) -> list[tuple[int, int]]:
+        """
+        Gets the lines of the order, in the order the items were first added.
+        :return: list of tuples, each containing a menu item ID and a quantity
+        """
+        return list(zip(self._item_ids, self._quantities))
+
+    def item_id(self, k: int) -> int:
+        """
+        Gets the menu item ID on a line of the order.
+        :param k: the index of the line
+        :return: the menu item ID
+        :raises IndexError: if there is no such line
+        """
+        if k < 0:
+            raise IndexError(k)
+        return self._item_ids[k]
+
+    def item_ids(self) -> list[int]:
+        """
+        Gets the item ID of each unit on the order.
+        :return: list of menu item IDs, each repeated as many times as it was ordered
+        """
+        return [item_id for item_id, quantity in zip(self._item_ids, self._quantities)
+                for _ in range(quantity)]
+
+    def quantity(self, item_id: int) -> int:
+        """
+        Gets the number of units of an item on the order.
+        :param item_id: the menu item ID
+        :return: the quantity ordered; zero if the item isn't on the order
+        """
+        k = self._lines.get(item_id)
+        return 0 if k is None else self._quantities[k]
+
+    def add(self, item_id: int, quantity: int = 1):
+        """
+        Adds units of an item to the order.
+        :param item_id: the menu item ID
+        :param quantity: the number of units to add
+        :return: None
+        :raises ValueError: if the quantity of the item would exceed `MAX_QUANTITY`
+        """
+        k = self._lines.get(item_id)
+        if k is None:
+            if quantity > self.MAX_QUANTITY:
+                raise ValueError(f"too many of menu item {item_id}")
+            self._lines[item_id] = len(self._item_ids)
+            self._item_ids.append(item_id)
+            self._quantities.append(quantity)
+        else:
+            if self._quantities[k] + quantity > self.MAX_QUANTITY:
+                raise ValueError(f"too many of menu item {item_id}")
+            self._quantities[k] += quantity
+        self._num_items += quantity
+
+    def remove_unit(self, k: int):
+        """
+        Removes one unit from a line of the order. A line whose quantity falls to
+        zero is removed, so the lines after it move up.
+        :param k: the index of the line
+        :return: None
+        :raises IndexError: if there is no such line
+        """
+        if k < 0:
+            raise IndexError(k)
+        if self._quantities[k] > 1:
+            self._quantities[k] -= 1
+        else:
+            del self._lines[self._item_ids[k]]
+            del self._item_ids[k]
+            del self._quantities[k]
+            # the lines after it have moved up
+            for item_id in self._item_ids[k:]:
+                self._lines[item_id] -= 1
+        self._num_items -= 1
@@ -17,6 +17,21 @@ class CafeOrderHandler(ABC):
         """
         pass
 
+    def handle_list_menu_if_modified(self, version: int):
+        """
+        Handle a conditional request for the list of menu items, from a client
+        that already has the given version of the menu. A typical implementation
+        will call the protocol interpreter's `send_menu_not_modified_response` if
+        the version is still the menu's `etag` (not its process-local `version`),
+        or its `send_menu_response` (with `versioned` set) to send the current
+        menu and its tag. The default
+        implementation uses `handle_list_menu`, so the response has no version
+        and the client can't use it for later conditional requests.
+        :param version: the version of the menu the client has; zero if none
+        :return: None
+        """
+        self.handle_list_menu()
+
     @abstractmethod
     def handle_list_order(self):
         """
@@ -51,6 +66,40 @@ class CafeOrderHandler(ABC):
         """
         pass
 
+    def handle_add_items(self, item_numbers: list[int]):
+        """
+        Handle a request to add several items to the order. Every item number
+        should be validated before any of them is added, so that the request either
+        succeeds or fails as a whole. A typical implementation will then call the
+        protocol interpreter's `send_add_item_response` once for the whole request.
+
+        The default implementation adds the items one at a time using
+        `handle_add_item`, so it is not atomic: the client receives the ERROR
+        response for an invalid item, but every valid item in the request is
+        still added. Handlers whose clients rely on atomic batches (as
+        `CafeProtocolClient.send_add_items_request` documents) must override it.
+        :param item_numbers: the menu item numbers to add
+        :return: None
+        """
+        for item_number in item_numbers:
+            self.handle_add_item(item_number)
+
+    def handle_remove_items(self, item_numbers: list[int]):
+        """
+        Handle a request to remove several items from the order. The item numbers
+        are indices into the order as it was before the request, and are all
+        different. Every item number should be validated before any item is
+        removed, so that the request either succeeds or fails as a whole. A typical
+        implementation will then call the protocol interpreter's
+        `send_remove_items_response`. The default implementation removes the items
+        one at a time (highest index first) using `handle_remove_item`, so like
+        `handle_add_items` it is not atomic.
+        :param item_numbers: the indices of the order items to remove
+        :return: None
+        """
+        for item_number in sorted(item_numbers, reverse=True):
+            self.handle_remove_item(item_number)
+
     @abstractmethod
     def handle_commit_order(self, settlement_token: str):
         """
@@ -73,4 +122,52 @@ class CafeOrderHandler(ABC):
         """
         pass
 
+    def handle_total(self):
+        """
+        Handle a request for the price of the order. A typical implementation
+        will call the protocol interpreter's `send_total_response` with the
+        order's price in cents. The default implementation raises
+        NotImplementedError, and the interpreter sends an ERROR response.
+        :return: None
+        :raises NotImplementedError: if the handler doesn't price orders
+        """
+        raise NotImplementedError
 
+    def handle_session(self):
+        """
+        Handle a request for a token with which the client can resume this
+        session on a new connection if it is interrupted. A typical
+        implementation will call the protocol interpreter's
+        `send_session_response`. The default implementation raises
+        NotImplementedError, and the interpreter sends an ERROR response.
+        :return: None
+        :raises NotImplementedError: if the handler can't resume sessions
+        """
+        raise NotImplementedError
+
+    def handle_resume(self, token: str):
+        """
+        Handle a request to resume an interrupted session, continuing its order.
+        A typical implementation will call the protocol interpreter's
+        `send_resume_response`, or its `send_error_response` if the token is
+        unknown. The default implementation raises NotImplementedError, and
+        the interpreter sends an ERROR response.
+        :param token: the token the client was sent for the interrupted session
+        :return: None
+        :raises NotImplementedError: if the handler can't resume sessions
+        """
+        raise NotImplementedError
+
+    def handle_location(self, location: str):
+        """
+        Handle a request to place the order at another location. A typical
+        implementation will call the protocol interpreter's
+        `send_location_response`, or its `send_error_response` if the location
+        is unknown or the order has already been started. The default
+        implementation raises NotImplementedError, and the interpreter sends
+        an ERROR response.
+        :param location: the name of the location to take the order
+        :return: None
+        :raises NotImplementedError: if the handler serves only one location
+        """
+        raise NotImplementedError
@@ -0,0 +1,215 @@
+from bisect import bisect_right
+from typing import NamedTuple
+
+from .cafe_menu import CafeMenu
+from .cafe_order import CafeOrder
+
+
+class ComboRule(NamedTuple):
+    """
+    A set of menu items sold together for a fixed price (e.g. a burger, chips and
+    a drink). Each complete set of the items on an order is charged at the combo
+    price, and the units left over at their own prices.
+    """
+    # the name of the combo shown to customers
+    name: str
+    # the IDs of the items in the combo; an item listed twice is needed twice
+    item_ids: tuple[int, ...]
+    # the price of the combo in cents
+    price: int
+
+
+class QuantityDiscount(NamedTuple):
+    """
+    A lower unit price for an item ordered in quantity (e.g. for catering). When
+    several discounts for an item apply, the one with the largest minimum
+    quantity is used.
+    """
+    # the ID of the discounted item
+    item_id: int
+    # the number of units of the item that must be ordered for the discount to apply
+    min_quantity: int
+    # the discount from the item's price, in percent
+    percent_off: int
+
+
+class PricingTable:
+    """
+    The prices of a menu snapshot and its combo and discount rules, compiled into
+    lookup tables: by item ID, the unit price at each quantity at which a discount
+    starts, and the combo (if any) that includes the item. Pricing one line of an
+    order is then a dictionary lookup and a binary search over that item's
+    discounts, however many rules there are.
+
+    A table is immutable, so like the menu it can be shared by every session; the
+    service compiles a new one with each new version of the menu.
+
+    Rules for items that aren't on the menu (e.g. because they have been removed)
+    are ignored, and such items are priced at zero.
+    """
+
+    def __init__(self, menu: CafeMenu, combos: list[ComboRule] = (), discounts: list[QuantityDiscount] = ()):
+        """
+        Compiles the pricing of a menu.
+        :param menu: the menu snapshot, which gives the price of each item
+        :param combos: the combo rules
+        :param discounts: the quantity discount rules
+        :raises ValueError: if an item is in more than one combo, or a rule is invalid
+        """
+        self._menu_version = menu.version
+        breaks: dict[int, dict[int, int]] = {item.item_id: {0: item.price} for item in menu.items}
+        for discount in discounts:
+            item = menu.item(discount.item_id)
+            if item is None:
+                continue
+            if discount.min_quantity < 1 or not 0 <= discount.percent_off <= 100:
+                raise ValueError(f"invalid discount {discount}")
+            breaks[item.item_id][discount.min_quantity] = item.price * (100 - discount.percent_off) // 100
+        # by item ID, the quantities at which the unit price changes, and the unit price from each
+        self._tiers: dict[int, tuple[tuple[int, ...], tuple[int, ...]]] = {}
+        for item_id, prices in breaks.items():
+            quantities = tuple(sorted(prices))
+            self._tiers[item_id] = (quantities, tuple(prices[q] for q in quantities))
+
+        # by item ID, the index of the combo that includes the item
+        self._combo_of: dict[int, int] = {}
+        # for each combo, its price and the number of units of each of its items
+        self._combos: list[tuple[int, tuple[tuple[int, int], ...]]] = []
+        for combo in combos:
+            if not combo.item_ids or any(menu.item(item_id) is None for item_id in combo.item_ids):
+                continue
+            parts: dict[int, int] = {}
+            for item_id in combo.item_ids:
+                parts[item_id] = parts.get(item_id, 0) + 1
+            for item_id in parts:
+                if item_id in self._combo_of:
+                    raise ValueError(f"menu item {item_id} is in more than one combo")
+                self._combo_of[item_id] = len(self._combos)
+            self._combos.append((combo.price, tuple(parts.items())))
+
+    @property
+    def menu_version(self) -> int:
+        """
+        Gets the version of the menu whose prices this table holds.
+        :return: version number
+        """
+        return self._menu_version
+
+    def unit_price(self, item_id: int, quantity: int = 1) -> int:
+        """
+        Gets the price of each unit of an item, when a quantity of it is ordered.
+        :param item_id: the menu item ID
+        :param quantity: the number of units ordered
+        :return: the unit price in cents, after any quantity discount
+        """
+        tiers = self._tiers.get(item_id)
+        if tiers is None:
+            return 0
+        quantities, prices = tiers
+        return prices[bisect_right(quantities, quantity) - 1]
+
+    def line_price(self, item_id: int, quantity: int) -> int:
+        """
+        Gets the price of a quantity of an item, without any combo.
+        :param item_id: the menu item ID
+        :param quantity: the number of units ordered
+        :return: the price in cents
+        """
+        return quantity * self.unit_price(item_id, quantity) if quantity else 0
+
+    def group_price(self, item_id: int, quantities: dict[int, int]) -> int:
+        """
+        Gets the price of the units of an item and of the other items in its combo,
+        which are priced together. The price of an order is the sum of the prices
+        of its groups, and changing the quantity of an item only changes the price
+        of its group.
+        :param item_id: the menu item ID
+        :param quantities: the number of units of each item on the order, by item ID
+        :return: the price of the group in cents
+        """
+        combo = self._combo_of.get(item_id)
+        if combo is None:
+            return self.line_price(item_id, quantities.get(item_id, 0))
+        combo_price, parts = self._combos[combo]
+        count = min(quantities.get(part, 0) // needed for part, needed in parts)
+        price = count * combo_price
+        for part, needed in parts:
+            price += self.line_price(part, quantities.get(part, 0) - count * needed)
+        return price
+
+    def price(self, order: CafeOrder) -> int:
+        """
+        Computes the price of a whole order, by scanning its lines.
+        :param order: the order
+        :return: the price in cents
+        """
+        return RunningTotal(self, order).total
+
+
+class RunningTotal:
+    """
+    The price of an order in progress, kept up to date as items are added and
+    removed. Each change reprices only the group of the item that changed (the
+    item's line, or the lines of its combo), so the total is always at hand (e.g.
+    for a TOTAL or COMMIT request) without scanning an order of any size.
+    """
+
+    __slots__ = ("_table", "_quantities", "_total")
+
+    def __init__(self, table: PricingTable, order: CafeOrder = None):
+        """
+        Initializes this total.
+        :param table: the pricing to apply
+        :param order: the order whose total to keep; empty if not specified
+        """
+        self._table = table
+        self._quantities: dict[int, int] = {}
+        self._total = 0
+        if order is not None:
+            for item_id, quantity in order.lines():
+                self.add(item_id, quantity)
+
+    @property
+    def table(self) -> PricingTable:
+        """
+        Gets the pricing applied to the order.
+        :return: the pricing table
+        """
+        return self._table
+
+    @property
+    def total(self) -> int:
+        """
+        Gets the price of the order.
+        :return: the price in cents
+        """
+        return self._total
+
+    def add(self, item_id: int, quantity: int = 1):
+        """
+        Accounts for units of an item added to the order.
+        :param item_id: the menu item ID
+        :param quantity: the number of units added
+        :return: None
+        """
+        self._change(item_id, quantity)
+
+    def remove(self, item_id: int, quantity: int = 1):
+        """
+        Accounts for units of an item removed from the order.
+        :param item_id: the menu item ID
+        :param quantity: the number of units removed
+        :return: None
+        """
+        self._change(item_id, -quantity)
+
+    def _change(self, item_id: int, delta: int):
+        table = self._table
+        quantities = self._quantities
+        before = table.group_price(item_id, quantities)
+        quantity = quantities.get(item_id, 0) + delta
+        if quantity > 0:
+            quantities[item_id] = quantity
+        else:
+            quantities.pop(item_id, None)
+        self._total += table.group_price(item_id, quantities) - before
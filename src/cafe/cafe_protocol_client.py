@@ -1,107 +1,131 @@
-from .cafe_io import CafeIO
-
-class CafeServerError(Exception):
-    """
-    A custom exception type raised when the server sends an invalid response.
-    """
-    pass
-
+import time
+from typing import Callable, Generator
 
-class CafeClientError(Exception):
-    """
-    A custom exception type raised if the server indicates that we sent an invalid
-    request.
-    """
-    pass
+from .cafe_codec import CODECS
+from .cafe_connection import CafeClientConnection, NEED_DATA
+from .cafe_io import CafeIO
+from .cafe_menu_cache import CafeMenuCache
+# the decoders and their exceptions were defined here first, so they can still be imported from here
+from .cafe_response_decoder import CafeClientError, CafeResponseDecoder, CafeServerError
 
 
-class CafeProtocolClient:
+class CafeProtocolClient(CafeClientConnection):
     """
     An interpreter for the client side of the Sad Cafe protocol. The interpreter is
     responsible for sending properly formatted protocol requests, and decoding
-    responses for return to the caller.
+    responses for return to the caller. Requests are queued with their decoders
+    as by any `CafeClientConnection`, and the messages of the responses are read
+    from a blocking channel (e.g. a `SocketCafeIO`).
+
+    With a call timeout, each call (sending a request and reading its response,
+    or executing a pipeline) must finish within the timeout as a whole, on a
+    channel that supports deadlines (`set_deadline`).
     """
 
-    def __init__(self, io: CafeIO):
+    def __init__(self, io: CafeIO, menu_cache: CafeMenuCache = None, call_timeout: float = None):
         """
         Initializes this instance of the protocol interpreter.
         :param io: the I/O channel to use in receiving and sending protocol
             messages to the client
+        :param menu_cache: a cache used by `send_menu_items_request`, which may
+            be shared with other clients; if not specified, the menu is fetched
+            from the server on every request
+        :param call_timeout: the limit in seconds for each call; no limit if not
+            specified
         """
-        self._io = io
+        super().__init__(menu_cache, io=io)
+        self._call_timeout = call_timeout
+        self._set_deadline = getattr(io, "set_deadline", None) if call_timeout is not None else None
 
-    def _await_response(self) -> str:
+    def _start_call(self):
+        # the call must finish within the call timeout, however many waits it takes
+        if self._set_deadline is not None:
+            self._set_deadline(time.monotonic() + self._call_timeout)
+
+    def _receive_response(self):
         """
-        Reads the first message of a server response.
-        :return: the string following OK in the server's response
+        Reads messages from the channel until the response to the oldest request
+        awaiting one has been decoded.
+        :return: the decoded response
         :raises CafeClientError: if the server's response is ERROR
         :raises CafeServerError: if the server's response is unrecognized
         """
-        response = self._io.read_string()
-        assert response is not None and response.strip() != ""
-        status, message = response.split(maxsplit=1)
-        status = status.upper()
-        if status == "OK":
-            return message
-        elif status == "ERROR":
-            raise CafeClientError(message)
-        else:
-            raise CafeServerError(f"invalid server response '{response}")
-
-    def _await_number_response(self) -> int:
-        """
-        Reads the first message of a server response that should contain a number after OK.
-        :return: the number following OK in the server's response
+        result = NEED_DATA
+        while result is NEED_DATA:
+            result = self.receive_message(self._io.read_string())
+        return result
+
+    def _call(self, request: str, decoder: Generator):
+        """
+        Sends a request message to the server, and reads the response.
+        :param request: the complete request message
+        :param decoder: a newly created decoder for the response (e.g. from `_decode_response`)
+        :return: the decoded response
         :raises CafeClientError: if the server's response is ERROR
         :raises CafeServerError: if the server's response is unrecognized
         """
-        s = self._await_response()
+        self._start_call()
+        self.send_request(request, decoder)
+        return self._receive_response()
+
+    def negotiate_codec(self, name: str = "BINARY") -> bool:
+        """
+        Asks the server to switch to another codec for the rest of the conversation.
+        This should be done at the start of the conversation, and must not be
+        pipelined with other requests. If the channel or the server doesn't support
+        the codec, the conversation continues using text.
+        :param name: the name of the codec (e.g. BINARY)
+        :return: True if the codec is now in use
+        :raises CafeServerError: if the server response is invalid
+        """
+        codec = CODECS.get(name.upper())
+        set_codec = getattr(self._io, "set_codec", None)
+        if codec is None or set_codec is None:
+            return False
         try:
-            return int(s)
-        except ValueError:
-            raise CafeServerError(f"invalid number in OK response {s}")
+            self._call(f"CODEC {codec.name}", self._decode_response())
+        except CafeClientError:
+            return False
+        set_codec(codec)
+        return True
 
-    def _await_list_response(self) -> list[tuple[int, str]]:
+    def pipeline(self) -> "CafePipeline":
         """
-        Reads a server list response. The first line of the response is
-        OK followed by the number of items, N. The next N lines are tuples
-        of the form `k label`, where k is a non-negative integer, and `label`
-        is a string.
-        :return: the list of tuples found in the response
-        :raises CafeClientError: if the server's response is ERROR
-        :raises CafeServerError: if the server's response is unrecognized
+        Creates a pipeline for sending several requests at once. Requests are
+        queued by calling the pipeline's methods (which can be chained), and are
+        sent together by calling `execute`; for example
+        `client.pipeline().add(3).add(5).list_order().execute()`.
+        :return: a new, empty pipeline
         """
-        items: list[tuple[int, str]] = []
-        num_items = self._await_number_response()
-        for _ in range(num_items):
-            item = self._io.read_string()
-            assert item is not None and item.strip() != ""
-            k, label = item.split(maxsplit=1)
-            try:
-                items.append((int(k), label))
-            except ValueError:
-                raise CafeServerError(f"invalid item number in list items {k}")
-        return items
+        return CafePipeline(self)
 
     def send_menu_items_request(self) -> list[tuple[int, str]]:
         """
-        Sends a request for the available menu items.
+        Sends a request for the available menu items. If this client has a menu
+        cache, a fresh cached menu is returned without sending a request, and
+        otherwise the request is conditional, so that the server only sends the
+        menu if it differs from the cached version.
         :return: list of tuples, each containing an item number and string label
         :raises CafeClientError: if the server response is ERROR
         :raises CafeServerError: if the server response is invalid
         """
-        self._io.write_string("LIST MENU")
-        return self._await_list_response()
+        if self._menu_cache is None:
+            return self._call("LIST MENU", self._decode_list_response())
+        items = self._menu_cache.fresh_items(self._location)
+        if items is not None:
+            return list(items)
+        return self._call(f"LIST MENU IF-NOT {self._menu_cache.version_at(self._location)}",
+                          self._decode_menu_response())
 
-    def send_order_items_request(self) -> list[tuple[int, str]]:
+    def send_order_items_request(self) -> list[tuple[int, int, int]]:
         """
         Sends a request for the items in the client's order.
-        :return: list of tuples, each containing an item index and string label
+        :return: list of tuples, each containing a line index, a menu item ID and
+            the quantity ordered
         :raises CafeClientError: if the server response is ERROR
         :raises CafeServerError: if the server response is invalid
         """
-        self._io.write_string("LIST ORDER")
-        return self._await_list_response()
+        return self._call("LIST ORDER", self._decode_order_response())
 
     def send_add_item_request(self, item_number: int):
         """
@@ -111,19 +135,47 @@ class CafeProtocolClient:
         :raises CafeClientError: if the server response is ERROR
         :raises CafeServerError: if the server response is invalid
         """
-        self._io.write_string(f"ADD {item_number}")
-        return self._await_response()
+        return self._call(f"ADD {item_number}", self._decode_response())
 
     def send_remove_item_request(self, item_number: int):
         """
-        Sends a request to remove an item from the order.
-        :param item_number: the index of the item number to remove
+        Sends a request to remove one unit of an item from the order.
+        :param item_number: the index of the order line from which to remove a unit
+        :return: None
+        :raises CafeClientError: if the server response is ERROR
+        :raises CafeServerError: if the server response is invalid
+        """
+        return self._call(f"REMOVE {item_number}", self._decode_response())
+
+    def send_add_items_request(self, item_numbers: list[int]):
+        """
+        Sends a request to add several items to the order. The server adds either
+        all of the items or none of them.
+        :param item_numbers: the menu item numbers to add
+        :return: None
+        :raises ValueError: if `item_numbers` is empty
+        :raises CafeClientError: if the server response is ERROR
+        :raises CafeServerError: if the server response is invalid
+        """
+        if not item_numbers:
+            raise ValueError("no item numbers to add")
+        return self._call(f"ADD {' '.join(str(n) for n in item_numbers)}", self._decode_response())
+
+    def send_remove_items_request(self, item_numbers: list[int]):
+        """
+        Sends a request to remove several items from the order. The item numbers
+        are indices into the order as it was before the request. The server removes
+        either all of the items or none of them.
+        :param item_numbers: the indices of the item numbers to remove; no index
+            may appear more than once
         :return: None
+        :raises ValueError: if `item_numbers` is empty
         :raises CafeClientError: if the server response is ERROR
         :raises CafeServerError: if the server response is invalid
         """
-        self._io.write_string(f"REMOVE {item_number}")
-        return self._await_response()
+        if not item_numbers:
+            raise ValueError("no item numbers to remove")
+        return self._call(f"REMOVE {' '.join(str(n) for n in item_numbers)}", self._decode_response())
 
     def send_commit_order_response(self, settlement_token: str) -> int:
         """
@@ -133,8 +185,7 @@ class CafeProtocolClient:
         :raises CafeClientError: if the server response is ERROR
         :raises CafeServerError: if the server response is invalid
         """
-        self._io.write_string(f"COMMIT {settlement_token}")
-        return self._await_number_response()
+        return self._call(f"COMMIT {settlement_token}", self._decode_commit_response())
 
     def send_cancel_order_response(self):
         """
@@ -143,6 +194,151 @@ class CafeProtocolClient:
         :raises CafeClientError: if the server response is ERROR
         :raises CafeServerError: if the server response is invalid
         """
-        self._io.write_string(f"CANCEL")
-        return self._await_response()
+        return self._call("CANCEL", self._decode_cancel_response())
 
+    def send_session_request(self) -> str:
+        """
+        Sends a request for a session token, with which the order in progress can
+        be resumed on a new connection if this one is interrupted.
+        :return: the session token
+        :raises CafeClientError: if the server response is ERROR (e.g. because the
+            server doesn't support resuming sessions)
+        :raises CafeServerError: if the server response is invalid
+        """
+        return self._call("SESSION", self._decode_response())
+
+    def send_resume_request(self, session_token: str):
+        """
+        Sends a request to resume an interrupted session, replacing the order on
+        this connection with the order in progress when it was interrupted.
+        :param session_token: the token obtained with `send_session_request`
+        :return: None
+        :raises CafeClientError: if the server response is ERROR (e.g. because the
+            session has expired)
+        :raises CafeServerError: if the server response is invalid
+        """
+        return self._call(f"RESUME {session_token}", self._decode_response())
+
+    def send_location_request(self, location: str):
+        """
+        Sends a request to place the order at another of the server's locations.
+        This must be done before any items are added to the order.
+        :param location: the name of the location
+        :return: None
+        :raises CafeClientError: if the server response is ERROR (e.g. because
+            there is no such location, or the order has already been started)
+        :raises CafeServerError: if the server response is invalid
+        """
+        return self._call(f"LOCATION {location}", self._decode_location_response(location))
+
+    def send_total_request(self) -> int:
+        """
+        Sends a request for the price of the order, after combos and discounts.
+        :return: the price in cents
+        :raises CafeClientError: if the server response is ERROR (e.g. because the
+            server doesn't price orders)
+        :raises CafeServerError: if the server response is invalid
+        """
+        return self._call("TOTAL", self._decode_number_response())
+
+
+class CafePipeline:
+    """
+    A sequence of requests to be sent to the server without waiting for each
+    response. All the queued requests are written and flushed together, and the
+    responses are then read in order, so a batch of requests costs one round trip
+    instead of one per request.
+    """
+
+    def __init__(self, client: CafeProtocolClient):
+        """
+        Initializes this pipeline.
+        :param client: the client whose channel will be used
+        """
+        self._client = client
+        self._requests: list[tuple[str, Callable[[], Generator]]] = []
+
+    def __len__(self) -> int:
+        return len(self._requests)
+
+    def _queue(self, request: str, decoder: Callable[[], Generator]) -> "CafePipeline":
+        self._requests.append((request, decoder))
+        return self
+
+    def list_menu(self) -> "CafePipeline":
+        """
+        Queues a request for the available menu items. The result is a list of
+        tuples, each containing an item number and string label.
+        :return: this pipeline
+        """
+        return self._queue("LIST MENU", self._client._decode_list_response)
+
+    def list_order(self) -> "CafePipeline":
+        """
+        Queues a request for the items in the client's order. The result is a list
+        of tuples, each containing a line index, a menu item ID and a quantity.
+        :return: this pipeline
+        """
+        return self._queue("LIST ORDER", self._client._decode_order_response)
+
+    def add(self, item_number: int) -> "CafePipeline":
+        """
+        Queues a request to add an item to the order.
+        :param item_number: the menu item number to add
+        :return: this pipeline
+        """
+        return self._queue(f"ADD {item_number}", self._client._decode_response)
+
+    def remove(self, item_number: int) -> "CafePipeline":
+        """
+        Queues a request to remove an item from the order.
+        :param item_number: the index of the item number to remove
+        :return: this pipeline
+        """
+        return self._queue(f"REMOVE {item_number}", self._client._decode_response)
+
+    def commit(self, settlement_token: str) -> "CafePipeline":
+        """
+        Queues a request to commit the order. The result is the reference number
+        for the order.
+        :param settlement_token: some token that proves the customer paid for the order
+        :return: this pipeline
+        """
+        return self._queue(f"COMMIT {settlement_token}", self._client._decode_commit_response)
+
+    def cancel(self) -> "CafePipeline":
+        """
+        Queues a request to cancel the order.
+        :return: this pipeline
+        """
+        return self._queue("CANCEL", self._client._decode_cancel_response)
+
+    def execute(self, raise_on_error: bool = True) -> list:
+        """
+        Sends all the queued requests, then reads their responses in order. The
+        pipeline is empty afterwards, and may be reused.
+        :param raise_on_error: if True, the first ERROR response is raised once all
+            the responses have been read; if False, each ERROR response appears in
+            the results as a `CafeClientError`
+        :return: the result of each request, in the order they were queued
+        :raises CafeClientError: if a response is ERROR and `raise_on_error` is True
+        :raises CafeServerError: if a response is invalid
+        """
+        requests, self._requests = self._requests, []
+        client = self._client
+        client._start_call()
+        for request, decoder in requests:
+            client._io.write_string(request)
+            client._expect_response(decoder())
+        client._io.flush()
+        results = []
+        for _ in requests:
+            try:
+                results.append(client._receive_response())
+            except CafeClientError as err:
+                results.append(err)
+        if raise_on_error:
+            for result in results:
+                if isinstance(result, CafeClientError):
+                    raise result
+        return results
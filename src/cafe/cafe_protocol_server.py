@@ -1,6 +1,13 @@
 
+from typing import Callable
+
+from .cafe_codec import CODECS
+from .cafe_menu import CafeMenu
+from .cafe_metrics import CafeMetrics
+from .cafe_order import CafeOrder
 from .cafe_order_handler import CafeOrderHandler
 from .cafe_io import CafeIO
+from .cafe_limits import MAX_MESSAGE_SIZE
 
 class CafeProtocolServer:
     """
@@ -8,20 +15,45 @@ class CafeProtocolServer:
     responsible for intake of client requests and dispatching to appropriate methods
     of an injected `CafeClientHandler`. It also provides methods that can be used to
     send appropriately formatted responses to the client.
+
+    Requests are dispatched using a table that maps each request verb to the method
+    that parses its arguments, along with the minimum and maximum number of arguments
+    that may follow the verb. Additional verbs can be supported by calling
+    `register_request`.
+
+    If given a `CafeMetrics`, the interpreter records each request it dispatches:
+    the time to split the request and look up its verb (parse), and to carry it
+    out, including the handler's callback and writing its response to the channel
+    (handle). The channel only buffers the response; the transport sends it
+    later, often with the responses to other requests, so sending isn't timed.
+    A request whose response the handler defers (see `defer_response`) is
+    recorded when the response is finished, so its handling includes the
+    deferred work.
     """
 
-    def __init__(self, handler: CafeOrderHandler, io: CafeIO):
+    def __init__(self, handler: CafeOrderHandler, io: CafeIO, metrics: CafeMetrics = None):
         """
         Initializes this instance of the protocol interpreter.
         :param handler: the handler to which requested actions will be delegated
         :param io: the I/O channel to use in receiving and sending protocol
             messages to the client
+        :param metrics: where to record each request; not recorded if not specified
         """
         self._handler = handler
         self._io = io
+        self._metrics = metrics
+        # set when an ERROR response is sent, so that errors can be counted
+        self._error_sent = False
+        # while a response is deferred: its verb, and when its request was parsed and started
+        self._deferred: tuple[str, float, float] = None
+        self._deferring = False
+        # shared with every other instance until a request is registered
+        self._requests = CafeProtocolServer._REQUESTS
+        # while a batch request is dispatched, response lines are collected here
+        self._batch_responses: list[str] = None
 
-    def _send_unrecognized_request_error(self, words: list[str]):
-        self.send_error_response(f"unrecognized {words[0]} request")
+    def _send_unrecognized_request_error(self, verb: str):
+        self.send_error_response(f"unrecognized {verb} request")
 
     def _parse_item_number(self, s: str) -> int:
         try:
@@ -32,45 +64,149 @@ class CafeProtocolServer:
         except ValueError:
             self.send_error_response("invalid item number")
             return -1
-    
-    def _parse_list_request(self, words: list[str]):
-        if len(words) != 2:
-            self._send_unrecognized_request_error(words)
-        elif words[1] == "MENU":
+
+    def _parse_menu_version(self, s: str) -> int:
+        try:
+            version = int(s)
+            if version < 0:
+                raise ValueError
+            return version
+        except ValueError:
+            self.send_error_response("invalid menu version")
+            return -1
+
+    def _parse_item_numbers(self, args: list[str]) -> list[int]:
+        item_numbers = []
+        for arg in args:
+            item_number = self._parse_item_number(arg)
+            if item_number < 0:
+                return None
+            item_numbers.append(item_number)
+        return item_numbers
+
+    def _dispatch_batch(self, action: Callable[[list[int]], None], item_numbers: list[int]):
+        # A batch request gets exactly one response, even if the handler sends
+        # one per item: either the first ERROR response, or the last OK response.
+        self._batch_responses = []
+        try:
+            action(item_numbers)
+        finally:
+            responses, self._batch_responses = self._batch_responses, None
+        errors = [response for response in responses if response.startswith("ERROR ")]
+        if errors:
+            self._write(errors[0])
+        elif responses:
+            self._write(responses[-1])
+
+    def _parse_list_request(self, args: list[str]):
+        what = args[0].upper()
+        if what == "MENU" and len(args) == 1:
             self._handler.handle_list_menu()
-        elif words[1] == "ORDER":
+        elif what == "MENU" and len(args) == 3 and args[1].upper() == "IF-NOT":
+            # LIST MENU IF-NOT <version>
+            version = self._parse_menu_version(args[2])
+            if version >= 0:
+                self._handler.handle_list_menu_if_modified(version)
+        elif what == "ORDER" and len(args) == 1:
             self._handler.handle_list_order()
         else:
-            self._send_unrecognized_request_error(words)
+            self._send_unrecognized_request_error("LIST")
 
-    def _parse_add_request(self, words: list[str]):
-        if len(words) != 2:
-            self._send_unrecognized_request_error(words)
+    def _parse_add_request(self, args: list[str]):
+        item_numbers = self._parse_item_numbers(args)
+        if item_numbers is None:
+            return
+        if len(item_numbers) == 1:
+            self._handler.handle_add_item(item_numbers[0])
         else:
-            item_number = self._parse_item_number(words[1])
-            if item_number >= 0:
-                self._handler.handle_add_item(item_number)
+            self._dispatch_batch(self._handler.handle_add_items, item_numbers)
 
-    def _parse_remove_request(self, words: list[str]):
-        if len(words) != 2:
-            self._send_unrecognized_request_error(words)
+    def _parse_remove_request(self, args: list[str]):
+        item_numbers = self._parse_item_numbers(args)
+        if item_numbers is None:
+            return
+        if len(item_numbers) == 1:
+            self._handler.handle_remove_item(item_numbers[0])
+        elif len(set(item_numbers)) != len(item_numbers):
+            self.send_error_response("duplicate item number")
         else:
-            item_number = self._parse_item_number(words[1])
-            if item_number >= 0:
-                self._handler.handle_remove_item(item_number)
+            self._dispatch_batch(self._handler.handle_remove_items, item_numbers)
 
-    def _parse_commit_request(self, words: list[str]):
-        if len(words) != 2:
-            self._send_unrecognized_request_error(words)
-        else:
-            settlement_token = words[1]
-            self._handler.handle_commit_order(settlement_token)
+    def _parse_commit_request(self, args: list[str]):
+        # the settlement token is passed on exactly as the client sent it
+        self._handler.handle_commit_order(args[0])
+
+    def _parse_cancel_request(self, args: list[str]):
+        self._handler.handle_cancel_order()
 
-    def _parse_cancel_request(self, words: list[str]):
-        if len(words) != 1:
-            self._send_unrecognized_request_error(words)
+    def _parse_codec_request(self, args: list[str]):
+        # the OK response is encoded before switching, so the client receives
+        # it using the codec that was in effect when it sent the request
+        codec = CODECS.get(args[0].upper())
+        set_codec = getattr(self._io, "set_codec", None)
+        if codec is None or set_codec is None:
+            self.send_error_response(f"unsupported codec {args[0]}")
         else:
-            self._handler.handle_cancel_order()
+            self._write(f"OK {codec.name}")
+            set_codec(codec)
+
+    def _parse_total_request(self, args: list[str]):
+        self._call_optional_handler("TOTAL", self._handler.handle_total)
+
+    def _parse_session_request(self, args: list[str]):
+        self._call_optional_handler("SESSION", self._handler.handle_session)
+
+    def _parse_resume_request(self, args: list[str]):
+        self._call_optional_handler("RESUME", self._handler.handle_resume, args[0])
+
+    def _parse_location_request(self, args: list[str]):
+        self._call_optional_handler("LOCATION", self._handler.handle_location, args[0])
+
+    def _call_optional_handler(self, verb: str, handle: Callable, *args):
+        # handlers refuse the requests they don't support by raising
+        # NotImplementedError, before sending any response
+        try:
+            handle(*args)
+        except NotImplementedError:
+            self.send_error_response(f"unsupported {verb} request")
+
+    # the most item numbers allowed in one ADD or REMOVE request: as many as fit
+    # in a request of the default maximum size, at two bytes each (e.g. " 7")
+    MAX_BATCH_ITEMS = (MAX_MESSAGE_SIZE - len("REMOVE")) // 2
+
+    # maps each request verb to (parse method, minimum args, maximum args)
+    _REQUESTS: dict[str, tuple[Callable, int, int]] = {
+        "LIST": (_parse_list_request, 1, 3),
+        "ADD": (_parse_add_request, 1, MAX_BATCH_ITEMS),
+        "REMOVE": (_parse_remove_request, 1, MAX_BATCH_ITEMS),
+        "COMMIT": (_parse_commit_request, 1, 1),
+        "CANCEL": (_parse_cancel_request, 0, 0),
+        "CODEC": (_parse_codec_request, 1, 1),
+        "TOTAL": (_parse_total_request, 0, 0),
+        "SESSION": (_parse_session_request, 0, 0),
+        "RESUME": (_parse_resume_request, 1, 1),
+        "LOCATION": (_parse_location_request, 1, 1),
+    }
+
+    def register_request(self, verb: str, action: Callable[[list[str]], None],
+                         min_args: int = 0, max_args: int = None):
+        """
+        Registers an additional request verb, or replaces the action for an
+        existing one. When a request with the given verb is received with an
+        acceptable number of arguments, `action` is called with the list of
+        argument strings; otherwise an ERROR response is sent.
+        :param verb: the verb that starts the request; not case-sensitive
+        :param action: called to carry out the request; it must send the response
+        :param min_args: the minimum number of arguments that must follow the verb
+        :param max_args: the maximum number of arguments that may follow the verb;
+            the same as `min_args` if not specified
+        :return: None
+        """
+        if self._requests is CafeProtocolServer._REQUESTS:
+            self._requests = dict(CafeProtocolServer._REQUESTS)
+        if max_args is None:
+            max_args = min_args
+        self._requests[verb.upper()] = (lambda server, args: action(args), min_args, max_args)
 
     def receive_next_request(self):
         """
@@ -78,21 +214,85 @@ class CafeProtocolServer:
         and dispatches the request accordingly.
         :return: None
         """
-        request = self._io.read_string()
-        assert request is not None and request.strip() != ""
-        words = [word.upper() for word in request.split()]
-        if words[0] == "LIST":
-            self._parse_list_request(words)
-        elif words[0] == "ADD":
-            self._parse_add_request(words)
-        elif words[0] == "REMOVE":
-            self._parse_remove_request(words)
-        elif words[0] == "COMMIT":
-            self._parse_commit_request(words)
-        elif words[0] == "CANCEL":
-            self._parse_cancel_request(words)
-        else:
+        self.dispatch_request(self._io.read_string())
+
+    def dispatch_request(self, request: str):
+        """
+        Dispatches a request that has already been received from the client.
+        Once the request has been handled, the response is flushed to the client.
+        This allows a transport that reads requests by other means (e.g. asynchronously)
+        to share this interpreter.
+        :param request: the request message received from the client
+        :return: None
+        """
+        assert request
+        metrics = self._metrics
+        if metrics is not None:
+            clock = metrics.clock
+            started = clock()
+            self._error_sent = False
+        words = request.split()
+        verb = words[0]
+        spec = self._requests.get(verb)
+        if spec is None:
+            # clients almost always send the verb in upper case, so a copy is
+            # only made when the lookup fails
+            verb = verb.upper()
+            spec = self._requests.get(verb)
+        if metrics is not None:
+            parsed = clock()
+        if spec is None:
             self.send_error_response("unrecognized request action")
+        else:
+            parse, min_args, max_args = spec
+            # the words that follow the verb are the arguments
+            del words[0]
+            if min_args <= len(words) <= max_args:
+                parse(self, words)
+            else:
+                self._send_unrecognized_request_error(verb)
+        if metrics is None:
+            self._io.flush()
+            return
+        if self._deferring:
+            # the request is recorded once its response is sent
+            self._deferring = False
+            self._deferred = (verb, started, parsed)
+            return
+        self._io.flush()
+        # unrecognized verbs are counted together, so clients can't create labels
+        metrics.record_request(verb if spec is not None else "UNRECOGNIZED", self._error_sent,
+                               parsed - started, clock() - parsed)
+
+    def defer_response(self):
+        """
+        Called by the handler while it handles a request, to send the response
+        later (e.g. once an order has been journaled in the background) by
+        calling `finish_deferred_response`. The request is recorded in the metrics
+        then, with the time until then counted as handling it, and with any ERROR
+        response sent in between counted as its error.
+        :return: None
+        """
+        self._deferring = self._metrics is not None
+
+    def finish_deferred_response(self):
+        """
+        Flushes the response to a request whose response was deferred by
+        `defer_response`, once it has been written, and records the request.
+        :return: None
+        """
+        if self._deferred is None:
+            self._io.flush()
+            return
+        (verb, started, parsed), self._deferred = self._deferred, None
+        self._io.flush()
+        self._metrics.record_request(verb, self._error_sent, parsed - started, self._metrics.clock() - parsed)
+
+    def _write(self, line: str):
+        if self._batch_responses is not None:
+            self._batch_responses.append(line)
+        else:
+            self._io.write_string(line)
 
     def send_menu_items_response(self, items: list[str]):
         """
@@ -100,9 +300,40 @@ class CafeProtocolServer:
         :param items: list of strings representing menu items
         :return: None
         """
-        self._io.write_string(f"OK {len(items)}")
+        self._write(f"OK {len(items)}")
         for i, item in enumerate(items):
-            self._io.write_string(f"{i} {item}")
+            self._write(f"{i} {item}")
+
+    def send_menu_response(self, menu: CafeMenu, versioned: bool = False):
+        """
+        Sends a response containing the ID and label of each available item in a
+        menu snapshot. The encoded response is stored with the snapshot, so that
+        later requests for the same menu version are answered with a single
+        buffer write.
+        :param menu: the menu to send
+        :param versioned: if True, the first line of the response includes the
+            menu's tag as its version (e.g. `OK 3 VERSION 7`), as required in the
+            response to a conditional request
+        :return: None
+        """
+        key = ("LIST MENU", versioned, self._io.block_key())
+        block = menu.encoded_response(key)
+        if block is None:
+            items = menu.available_items
+            first = f"OK {len(items)} VERSION {menu.etag}" if versioned else f"OK {len(items)}"
+            lines = [first]
+            lines.extend(f"{item.item_id} {item.label}" for item in items)
+            block = self._io.encode_block(lines)
+            menu.store_encoded_response(key, block)
+        self._io.write_block(block)
+
+    def send_menu_not_modified_response(self):
+        """
+        Sends the response for a conditional request for the menu, when the
+        client already has the current version.
+        :return: None
+        """
+        self._write("OK NOT-MODIFIED")
 
     def send_order_items_response(self, items: list[int]):
         """
@@ -110,17 +341,30 @@ class CafeProtocolServer:
         :param items: list of each containing a menu item number
         :return: None
         """
-        self._io.write_string(f"OK {len(items)}")
+        self._write(f"OK {len(items)}")
         for i, item_id in enumerate(items):
-            self._io.write_string(f"{i} {item_id}")
+            self._write(f"{i} {item_id}")
+
+    def send_order_response(self, order: CafeOrder):
+        """
+        Sends a response containing the lines of an order. Each line gives the
+        line index, the menu item ID and the quantity, e.g. `0 9 40` for 40 of
+        item 9 on the first line.
+        :param order: the order
+        :return: None
+        """
+        lines = order.lines()
+        self._write(f"OK {len(lines)}")
+        for k, (item_id, quantity) in enumerate(lines):
+            self._write(f"{k} {item_id} {quantity}")
 
     def send_add_item_response(self, num_items: int):
         """
-        Sends the response for a request to add an item to the order.
+        Sends the response for a request to add one or more items to the order.
         :param num_items: the number of items now on the order
         :return: None
         """
-        self._io.write_string(f"OK order has {num_items} item(s)")
+        self._write(f"OK order has {num_items} item(s)")
 
     def send_remove_item_response(self, item_number: int):
         """
@@ -128,7 +372,15 @@ class CafeProtocolServer:
         :param item_number: the item number that was requested to be removed
         :return: None
         """
-        self._io.write_string(f"OK removed item {item_number}")
+        self._write(f"OK removed item {item_number}")
+
+    def send_remove_items_response(self, item_numbers: list[int]):
+        """
+        Sends the response for a request to remove several items from the order.
+        :param item_numbers: the item numbers that were requested to be removed
+        :return: None
+        """
+        self._write(f"OK removed items {' '.join(str(n) for n in item_numbers)}")
 
     def send_commit_order_response(self, order_number: int):
         """
@@ -136,14 +388,46 @@ class CafeProtocolServer:
         :param order_number: a reference number for the committed order
         :return: None
         """
-        self._io.write_string(f"OK {order_number}")
+        self._write(f"OK {order_number}")
 
     def send_cancel_order_response(self):
         """
         Sends the response for a request to cancel the order.
         :return: None
         """
-        self._io.write_string(f"OK canceled")
+        self._write(f"OK canceled")
+
+    def send_session_response(self, token: str):
+        """
+        Sends the response for a request for a session token.
+        :param token: the token with which the client can resume the session
+        :return: None
+        """
+        self._write(f"OK {token}")
+
+    def send_resume_response(self, num_items: int):
+        """
+        Sends the response for a request to resume an interrupted session.
+        :param num_items: the number of items on the resumed order
+        :return: None
+        """
+        self._write(f"OK order has {num_items} item(s)")
+
+    def send_location_response(self, location: str):
+        """
+        Sends the response for a request to place the order at another location.
+        :param location: the name of the location now taking the order
+        :return: None
+        """
+        self._write(f"OK {location}")
+
+    def send_total_response(self, total: int):
+        """
+        Sends the response for a request for the price of the order.
+        :param total: the price of the order in cents
+        :return: None
+        """
+        self._write(f"OK {total}")
 
     def send_error_response(self, message: str):
         """
@@ -151,5 +435,6 @@ class CafeProtocolServer:
         :param message: the message to be sent
         :return: None
         """
-        self._io.write_string(f"ERROR {message}")
+        self._error_sent = True
+        self._write(f"ERROR {message}")
 
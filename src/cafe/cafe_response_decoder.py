@@ -0,0 +1,196 @@
+from typing import Generator
+
+from .cafe_menu_cache import CafeMenuCache
+
+
+class CafeServerError(Exception):
+    """
+    A custom exception type raised when the server sends an invalid response.
+    """
+    pass
+
+
+class CafeClientError(Exception):
+    """
+    A custom exception type raised if the server indicates that we sent an invalid
+    request.
+    """
+    pass
+
+
+class CafeResponseDecoder:
+    """
+    The response-decoding logic of the client side of the Sad Cafe protocol,
+    independent of how messages are received. Each decoder is a generator that
+    is sent the messages of one response as they arrive, and returns the decoded
+    result; a `CafeClientConnection` queues the decoders of the requests awaiting
+    responses, and the clients built on it feed them from their own channels.
+    """
+
+    def __init__(self, menu_cache: CafeMenuCache = None):
+        """
+        Initializes this decoder.
+        :param menu_cache: a cache that is updated with the menus received, which
+            may be shared with other clients
+        """
+        self._menu_cache = menu_cache
+        # the location chosen with a LOCATION request; None for the server's default
+        self._location: str = None
+        self._finished = False
+
+    @property
+    def finished(self) -> bool:
+        """
+        Indicates whether the order has been committed or canceled, after which
+        the server ends the conversation.
+        :return: True if the server accepted a COMMIT or CANCEL request
+        """
+        return self._finished
+
+    def _decode_response(self) -> Generator[None, str, str]:
+        """
+        Decodes the first message of a server response.
+        :return: the string following OK in the server's response
+        :raises CafeClientError: if the server's response is ERROR
+        :raises CafeServerError: if the server's response is unrecognized
+        """
+        response = yield
+        assert response is not None and response.strip() != ""
+        status, message = response.split(maxsplit=1)
+        status = status.upper()
+        if status == "OK":
+            return message
+        elif status == "ERROR":
+            raise CafeClientError(message)
+        else:
+            raise CafeServerError(f"invalid server response '{response}")
+
+    def _decode_number_response(self) -> Generator[None, str, int]:
+        """
+        Decodes the first message of a server response that should contain a number after OK.
+        :return: the number following OK in the server's response
+        :raises CafeClientError: if the server's response is ERROR
+        :raises CafeServerError: if the server's response is unrecognized
+        """
+        s = yield from self._decode_response()
+        try:
+            return int(s)
+        except ValueError:
+            raise CafeServerError(f"invalid number in OK response {s}")
+
+    def _decode_list_response(self) -> Generator[None, str, list[tuple[int, str]]]:
+        """
+        Decodes a server list response. The first line of the response is
+        OK followed by the number of items, N. The next N lines are tuples
+        of the form `k label`, where k is a non-negative integer, and `label`
+        is a string.
+        :return: the list of tuples found in the response
+        :raises CafeClientError: if the server's response is ERROR
+        :raises CafeServerError: if the server's response is unrecognized
+        """
+        num_items = yield from self._decode_number_response()
+        return (yield from self._decode_list_items(num_items))
+
+    def _decode_list_items(self, num_items: int) -> Generator[None, str, list[tuple[int, str]]]:
+        """
+        Decodes the lines of a server list response that follow the first line.
+        :param num_items: the number of lines to decode
+        :return: the list of tuples found in the response
+        :raises CafeServerError: if the server's response is unrecognized
+        """
+        items: list[tuple[int, str]] = []
+        for _ in range(num_items):
+            item = yield
+            assert item is not None and item.strip() != ""
+            k, label = item.split(maxsplit=1)
+            try:
+                items.append((int(k), label))
+            except ValueError:
+                raise CafeServerError(f"invalid item number in list items {k}")
+        return items
+
+    def _decode_commit_response(self) -> Generator[None, str, int]:
+        """
+        Decodes the server response to a COMMIT request.
+        :return: the order number
+        :raises CafeClientError: if the server's response is ERROR
+        :raises CafeServerError: if the server's response is unrecognized
+        """
+        order_number = yield from self._decode_number_response()
+        self._finished = True
+        return order_number
+
+    def _decode_cancel_response(self) -> Generator[None, str, str]:
+        """
+        Decodes the server response to a CANCEL request.
+        :return: the string following OK in the server's response
+        :raises CafeClientError: if the server's response is ERROR
+        :raises CafeServerError: if the server's response is unrecognized
+        """
+        response = yield from self._decode_response()
+        self._finished = True
+        return response
+
+    def _decode_order_response(self) -> Generator[None, str, list[tuple[int, int, int]]]:
+        """
+        Decodes a server response listing the lines of the order. The first line of
+        the response is OK followed by the number of lines, N. The next N lines
+        have the form `k item quantity`, where all three are non-negative
+        integers; a quantity of 1 may be omitted.
+        :return: list of tuples, each containing a line index, a menu item ID and a quantity
+        :raises CafeClientError: if the server's response is ERROR
+        :raises CafeServerError: if the server's response is unrecognized
+        """
+        lines: list[tuple[int, int, int]] = []
+        num_lines = yield from self._decode_number_response()
+        for _ in range(num_lines):
+            line = yield
+            assert line is not None and line.strip() != ""
+            try:
+                numbers = [int(s) for s in line.split()]
+                if len(numbers) == 2:
+                    numbers.append(1)
+                k, item_id, quantity = numbers
+            except ValueError:
+                raise CafeServerError(f"invalid order line {line}")
+            lines.append((k, item_id, quantity))
+        return lines
+
+    def _decode_menu_response(self) -> Generator[None, str, list[tuple[int, str]]]:
+        """
+        Decodes the server response to a conditional request for the menu, and
+        updates the menu cache accordingly. The first line of the response is
+        either OK NOT-MODIFIED, or OK followed by the number of items and
+        (optionally) VERSION and the menu's version number.
+        :return: list of tuples, each containing an item number and string label
+        :raises CafeClientError: if the server's response is ERROR
+        :raises CafeServerError: if the server's response is unrecognized
+        """
+        words = (yield from self._decode_response()).split()
+        if len(words) == 1 and words[0].upper() == "NOT-MODIFIED":
+            return list(self._menu_cache.revalidate(self._location))
+        version = 0
+        try:
+            num_items = int(words[0])
+            if len(words) == 3 and words[1].upper() == "VERSION":
+                version = int(words[2])
+            elif len(words) != 1:
+                raise ValueError
+        except ValueError:
+            raise CafeServerError(f"invalid menu response {' '.join(words)}")
+        items = yield from self._decode_list_items(num_items)
+        self._menu_cache.store(version, items, self._location)
+        return list(items)
+
+    def _decode_location_response(self, location: str) -> Generator[None, str, str]:
+        """
+        Decodes the server response to a LOCATION request. Once the server has
+        accepted the location, menus are cached for that location.
+        :param location: the location that was requested
+        :return: the string following OK in the server's response
+        :raises CafeClientError: if the server's response is ERROR
+        :raises CafeServerError: if the server's response is unrecognized
+        """
+        response = yield from self._decode_response()
+        self._location = location
+        return response
@@ -1,34 +1,181 @@
-import random
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Union
+
+from .cafe_menu import CafeMenu, CafeMenuItem
+from .cafe_pricing import ComboRule, PricingTable, QuantityDiscount, RunningTotal
+from .fulfillment_queue import FulfillmentQueue
+from .fulfillment_sink import FulfillmentOrder, PrintFulfillmentSink
+from .order_journal import OrderJournal
+from .order_number_allocator import OrderNumberAllocator, LocalOrderNumberAllocator
 
 class CafeService:
     """
     A simple service façade representing the order fulfillment service.
+    A single instance may be shared by the sessions of many concurrent clients.
     """
 
-    def __init__(self, menu_items: list[str]):
+    def __init__(self, menu_items: list[Union[CafeMenuItem, str]],
+                 order_numbers: OrderNumberAllocator = None,
+                 fulfillment: FulfillmentQueue = None, journal: OrderJournal = None,
+                 combos: list[ComboRule] = (), discounts: list[QuantityDiscount] = (),
+                 commit_threads: int = 16):
         """
         Initializes this service instance.
-        :param menu_items: menu items to be made available for order
+        :param menu_items: menu items to be made available for order; an item
+            given as a string is given its position in the list as its ID
+        :param order_numbers: the allocator for order numbers; if not specified,
+            an allocator for use within this process is created, which resumes
+            from the journal's numbering if there is one
+        :param fulfillment: the queue through which orders are sent for
+            fulfillment; if not specified, orders are printed
+        :param journal: the journal in which committed orders are recorded
+            before they are acknowledged; if not specified, orders aren't durable
+        :param combos: the combo rules applied to the prices of orders
+        :param discounts: the quantity discount rules applied to the prices of orders
+        :param commit_threads: the number of threads placing orders submitted with
+            `submit_order`, and so the most orders that can share a journal sync
+        :raises ValueError: if the pricing rules are invalid
         """
-        self._next_order_number = random.randrange(100, 1000)
-        self._menu_items = menu_items
+        if order_numbers is None:
+            first_order_number = journal.next_order_number if journal is not None else None
+            order_numbers = LocalOrderNumberAllocator(first_order_number)
+        self._order_numbers = order_numbers
+        self._journal = journal
+        self._fulfillment = fulfillment or FulfillmentQueue(PrintFulfillmentSink())
+        self._commit_threads = commit_threads
+        self._executor: ThreadPoolExecutor = None
+        self._executor_pid: int = None
+        self._executor_lock = threading.Lock()
+        self._combos = tuple(combos)
+        self._discounts = tuple(discounts)
+        self._menu_lock = threading.Lock()
+        self._set_menu(CafeMenu(1, menu_items))
 
-    def menu_items(self) -> list[str]:
+    def _set_menu(self, menu: CafeMenu):
+        # the pricing is compiled first, so it is never older than the menu
+        self._pricing = PricingTable(menu, self._combos, self._discounts)
+        self._menu = menu
+
+    def menu(self) -> CafeMenu:
+        """
+        Gets a snapshot of the current menu.
+        :return: the current menu
+        """
+        return self._menu
+
+    def pricing(self) -> PricingTable:
+        """
+        Gets the pricing of the current menu, with the combo and discount rules
+        compiled into lookup tables. A new table is compiled whenever the menu changes.
+        :return: the current pricing table
+        """
+        return self._pricing
+
+    def menu_items(self) -> tuple[CafeMenuItem, ...]:
         """
         Gets the list of menu items available for orders.
-        :return: list of menu item strings
+        :return: tuple of menu items
+        """
+        return self._menu.available_items
+
+    def update_menu(self, menu_items: list[Union[CafeMenuItem, str]]) -> CafeMenu:
+        """
+        Replaces the whole menu with a new version. Sessions that already hold a
+        snapshot of the previous version are unaffected.
+        :param menu_items: menu items to be made available for order
+        :return: the new menu
         """
-        return self._menu_items
+        with self._menu_lock:
+            self._set_menu(CafeMenu(self._menu.version + 1, menu_items))
+            return self._menu
 
-    def place_order(self, settlement_token: str, ordered_items: list[int]):
+    def update_menu_items(self, menu_items: list[CafeMenuItem]) -> CafeMenu:
         """
-        Places an order for fulfillment.
+        Adds items to the menu, or replaces the items with the same IDs (e.g. to
+        change a price), in a new version of the menu. The IDs of other items are
+        unchanged, so clients holding the previous version can still order them.
+        :param menu_items: the items to add or replace
+        :return: the new menu
+        """
+        with self._menu_lock:
+            self._set_menu(self._menu.updated(menu_items))
+            return self._menu
+
+    def set_menu_item_available(self, item_id: int, available: bool) -> CafeMenu:
+        """
+        Marks an item as in or out of stock, in a new version of the menu.
+        :param item_id: the item's ID
+        :param available: whether the item can be ordered
+        :return: the new menu
+        :raises KeyError: if there is no item with the given ID
+        """
+        with self._menu_lock:
+            item = self._menu.item(item_id)
+            if item is None:
+                raise KeyError(item_id)
+            self._set_menu(self._menu.updated([item._replace(available=available)]))
+            return self._menu
+
+    def place_order(self, settlement_token: str, ordered_items: list[int], total: int = None):
+        """
+        Places an order for fulfillment. The order is recorded in the journal (if
+        any), then queued for delivery by a background thread, so this only waits
+        for the journal's sync, or if the fulfillment queue is full.
         :param settlement_token: some token that proves the customer paid for the order
-        :param ordered_items: the list of menu items for the order
+        :param ordered_items: the IDs of the menu items for the order
+        :param total: the price of the order in cents, if already known (e.g. from
+            the session's `RunningTotal`); otherwise it is computed from the items
         :return: reference number for the order
+        :raises ValueError: if an ordered item is no longer available
+        :raises OSError: if the order couldn't be recorded in the journal
         """
-        order_number = self._next_order_number
-        items = ", ".join([self._menu_items[i] for i in ordered_items])
-        print(f"sending order {order_number} to fulfillment; settlement_token={settlement_token} items={items}")
-        self._next_order_number += 1
+        menu = self._menu
+        for item_id in ordered_items:
+            if not menu.is_available(item_id):
+                raise ValueError(f"menu item {item_id} is not available")
+        if total is None:
+            running_total = RunningTotal(self._pricing)
+            for item_id in ordered_items:
+                running_total.add(item_id)
+            total = running_total.total
+        order_number = self._order_numbers.allocate()
+        items = tuple(menu.item(item_id) for item_id in ordered_items)
+        order = FulfillmentOrder(order_number, settlement_token, items, total)
+        if self._journal is not None:
+            self._journal.append(order)
+        self._fulfillment.put(order)
         return order_number
+
+    def submit_order(self, settlement_token: str, ordered_items: list[int], total: int = None) -> Future:
+        """
+        Places an order for fulfillment on a background thread, for a caller that
+        mustn't wait for the journal's sync or a full fulfillment queue (e.g. an
+        event loop). Orders submitted together are synced to the journal together.
+        :param settlement_token: some token that proves the customer paid for the order
+        :param ordered_items: the IDs of the menu items for the order
+        :param total: the price of the order in cents, if already known
+        :return: a future for the result of `place_order`: the reference number
+            for the order, or the exception it raised
+        """
+        with self._executor_lock:
+            if self._executor_pid != os.getpid():
+                # the threads of a parent process are gone after a fork
+                self._executor = ThreadPoolExecutor(self._commit_threads, thread_name_prefix="commit")
+                self._executor_pid = os.getpid()
+            executor = self._executor
+        return executor.submit(self.place_order, settlement_token, ordered_items, total)
+
+    def close(self):
+        """
+        Waits for placed orders to be delivered for fulfillment, and releases the
+        resources used by this service.
+        :return: None
+        """
+        with self._executor_lock:
+            if self._executor_pid == os.getpid():
+                self._executor.shutdown()
+        self._fulfillment.close()
+        if self._journal is not None:
+            self._journal.close()
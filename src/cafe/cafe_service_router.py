@@ -0,0 +1,71 @@
+from .cafe_service import CafeService
+
+
+class CafeServiceRouter:
+    """
+    Fronts several `CafeService` instances, one per location (e.g. each with its
+    own menu and fulfillment queue), so that one server can take orders for all of
+    them. A session starts at the default location, and a client may choose
+    another with a LOCATION request before its order is started.
+
+    Each service should allocate order numbers that can't collide with those of
+    the other locations, e.g. with a `SnowflakeOrderNumberAllocator` whose node ID
+    is unique to the location, or with `BlockOrderNumberAllocator`s that share
+    one counter of blocks.
+    """
+
+    def __init__(self, services: dict[str, CafeService], default_location: str = None):
+        """
+        Initializes this router.
+        :param services: the service for each location, by location name; a
+            name must be a single word
+        :param default_location: the location at which sessions start; the first
+            location if not specified
+        :raises ValueError: if there are no services, a name isn't a single word,
+            or the default location isn't one of them
+        """
+        if not services:
+            raise ValueError("no locations to route to")
+        for location in services:
+            if not location or len(location.split()) != 1 or location != location.strip():
+                raise ValueError(f"invalid location name '{location}'")
+        if default_location is None:
+            default_location = next(iter(services))
+        elif default_location not in services:
+            raise ValueError(f"unknown default location '{default_location}'")
+        self._services = dict(services)
+        self._default_location = default_location
+
+    @property
+    def locations(self) -> tuple[str, ...]:
+        """
+        Gets the names of the locations.
+        :return: the names, in the order in which their services were given
+        """
+        return tuple(self._services)
+
+    @property
+    def default_location(self) -> str:
+        """
+        Gets the location at which sessions start.
+        :return: the name of the default location
+        """
+        return self._default_location
+
+    def service(self, location: str = None) -> CafeService:
+        """
+        Gets the service for a location.
+        :param location: the name of the location; the default location if not specified
+        :return: the location's service; or None if there is no such location
+        """
+        if location is None:
+            location = self._default_location
+        return self._services.get(location)
+
+    def close(self):
+        """
+        Closes the service for every location.
+        :return: None
+        """
+        for service in self._services.values():
+            service.close()
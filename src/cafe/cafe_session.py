@@ -0,0 +1,54 @@
+from abc import ABC, abstractmethod
+from concurrent.futures import Future
+
+
+class CafeSession(ABC):
+    """
+    The server side of a conversation with one connected client. A server creates
+    a session for each accepted connection, passes it each request received on the
+    connection, and closes the connection once the session is done.
+    """
+
+    @property
+    @abstractmethod
+    def done(self) -> bool:
+        """
+        Indicates whether the conversation is over (e.g. the order was committed
+        or canceled), so that the server should close the connection.
+        :return: True if no more requests should be served
+        """
+        pass
+
+    @abstractmethod
+    def serve_request(self, request: str) -> Future:
+        """
+        Serves one request received from the client. The response is sent via the
+        `CafeIO` channel the session was created with.
+
+        A response that must wait for something slow (e.g. for an order to be
+        synced to the journal) may be deferred, so that the server isn't blocked
+        meanwhile: the session returns a future that is done when the response
+        can be completed, and the server serves no more of the client's requests
+        until it has called `complete_request` with that future.
+        :param request: the request message received from the client
+        :return: None; or a future, if the response is deferred
+        """
+        pass
+
+    def complete_request(self, future: Future):
+        """
+        Completes a response deferred by `serve_request`, once its future is done.
+        The server calls this on its own thread (e.g. its event loop), so the
+        session may use its channel. The default implementation does nothing.
+        :param future: the future returned by `serve_request`
+        :return: None
+        """
+        pass
+
+    def close(self):
+        """
+        Called by the server when the connection has ended, whether or not the
+        session is done. The default implementation does nothing.
+        :return: None
+        """
+        pass
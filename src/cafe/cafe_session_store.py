@@ -0,0 +1,179 @@
+import os
+import pickle
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable
+
+
+class CafeSessionStore:
+    """
+    Keeps the state of interrupted sessions (e.g. an order in progress), so that
+    a client that reconnects can resume where it left off. The state is stored
+    under a session token issued to the client, and is dropped once it has not
+    been resumed for the time to live.
+
+    The number of stored sessions is bounded: when the store is full, the session
+    saved least recently is evicted. A store may be shared by the sessions of many
+    threads, but each process has its own sessions; the worker processes of a
+    pre-fork server should share a `SqliteCafeSessionStore`, since a client that
+    reconnects may reach any of them.
+    """
+
+    def __init__(self, max_sessions: int = 10000, ttl: float = 600.0,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        Initializes this store, which is initially empty.
+        :param max_sessions: the maximum number of sessions stored
+        :param ttl: the number of seconds for which a saved session can be resumed
+        :param clock: a function that returns the current time in seconds
+        """
+        self._max_sessions = max_sessions
+        self._ttl = ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+        # maps each token to (expiry time, state), least recently saved first
+        self._sessions: OrderedDict[str, tuple[float, object]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    @staticmethod
+    def new_token() -> str:
+        """
+        Issues a new session token, which can't feasibly be guessed.
+        :return: a token consisting of URL-safe characters
+        """
+        return secrets.token_urlsafe(16)
+
+    def save(self, token: str, state: object):
+        """
+        Saves the state of a session, replacing any state saved with the same token.
+        :param token: the session's token
+        :param state: the state to be restored when the session is resumed; it
+            must not be changed after it is saved
+        :return: None
+        """
+        now = self._clock()
+        with self._lock:
+            self._sessions[token] = (now + self._ttl, state)
+            self._sessions.move_to_end(token)
+            # sessions expire in the order they were saved
+            while self._sessions:
+                oldest_token, (expiry, _) = next(iter(self._sessions.items()))
+                if expiry > now and len(self._sessions) <= self._max_sessions:
+                    break
+                del self._sessions[oldest_token]
+
+    def take(self, token: str) -> object:
+        """
+        Removes a saved session from the store, so that it can be resumed by
+        exactly one client.
+        :param token: the session's token
+        :return: the session's state, or None if there is no saved session with
+            the given token or it has expired
+        """
+        with self._lock:
+            expiry, state = self._sessions.pop(token, (0.0, None))
+        if expiry <= self._clock():
+            return None
+        return state
+
+    def close(self):
+        """
+        Releases any resources held by the store; this store holds none.
+        :return: None
+        """
+
+
+class SqliteCafeSessionStore(CafeSessionStore):
+    """
+    A session store kept in a `sessions` table in an SQLite database, so that the
+    processes sharing the file (e.g. the workers of a pre-fork server) share the
+    sessions. The state of each session is pickled, so it must be picklable, and
+    the clock must be shared by the processes (as `time.monotonic` is on one host).
+
+    Each process opens its own connection to the database when it first uses the
+    store, so a store may be created before a pre-fork server forks its workers.
+    """
+
+    def __init__(self, path: str, max_sessions: int = 10000, ttl: float = 600.0,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        Initializes this store. Sessions already in the database are kept.
+        :param path: the path of the database file; it is created if it doesn't exist
+        :param max_sessions: the maximum number of sessions stored
+        :param ttl: the number of seconds for which a saved session can be resumed
+        :param clock: a function that returns the current time in seconds, which
+            must be shared by the processes using the database
+        """
+        super().__init__(max_sessions, ttl, clock)
+        self._path = path
+        self._db: "sqlite3.Connection" = None
+        self._pid: int = None
+
+    def _connect(self) -> "sqlite3.Connection":
+        # called with the lock held
+        if self._pid != os.getpid():
+            # a parent process's connection is unusable after a fork; sqlite3 is
+            # imported here, so that processes using the other stores don't load SQLite
+            import sqlite3
+            self._db = sqlite3.connect(self._path, timeout=10.0, isolation_level=None,
+                                       check_same_thread=False)
+            self._db.execute("CREATE TABLE IF NOT EXISTS sessions ("
+                             "token TEXT PRIMARY KEY, expiry REAL NOT NULL, state BLOB NOT NULL)")
+            self._db.execute("CREATE INDEX IF NOT EXISTS sessions_expiry ON sessions (expiry)")
+            self._pid = os.getpid()
+        return self._db
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._connect().execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+    def save(self, token: str, state: object):
+        now = self._clock()
+        state = pickle.dumps(state)
+        with self._lock:
+            db = self._connect()
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                # the session saved most recently has the highest row ID
+                db.execute("DELETE FROM sessions WHERE token = ?", (token,))
+                db.execute("INSERT INTO sessions (token, expiry, state) VALUES (?, ?, ?)",
+                           (token, now + self._ttl, state))
+                db.execute("DELETE FROM sessions WHERE expiry <= ?", (now,))
+                excess = db.execute("SELECT COUNT(*) FROM sessions").fetchone()[0] - self._max_sessions
+                if excess > 0:
+                    db.execute("DELETE FROM sessions WHERE rowid IN "
+                               "(SELECT rowid FROM sessions ORDER BY rowid LIMIT ?)", (excess,))
+                db.execute("COMMIT")
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+
+    def take(self, token: str) -> object:
+        with self._lock:
+            db = self._connect()
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                row = db.execute("SELECT expiry, state FROM sessions WHERE token = ?", (token,)).fetchone()
+                db.execute("DELETE FROM sessions WHERE token = ?", (token,))
+                db.execute("COMMIT")
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+        if row is None or row[0] <= self._clock():
+            return None
+        return pickle.loads(row[1])
+
+    def close(self):
+        """
+        Closes this process's connection to the database. The sessions are kept.
+        :return: None
+        """
+        with self._lock:
+            if self._pid == os.getpid():
+                self._db.close()
+            self._db = None
+            self._pid = None
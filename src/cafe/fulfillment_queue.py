@@ -0,0 +1,122 @@
+import os
+import queue
+import sys
+import threading
+import time
+
+from .fulfillment_sink import FulfillmentOrder, FulfillmentSink
+
+
+class FulfillmentQueue:
+    """
+    A bounded queue of committed orders, drained by a background thread that
+    delivers them to a `FulfillmentSink` in batches. Placing an order only waits
+    for the sink when the queue is full, which slows the committing clients down
+    to the rate at which the sink can accept orders.
+
+    The worker thread is started when the first order is put in the queue, in
+    the process that puts it, so a queue may be created before a pre-fork server
+    forks its workers; each worker process then drains its own queue.
+
+    A batch the sink fails to accept (e.g. while a fulfillment service restarts)
+    is delivered again after a delay that doubles with each failure, while later
+    orders wait in the queue. Delivery is at least once, so a sink that failed
+    part way through a batch sees those orders again. Only a batch that fails
+    every attempt is dropped, with a report on stderr; a journal still holds its
+    orders.
+    """
+
+    def __init__(self, sink: FulfillmentSink, max_size: int = 1024, max_batch_size: int = 100,
+                 max_attempts: int = 10, retry_delay: float = 0.1, max_retry_delay: float = 5.0):
+        """
+        Initializes this queue.
+        :param sink: the sink to which orders are delivered
+        :param max_size: the maximum number of orders waiting for delivery
+        :param max_batch_size: the maximum number of orders delivered at once
+        :param max_attempts: the number of times a batch is offered to the sink
+        :param retry_delay: the number of seconds to wait before the first retry
+        :param max_retry_delay: the most seconds to wait before any retry
+        """
+        self._sink = sink
+        self._max_size = max_size
+        self._max_batch_size = max_batch_size
+        self._max_attempts = max_attempts
+        self._retry_delay = retry_delay
+        self._max_retry_delay = max_retry_delay
+        self._lock = threading.Lock()
+        self._queue: queue.Queue = None
+        self._worker: threading.Thread = None
+        self._pid: int = None
+        self._closed = False
+
+    def _start(self) -> queue.Queue:
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("fulfillment queue is closed")
+            if self._pid != os.getpid():
+                # the queue and worker of a parent process are unusable after a fork
+                self._queue = queue.Queue(self._max_size)
+                self._worker = threading.Thread(target=self._run, args=(self._queue,),
+                                                name="fulfillment", daemon=True)
+                self._worker.start()
+                self._pid = os.getpid()
+            return self._queue
+
+    def put(self, order: FulfillmentOrder, timeout: float = None):
+        """
+        Adds an order to the queue, waiting for space if the queue is full.
+        :param order: the order to deliver
+        :param timeout: the maximum number of seconds to wait; no limit if not specified
+        :return: None
+        :raises queue.Full: if there is no space before the timeout expires
+        :raises RuntimeError: if the queue has been closed
+        """
+        orders = self._queue if self._pid == os.getpid() and not self._closed else self._start()
+        orders.put(order, timeout=timeout)
+
+    def _run(self, orders: queue.Queue):
+        while True:
+            order = orders.get()
+            batch = []
+            while order is not None:
+                batch.append(order)
+                if len(batch) == self._max_batch_size:
+                    break
+                try:
+                    order = orders.get_nowait()
+                except queue.Empty:
+                    break
+            if batch:
+                self._deliver(batch)
+            if order is None:
+                return
+
+    def _deliver(self, batch: list[FulfillmentOrder]):
+        delay = self._retry_delay
+        for attempt in range(1, self._max_attempts + 1):
+            try:
+                self._sink.deliver(batch)
+                return
+            except Exception as err:
+                if attempt == self._max_attempts:
+                    print(f"failed to deliver orders {[o.order_number for o in batch]}: {err}",
+                          file=sys.stderr)
+                    return
+            time.sleep(delay)
+            delay = min(delay * 2, self._max_retry_delay)
+
+    def close(self):
+        """
+        Delivers the orders remaining in the queue, stops the worker thread, and
+        closes the sink.
+        :return: None
+        """
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            running = self._pid == os.getpid()
+        if running:
+            self._queue.put(None)
+            self._worker.join()
+        self._sink.close()
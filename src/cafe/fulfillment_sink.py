@@ -0,0 +1,196 @@
+import json
+import socket
+import sys
+from abc import ABC, abstractmethod
+from typing import TYPE_CHECKING, NamedTuple, TextIO
+
+if TYPE_CHECKING:
+    import sqlite3
+
+from .cafe_menu import CafeMenuItem
+
+
+class FulfillmentOrder(NamedTuple):
+    """
+    A committed order on its way to fulfillment.
+    """
+    # the reference number given to the client
+    order_number: int
+    # the token that proves the customer paid for the order
+    settlement_token: str
+    # the ordered menu items
+    items: tuple[CafeMenuItem, ...]
+    # the price of the order in cents, after combos and discounts
+    total: int = 0
+
+    def to_json(self) -> str:
+        """
+        Represents this order as a line of JSON (without the newline), giving
+        the ID and label of each item, and the total if it isn't zero (so orders
+        from an unpriced menu are represented as they were before totals were kept).
+        :return: JSON text
+        """
+        d = {
+            "order_number": self.order_number,
+            "settlement_token": self.settlement_token,
+            "items": [[item.item_id, item.label] for item in self.items],
+        }
+        if self.total:
+            d["total"] = self.total
+        return json.dumps(d)
+
+    @classmethod
+    def from_json(cls, s: str) -> "FulfillmentOrder":
+        """
+        Reconstructs an order from its representation as JSON.
+        :param s: JSON text produced by `to_json`
+        :return: the order
+        :raises ValueError: if `s` doesn't represent an order
+        """
+        try:
+            d = json.loads(s)
+            return cls(int(d["order_number"]), str(d["settlement_token"]),
+                       tuple(CafeMenuItem(int(item_id), str(label)) for item_id, label in d["items"]),
+                       int(d.get("total", 0)))
+        except (KeyError, TypeError) as err:
+            raise ValueError(f"invalid order {s!r}") from err
+
+
+class FulfillmentSink(ABC):
+    """
+    The destination to which committed orders are delivered for fulfillment.
+    A sink is only used by the worker thread of a `FulfillmentQueue`, so it needn't
+    be safe for use by many threads.
+    """
+
+    @abstractmethod
+    def deliver(self, orders: list[FulfillmentOrder]):
+        """
+        Delivers a batch of orders. Delivering many orders at once should cost
+        little more than delivering one (e.g. one write or one transaction).
+        :param orders: the orders, in the order in which they were placed
+        :return: None
+        """
+        pass
+
+    def close(self):
+        """
+        Releases the resources used by this sink. The default implementation does nothing.
+        :return: None
+        """
+        pass
+
+
+class PrintFulfillmentSink(FulfillmentSink):
+    """
+    A sink that "fulfills" orders by printing them.
+    """
+
+    def __init__(self, file: TextIO = None):
+        """
+        Initializes this sink.
+        :param file: the stream on which orders are printed; standard output if
+            not specified
+        """
+        self._file = file
+
+    def deliver(self, orders: list[FulfillmentOrder]):
+        file = self._file or sys.stdout
+        for order in orders:
+            items = ", ".join(item.label for item in order.items)
+            print(f"sending order {order.order_number} to fulfillment; "
+                  f"settlement_token={order.settlement_token} items={items} "
+                  f"total={order.total // 100}.{order.total % 100:02d}", file=file)
+        file.flush()
+
+
+class FileFulfillmentSink(FulfillmentSink):
+    """
+    A sink that appends each order to a file, as a line of JSON.
+    """
+
+    def __init__(self, path: str):
+        """
+        Initializes this sink.
+        :param path: the path of the file; it is created if it doesn't exist
+        """
+        self._file = open(path, "a", encoding="utf-8")
+
+    def deliver(self, orders: list[FulfillmentOrder]):
+        self._file.write("".join(order.to_json() + "\n" for order in orders))
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+class SocketFulfillmentSink(FulfillmentSink):
+    """
+    A sink that sends each order, as a line of JSON, to a fulfillment process
+    listening on a local (Unix domain) stream socket.
+    """
+
+    def __init__(self, path: str):
+        """
+        Initializes this sink. The connection is made when the first orders are
+        delivered, and again after it fails.
+        :param path: the path of the socket
+        """
+        self._path = path
+        self._sock: socket.socket = None
+
+    def deliver(self, orders: list[FulfillmentOrder]):
+        data = "".join(order.to_json() + "\n" for order in orders).encode("utf-8")
+        if self._sock is None:
+            self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self._sock.connect(self._path)
+        try:
+            self._sock.sendall(data)
+        except OSError:
+            self.close()
+            raise
+
+    def close(self):
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+
+
+class SqliteFulfillmentSink(FulfillmentSink):
+    """
+    A sink that inserts orders into an `orders` table in an SQLite database,
+    using one transaction for each batch. The total of each order is kept in
+    cents; a table created before totals were kept gains the column.
+    """
+
+    def __init__(self, path: str):
+        """
+        Initializes this sink. The database is opened when the first orders are
+        delivered, so that it is only used by the worker thread.
+        :param path: the path of the database file; it is created if it doesn't exist
+        """
+        self._path = path
+        self._db: "sqlite3.Connection" = None
+
+    def deliver(self, orders: list[FulfillmentOrder]):
+        if self._db is None:
+            # imported here, so that processes using the other sinks don't load SQLite
+            import sqlite3
+            self._db = sqlite3.connect(self._path, check_same_thread=False)
+            self._db.execute("CREATE TABLE IF NOT EXISTS orders ("
+                             "order_number INTEGER PRIMARY KEY, settlement_token TEXT, items TEXT, "
+                             "total INTEGER NOT NULL DEFAULT 0)")
+            columns = [row[1] for row in self._db.execute("PRAGMA table_info(orders)")]
+            if "total" not in columns:
+                self._db.execute("ALTER TABLE orders ADD COLUMN total INTEGER NOT NULL DEFAULT 0")
+        with self._db:
+            self._db.executemany(
+                "INSERT INTO orders (order_number, settlement_token, items, total) VALUES (?, ?, ?, ?)",
+                [(order.order_number, order.settlement_token,
+                  json.dumps([[item.item_id, item.label] for item in order.items]), order.total)
+                 for order in orders])
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
@@ -0,0 +1,162 @@
+import os
+import threading
+import time
+
+from .fulfillment_sink import FulfillmentOrder
+
+
+class OrderJournal:
+    """
+    An append-only file recording every committed order, one line of JSON per
+    order, so that orders survive a crash and order numbering can resume where
+    it left off.
+
+    An order is only acknowledged once it has been synced to disk. Appends are
+    written by a background thread using group commit: it waits for a short
+    window after the first pending order, then writes every pending order and
+    syncs them with a single fsync, so that many concurrent commits share the
+    cost of one.
+
+    The file is opened in append mode, so the worker processes of a pre-fork
+    server may share one journal; the writer thread is started in each process
+    the first time it appends.
+    """
+
+    def __init__(self, path: str, commit_window: float = 0.002):
+        """
+        Opens a journal, creating the file if it doesn't exist, and checks the
+        orders it contains to find where numbering should resume. A partially
+        written record at the end of the file (e.g. from a crash during a write)
+        is discarded.
+        :param path: the path of the journal file
+        :param commit_window: the number of seconds to wait for more orders to
+            share a sync, after an order is appended while none are pending
+        :raises ValueError: if a record before the last is corrupt
+        """
+        self._path = path
+        self._commit_window = commit_window
+        # only the largest order number is kept, not the journal's history
+        self._last_order_number = self._recover()
+        self._condition = threading.Condition()
+        self._pending: list[str] = []
+        # orders are counted as they are appended, and as they become durable
+        self._appended = 0
+        self._synced = 0
+        self._error: OSError = None
+        self._fd: int = None
+        self._writer: threading.Thread = None
+        self._pid: int = None
+        self._closed = False
+
+    def _recover(self) -> int:
+        # the journal is read a record at a time, so its size doesn't matter
+        try:
+            f = open(self._path, "rb")
+        except FileNotFoundError:
+            return None
+        last_order_number = None
+        start = 0
+        with f:
+            size = os.fstat(f.fileno()).st_size
+            for record in f:
+                try:
+                    if not record.endswith(b"\n"):
+                        raise ValueError("incomplete record")
+                    order_number = FulfillmentOrder.from_json(record.decode("utf-8")).order_number
+                except ValueError:
+                    if start + len(record) < size:
+                        raise ValueError(f"corrupt record at offset {start} of journal {self._path}")
+                    # only the last record can have been torn by a crash
+                    os.truncate(self._path, start)
+                    break
+                if last_order_number is None or order_number > last_order_number:
+                    last_order_number = order_number
+                start += len(record)
+        return last_order_number
+
+    @property
+    def next_order_number(self) -> int:
+        """
+        Gets the number that follows the largest order number in the journal
+        when it was opened, from which order numbering should resume.
+        :return: the next order number, or None if the journal was empty
+        """
+        if self._last_order_number is None:
+            return None
+        return self._last_order_number + 1
+
+    def _start(self):
+        # called with the condition's lock held; the writer thread and file
+        # descriptor of a parent process are unusable after a fork
+        if self._closed:
+            raise RuntimeError("order journal is closed")
+        self._fd = os.open(self._path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        self._pending = []
+        self._appended = self._synced = 0
+        self._error = None
+        self._writer = threading.Thread(target=self._run, name="order-journal", daemon=True)
+        self._writer.start()
+        self._pid = os.getpid()
+
+    def append(self, order: FulfillmentOrder):
+        """
+        Appends an order to the journal, and waits until it has been synced to disk.
+        :param order: the committed order
+        :return: None
+        :raises OSError: if the journal couldn't be written
+        :raises RuntimeError: if the journal has been closed
+        """
+        record = order.to_json() + "\n"
+        with self._condition:
+            if self._pid != os.getpid() or self._closed:
+                self._start()
+            self._pending.append(record)
+            self._appended += 1
+            sequence = self._appended
+            self._condition.notify_all()
+            while self._synced < sequence:
+                if self._error is not None:
+                    raise self._error
+                self._condition.wait()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._pending and not self._closed:
+                    self._condition.wait()
+                if not self._pending:
+                    return
+            if self._commit_window > 0:
+                time.sleep(self._commit_window)
+            with self._condition:
+                data = "".join(self._pending).encode("utf-8")
+                self._pending = []
+                sequence = self._appended
+            try:
+                view = memoryview(data)
+                while view:
+                    view = view[os.write(self._fd, view):]
+                os.fsync(self._fd)
+            except OSError as err:
+                with self._condition:
+                    self._error = err
+                    self._condition.notify_all()
+                return
+            with self._condition:
+                self._synced = sequence
+                self._condition.notify_all()
+
+    def close(self):
+        """
+        Waits for pending orders to be synced, and closes the journal.
+        :return: None
+        """
+        with self._condition:
+            if self._closed:
+                return
+            self._closed = True
+            running = self._pid == os.getpid()
+            self._condition.notify_all()
+        if running:
+            self._writer.join()
+            os.close(self._fd)
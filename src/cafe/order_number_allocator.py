@@ -0,0 +1,177 @@
+import os
+import random
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Callable
+
+
+def _random_first_order_number() -> int:
+    return random.randrange(100, 1000)
+
+
+# the time from which `SnowflakeOrderNumberAllocator` counts, in milliseconds
+# since the Unix epoch (2026-01-01 00:00 UTC)
+SNOWFLAKE_EPOCH = 1767225600000
+
+
+class OrderNumberAllocator(ABC):
+    """
+    A source of reference numbers for committed orders. Every call to `allocate`
+    must return a number that has not been returned before, even when called
+    concurrently.
+    """
+
+    @abstractmethod
+    def allocate(self) -> int:
+        """
+        Allocates the next order number.
+        :return: an order number that has not been allocated before
+        """
+        pass
+
+
+class LocalOrderNumberAllocator(OrderNumberAllocator):
+    """
+    An allocator for use within a single process, safe for use by many threads.
+    """
+
+    def __init__(self, first_order_number: int = None):
+        """
+        Initializes this allocator.
+        :param first_order_number: the first number to allocate; if not specified
+            a random number between 100 and 999 is used
+        """
+        if first_order_number is None:
+            first_order_number = _random_first_order_number()
+        self._next_order_number = first_order_number
+        self._lock = threading.Lock()
+
+    def allocate(self) -> int:
+        with self._lock:
+            order_number = self._next_order_number
+            self._next_order_number += 1
+        return order_number
+
+
+class SharedOrderNumberAllocator(OrderNumberAllocator):
+    """
+    An allocator whose counter lives in shared memory, so that it can be used by
+    all the processes forked after it is created (e.g. by a pre-fork server), as
+    well as by many threads in each process.
+    """
+
+    def __init__(self, first_order_number: int = None):
+        """
+        Initializes this allocator.
+        :param first_order_number: the first number to allocate; if not specified
+            a random number between 100 and 999 is used
+        """
+        # imported here, since only servers with worker processes need shared memory
+        import multiprocessing
+        if first_order_number is None:
+            first_order_number = _random_first_order_number()
+        self._next_order_number = multiprocessing.Value("q", first_order_number)
+
+    def allocate(self) -> int:
+        with self._next_order_number.get_lock():
+            order_number = self._next_order_number.value
+            self._next_order_number.value = order_number + 1
+        return order_number
+
+
+class SnowflakeOrderNumberAllocator(OrderNumberAllocator):
+    """
+    An allocator that needs no coordination with any other: each order number
+    combines the time in milliseconds, a node ID, and a sequence number within
+    the millisecond. Allocators with different node IDs (e.g. one per location
+    and process) never return the same number, however many there are, so no
+    counter needs to be shared between them. Safe for use by many threads.
+
+    The numbers from one allocator increase, even if the system clock is set
+    back. When a millisecond's sequence numbers run out, the allocator borrows
+    the next millisecond rather than waiting for it.
+
+    A copy of an allocator in a forked process has the same node ID, so each
+    worker process must create its own, with a node ID of its own.
+    """
+
+    def __init__(self, node_id: int, node_bits: int = 10, sequence_bits: int = 12,
+                 epoch: int = SNOWFLAKE_EPOCH, clock: Callable[[], float] = time.time):
+        """
+        Initializes this allocator.
+        :param node_id: the ID that distinguishes this allocator's numbers from
+            those of every other allocator; between 0 and 2 ** node_bits - 1
+        :param node_bits: the number of bits of each order number that hold the node ID
+        :param sequence_bits: the number of bits of each order number that hold
+            the sequence number, which limits the numbers per millisecond
+        :param epoch: the time in milliseconds since the Unix epoch from which
+            the time in each order number is counted
+        :param clock: a function that returns the current time in seconds since
+            the Unix epoch
+        :raises ValueError: if the node ID doesn't fit in `node_bits`
+        """
+        if not 0 <= node_id < 1 << node_bits:
+            raise ValueError(f"node ID must be between 0 and {(1 << node_bits) - 1}")
+        self._node = node_id << sequence_bits
+        self._time_shift = node_bits + sequence_bits
+        self._max_sequence = (1 << sequence_bits) - 1
+        self._epoch = epoch
+        self._clock = clock
+        self._last_time = 0
+        self._sequence = 0
+        self._lock = threading.Lock()
+
+    def allocate(self) -> int:
+        now = int(self._clock() * 1000) - self._epoch
+        with self._lock:
+            if now > self._last_time:
+                self._last_time = now
+                self._sequence = 0
+            elif self._sequence < self._max_sequence:
+                self._sequence += 1
+            else:
+                self._last_time += 1
+                self._sequence = 0
+            return self._last_time << self._time_shift | self._node | self._sequence
+
+
+class BlockOrderNumberAllocator(OrderNumberAllocator):
+    """
+    An allocator that leases blocks of consecutive order numbers from a shared
+    counter, and allocates from its block without coordination until the block
+    is used up. Block k holds the numbers from k * block_size up to
+    (k + 1) * block_size - 1, so the shared counter (e.g. a
+    `SharedOrderNumberAllocator` in a pre-fork server, or an allocator backed by
+    a central database for several sites) is consulted once per block, and any
+    number of these allocators can share it. Safe for use by many threads.
+
+    Numbers are unique but not consecutive across allocators, and the unused
+    numbers of a block are skipped when its process exits. A forked process
+    leases blocks of its own, rather than sharing its parent's.
+    """
+
+    def __init__(self, blocks: OrderNumberAllocator, block_size: int = 1000):
+        """
+        Initializes this allocator. No block is leased until the first order
+        number is allocated.
+        :param blocks: the allocator of block numbers, shared by every
+            allocator that must not duplicate this one's order numbers
+        :param block_size: the number of order numbers in each block
+        """
+        self._blocks = blocks
+        self._block_size = block_size
+        self._next_order_number = 0
+        self._block_end = 0
+        self._pid: int = None
+        self._lock = threading.Lock()
+
+    def allocate(self) -> int:
+        with self._lock:
+            if self._next_order_number == self._block_end or self._pid != os.getpid():
+                self._next_order_number = self._blocks.allocate() * self._block_size
+                self._block_end = self._next_order_number + self._block_size
+                self._pid = os.getpid()
+            order_number = self._next_order_number
+            self._next_order_number += 1
+        return order_number
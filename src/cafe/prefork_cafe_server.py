@@ -0,0 +1,192 @@
+import os
+import signal
+import socket
+import sys
+from multiprocessing.connection import wait
+from typing import Callable, NamedTuple
+
+from .cafe_io import CafeIO
+from .cafe_limits import CafeLimits
+from .cafe_metrics import CafeMetrics
+from .cafe_session import CafeSession
+from .threaded_cafe_server import ThreadedCafeServer
+from .worker_launcher import WarmWorkerLauncher
+
+
+class _WorkerConfig(NamedTuple):
+    # what a worker process needs to serve, which is pickled for a launched worker
+    session_factory: Callable[[CafeIO], CafeSession]
+    host: str
+    port: int
+    threads: int
+    worker_exit: Callable[[], None]
+    worker_init: Callable[[int], None]
+    metrics: CafeMetrics
+    limits: CafeLimits
+
+
+def _run_worker(config: _WorkerConfig, worker_number: int, listen_socket: socket.socket = None):
+    # terminating a worker unwinds its main thread, so `worker_exit` is called
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    status = 0
+    try:
+        if config.worker_init is not None:
+            config.worker_init(worker_number)
+        if listen_socket is None:
+            server = ThreadedCafeServer(config.session_factory, config.host, config.port,
+                                        config.threads, reuse_port=True,
+                                        metrics=config.metrics, limits=config.limits)
+        else:
+            server = ThreadedCafeServer(config.session_factory, max_workers=config.threads,
+                                        listen_socket=listen_socket, metrics=config.metrics,
+                                        limits=config.limits)
+        server.serve_forever()
+    except (KeyboardInterrupt, SystemExit):
+        pass
+    except BaseException:
+        status = 1
+    finally:
+        try:
+            if config.worker_exit is not None:
+                config.worker_exit()
+        finally:
+            os._exit(status)
+
+
+class PreforkCafeServer:
+    """
+    A server that forks several worker processes, each running a `ThreadedCafeServer`,
+    so that client sessions are spread across all the available cores.
+
+    Where the platform supports `SO_REUSEPORT`, each worker listens on its own
+    socket bound to the same port and the kernel balances connections among them.
+    Otherwise the workers accept from one listening socket inherited from the parent.
+
+    Objects shared by the sessions (e.g. the `CafeService`) must be created before
+    the server is started; state that must be consistent across the workers, such
+    as the order number counter, should use a `SharedOrderNumberAllocator`. Work
+    a worker must finish before it exits (e.g. closing the service, so that queued
+    orders are delivered) can be done by a `worker_exit` function, and work a
+    worker must do before serving (e.g. exposing its metrics on a port of its own)
+    by a `worker_init` function.
+
+    By default the workers are forked from the server's process, so they inherit
+    everything it has created. With a `WarmWorkerLauncher`, they are started from
+    the launcher's template process instead, which is safe however many threads
+    the server's process runs, and cheap once the template has imported the
+    modules the workers need; the session factory, the functions, the metrics
+    and the limits are then pickled, so they must be picklable.
+    """
+
+    def __init__(self, session_factory: Callable[[CafeIO], CafeSession],
+                 host: str = "", port: int = 0, processes: int = None,
+                 threads_per_process: int = 32, worker_exit: Callable[[], None] = None,
+                 worker_init: Callable[[int], None] = None, metrics: CafeMetrics = None,
+                 limits: CafeLimits = None, launcher: WarmWorkerLauncher = None):
+        """
+        Initializes this server.
+        :param session_factory: called (in a worker process) with the channel for
+            each accepted connection to create the session that will serve it
+        :param host: the address on which to listen; all interfaces if empty
+        :param port: the TCP port on which to listen; any free port if zero
+        :param processes: the number of worker processes; one per CPU if not specified
+        :param threads_per_process: the number of threads serving connections in
+            each worker process
+        :param worker_exit: called in each worker process when it stops serving,
+            including when it is terminated by `close`
+        :param worker_init: called in each worker process before it starts
+            serving, with the worker's number (from zero)
+        :param metrics: where each worker counts its sessions and the bytes
+            transferred; each worker process has its own copy
+        :param limits: the limits placed on each session; none if not specified
+        :param launcher: starts the worker processes; they are forked from this
+            process if not specified
+        """
+        self._session_factory = session_factory
+        self._host = host
+        self._port = port
+        self._processes = processes or os.cpu_count() or 1
+        self._threads_per_process = threads_per_process
+        self._worker_exit = worker_exit
+        self._worker_init = worker_init
+        self._metrics = metrics
+        self._limits = limits
+        self._launcher = launcher
+        self._reuse_port = hasattr(socket, "SO_REUSEPORT")
+        self._socket: socket.socket = None
+        # the PIDs of forked workers, or the processes started by the launcher
+        self._workers: list = []
+
+    @property
+    def port(self) -> int:
+        """
+        Gets the port on which the server is listening, once started.
+        :return: TCP port number
+        """
+        return self._socket.getsockname()[1]
+
+    def start(self):
+        """
+        Binds the server's port and forks the worker processes.
+        :return: None
+        """
+        if self._reuse_port:
+            # the parent binds (but never listens on) a socket, which reserves the
+            # port for the workers without being offered any connections itself
+            self._socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            self._socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            self._socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+            self._socket.bind((self._host, self._port))
+        else:
+            self._socket = socket.create_server((self._host, self._port))
+        config = _WorkerConfig(self._session_factory, self._host, self.port, self._threads_per_process,
+                               self._worker_exit, self._worker_init, self._metrics, self._limits)
+        listen_socket = None if self._reuse_port else self._socket
+        for worker_number in range(self._processes):
+            if self._launcher is not None:
+                self._workers.append(self._launcher.launch(_run_worker, config, worker_number, listen_socket,
+                                                           name=f"cafe-worker-{worker_number}"))
+                continue
+            pid = os.fork()
+            if pid == 0:
+                _run_worker(config, worker_number, listen_socket)
+            self._workers.append(pid)
+
+    def serve_forever(self):
+        """
+        Starts the server if needed, and waits for the worker processes to exit.
+        If interrupted, the workers are terminated.
+        :return: None
+        """
+        if not self._workers:
+            self.start()
+        try:
+            while self._workers:
+                if self._launcher is not None:
+                    # launched workers are children of the template, not of this process
+                    wait([process.sentinel for process in self._workers])
+                    self._workers = [process for process in self._workers if process.is_alive()]
+                else:
+                    pid, _ = os.wait()
+                    self._workers.remove(pid)
+        finally:
+            self.close()
+
+    def close(self):
+        """
+        Terminates the worker processes and releases the server's port.
+        :return: None
+        """
+        for worker in self._workers:
+            if self._launcher is not None:
+                worker.terminate()
+                worker.join()
+                continue
+            try:
+                os.kill(worker, signal.SIGTERM)
+                os.waitpid(worker, 0)
+            except (ProcessLookupError, ChildProcessError):
+                pass
+        self._workers.clear()
+        if self._socket is not None:
+            self._socket.close()
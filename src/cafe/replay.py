@@ -0,0 +1,266 @@
+"""
+Replays traffic recorded by a `TrafficRecorder` against a Cafe server, as a
+benchmark with a realistic workload.
+
+Each recorded session is replayed on its own connection, sending the recorded
+requests in order. With `--speed 1` (the default) sessions start and requests are
+sent at the times they were recorded; `--speed N` compresses the timeline N
+times, and `--speed max` sends each request as soon as the previous response has
+arrived and starts every session at once. The latency of every request is
+reported as by `cafe.bench`, which also gives the options that choose the
+server, e.g.
+
+    PYTHONPATH=./src python3 -m cafe.replay capture.txt --speed max --verify \
+        --server "python3 -m demo --serve async --host 127.0.0.1 --port {port}"
+
+With `--verify`, each response is also compared with the recorded one, and the
+exit status is 1 if any differ. Values the server assigns (the number of a
+committed order, a session's token) differ from run to run, so only the status of
+those responses (OK or ERROR) is compared.
+
+A session that resumes another (`RESUME <token>`) must present the token the
+server issued during the replay, not the recorded one: the replayed request
+carries the token from the replayed response to the `SESSION` request that issued
+it, and waits until the issuing session has ended, as it had when recorded.
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+
+from .async_cafe_io import AsyncCafeIO
+from .bench import add_server_arguments, format_stats, start_or_connect, stop_server, summarize
+from .cafe_codec import CODECS
+from .traffic_capture import CapturedExchange, CapturedSession, read_capture
+
+# the verbs whose responses contain values assigned by the server
+_UNSTABLE_VERBS = ("COMMIT", "SESSION")
+
+
+def _verb(request: str) -> str:
+    return request.split(maxsplit=1)[0].upper()
+
+
+def _session_token(request: str, response: tuple[str, ...]) -> str:
+    # the token issued by a successful SESSION request, or None
+    fields = response[0].split() if response else ()
+    if _verb(request) == "SESSION" and len(fields) == 2 and fields[0] == "OK":
+        return fields[1]
+    return None
+
+
+def response_length(request: str, first_line: str) -> int:
+    """
+    Determines how many lines follow the first line of a response.
+    :param request: the request the response answers
+    :param first_line: the first line of the response
+    :return: the number of lines that follow; a LIST response gives the count
+        of its items after OK (e.g. `OK 3`), and other responses are one line
+    """
+    fields = first_line.split()
+    if _verb(request) == "LIST" and len(fields) >= 2 and fields[0] == "OK" \
+            and fields[1].isdigit():
+        return int(fields[1])
+    return 0
+
+
+def responses_match(request: str, recorded: tuple[str, ...], replayed: tuple[str, ...]) -> bool:
+    """
+    Compares a replayed response with the one that was recorded.
+    :param request: the request the responses answer
+    :param recorded: the lines of the recorded response
+    :param replayed: the lines of the replayed response
+    :return: True if they match; the responses to requests whose verb is in
+        `_UNSTABLE_VERBS` need only have the same status
+    """
+    if _verb(request) in _UNSTABLE_VERBS:
+        return bool(recorded and replayed) and recorded[0].split()[0] == replayed[0].split()[0]
+    return recorded == replayed
+
+
+class Replayer:
+    """
+    Replays recorded sessions concurrently against a server, recording the
+    latency of each request and, optionally, the responses that differ from the
+    recorded ones.
+    """
+
+    def __init__(self, host: str, port: int, sessions: list[CapturedSession], speed: float = 1.0,
+                 verify: bool = False):
+        """
+        Initializes this replayer.
+        :param host: host name or address of the server
+        :param port: TCP port on which the server is listening
+        :param sessions: the sessions to replay
+        :param speed: how many times faster than recorded to replay; as fast as
+            possible if zero
+        :param verify: whether to compare the responses with the recorded ones
+        """
+        self._host = host
+        self._port = port
+        self._sessions = sessions
+        self._speed = speed
+        self._verify = verify
+        self.latencies: dict[str, list[float]] = {}
+        self.errors = 0
+        # (session ID, request, recorded response, replayed response) of each difference
+        self.mismatches: list[tuple[str, str, tuple[str, ...], tuple[str, ...]]] = []
+        # the ID of the session to which each recorded session token was issued
+        self._issuers: dict[str, str] = {}
+        # set when the replay of each session has ended, by session ID
+        self._ended: dict[str, asyncio.Event] = {}
+        # the token issued in the replay in place of each recorded token
+        self._tokens: dict[str, str] = {}
+
+    async def _wait_until(self, start: float, exchange: CapturedExchange):
+        if self._speed:
+            delay = start + exchange.offset / self._speed - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+    async def _exchange(self, io: AsyncCafeIO, request: str) -> tuple[str, ...]:
+        started = time.perf_counter()
+        io.write_string(request)
+        io.flush()
+        await io.drain()
+        first_line = await io.read_string()
+        lines = [first_line]
+        for _ in range(response_length(request, first_line)):
+            lines.append(await io.read_string())
+        verb = _verb(request)
+        self.latencies.setdefault(verb, []).append(time.perf_counter() - started)
+        if verb == "CODEC" and first_line.startswith("OK "):
+            # the rest of the session is framed by the codec the server accepted
+            io.set_codec(CODECS[first_line[3:]])
+        return tuple(lines)
+
+    async def _resume_request(self, session: CapturedSession, request: str) -> str:
+        verb, _, token = request.partition(" ")
+        issuer = self._issuers.get(token)
+        if issuer is None:
+            # a token issued before the capture started can't be remapped
+            return request
+        if issuer != session.session_id:
+            await self._ended[issuer].wait()
+        return f"{verb} {self._tokens.get(token) or token}"
+
+    async def _replay_session(self, session: CapturedSession, start: float):
+        try:
+            await self._replay_exchanges(session, start)
+        finally:
+            self._ended[session.session_id].set()
+
+    async def _replay_exchanges(self, session: CapturedSession, start: float):
+        # the recorded offsets count from the start of the capture, not of the session
+        await self._wait_until(start, session.exchanges[0])
+        try:
+            io = await AsyncCafeIO.connect(self._host, self._port)
+        except OSError:
+            self.errors += len(session.exchanges)
+            return
+        try:
+            for number, exchange in enumerate(session.exchanges):
+                await self._wait_until(start, exchange)
+                request = exchange.request
+                verb = _verb(request)
+                if verb == "RESUME":
+                    request = await self._resume_request(session, request)
+                try:
+                    response = await self._exchange(io, request)
+                except (OSError, EOFError, ValueError):
+                    # the rest of the session can't be replayed without its connection
+                    self.errors += len(session.exchanges) - number
+                    return
+                recorded_token = _session_token(exchange.request, exchange.response)
+                if recorded_token is not None:
+                    self._tokens[recorded_token] = _session_token(request, response)
+                if self._verify and not responses_match(exchange.request, exchange.response, response):
+                    self.mismatches.append((session.session_id, exchange.request, exchange.response, response))
+        finally:
+            await io.close()
+
+    async def run(self) -> dict:
+        """
+        Replays every session, and summarizes the results.
+        :return: the summary produced by `cafe.bench.summarize`, with the number
+            of sessions and of mismatched responses
+        """
+        sessions = [session for session in self._sessions if session.exchanges]
+        for session in sessions:
+            self._ended[session.session_id] = asyncio.Event()
+            for exchange in session.exchanges:
+                token = _session_token(exchange.request, exchange.response)
+                if token is not None:
+                    self._issuers[token] = session.session_id
+        start = time.monotonic()
+        if sessions and self._speed:
+            # the timeline starts with the first request, not when recording started
+            start -= sessions[0].exchanges[0].offset / self._speed
+        started = time.monotonic()
+        await asyncio.gather(*(self._replay_session(session, start) for session in sessions))
+        summary = summarize(self.latencies, self.errors, time.monotonic() - started)
+        summary["sessions"] = len(sessions)
+        summary["mismatches"] = len(self.mismatches)
+        return summary
+
+
+def print_report(summary: dict, mismatches: list = ()):
+    """
+    Prints a summary of a replay as a table, followed by the first few mismatches.
+    :param summary: the summary produced by `Replayer.run`
+    :param mismatches: the mismatches recorded by the replayer
+    :return: None
+    """
+    print(f"{summary['sessions']} sessions in {summary['elapsed_sec']:.1f}s, {summary['errors']} errors, "
+          f"{summary['mismatches']} mismatched responses")
+    print(f"{'verb':<8} {'requests':>9} {'req/s':>10} {'p50 ms':>9} {'p99 ms':>9} {'p99.9 ms':>9}")
+    for verb, stats in summary["verbs"].items():
+        print(format_stats(stats, verb))
+    print(format_stats(summary, "all"))
+    for session_id, request, recorded, replayed in mismatches[:10]:
+        print(f"session {session_id}: {request}")
+        print(f"  recorded: {' | '.join(recorded)}")
+        print(f"  replayed: {' | '.join(replayed)}")
+
+
+def _speed(value: str) -> float:
+    if value == "max":
+        return 0.0
+    speed = float(value)
+    if speed <= 0:
+        raise argparse.ArgumentTypeError("speed must be positive, or max")
+    return speed
+
+
+def main(argv: list[str] = None) -> int:
+    parser = argparse.ArgumentParser(prog="cafe.replay", description="Sad Cafe traffic replay")
+    parser.add_argument("capture", help="capture file recorded by the server (e.g. with --capture)")
+    add_server_arguments(parser)
+    parser.add_argument("--speed", type=_speed, default=1.0,
+                        help="times faster than recorded to replay, or max (default: 1)")
+    parser.add_argument("--verify", action="store_true",
+                        help="compare the responses with the recorded ones")
+    parser.add_argument("--json", metavar="PATH", help="also write the results to a JSON file")
+    args = parser.parse_args(argv)
+
+    sessions = read_capture(args.capture)
+    host, port, process = start_or_connect(args)
+    try:
+        replayer = Replayer(host, port, sessions, args.speed, args.verify)
+        summary = asyncio.run(replayer.run())
+    finally:
+        if process is not None:
+            stop_server(process)
+
+    summary["config"] = {"capture": args.capture, "server": args.server,
+                         "connect": args.connect, "speed": args.speed or "max", "verify": args.verify}
+    print_report(summary, replayer.mismatches)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(summary, f, indent=2)
+    return 1 if replayer.mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,182 @@
+import socket
+import time
+
+from .cafe_codec import CafeCodec
+from .cafe_connection import CafeConnection
+from .cafe_io import CafeIO
+
+
+class SocketCafeIO(CafeIO):
+    """
+    An implementation of `CafeIO` that communicates via a connected, blocking
+    stream socket, e.g. for a client that uses `connect` to open one. (The
+    servers drive a `CafeServerConnection` from their own transports.)
+
+    Framing and buffering are done by a `CafeConnection`, so this class only moves
+    bytes between it and the socket. Outgoing lines are collected until `flush` is
+    called, so a request or response that spans many lines is sent with a single
+    system call.
+
+    Messages are framed as lines of text unless another `CafeCodec` is selected
+    with `set_codec` (e.g. after negotiating one with the peer).
+    """
+
+    def __init__(self, sock: socket.socket, buffer_size: int = 65536, encoding: str = "utf-8",
+                 max_message_size: int = None):
+        """
+        Initializes this channel.
+        :param sock: a connected stream socket
+        :param buffer_size: the most bytes received from the socket at a time
+        :param encoding: the character encoding used for lines of text
+        :param max_message_size: the maximum size in bytes of a received message;
+            no limit if not specified
+        """
+        self._sock = sock
+        self._buffer_size = buffer_size
+        self._connection = CafeConnection(encoding, max_message_size)
+        self._timeout: float = sock.gettimeout()
+        self._deadline: float = None
+
+    @classmethod
+    def connect(cls, host: str, port: int, timeout: float = None) -> "SocketCafeIO":
+        """
+        Opens a client connection to a Cafe server.
+        :param host: host name or address of the server
+        :param port: TCP port on which the server is listening
+        :param timeout: optional timeout in seconds for connecting
+        :return: a channel for the new connection
+        """
+        return cls(socket.create_connection((host, port), timeout))
+
+    @property
+    def codec(self) -> CafeCodec:
+        """
+        Gets the codec used to frame messages.
+        :return: the current codec
+        """
+        return self._connection.codec
+
+    def set_codec(self, codec: CafeCodec):
+        """
+        Selects the codec used to frame messages from now on. Output already
+        written is unaffected, and input that is already buffered is decoded
+        using the new codec.
+        :param codec: the codec to use
+        :return: None
+        """
+        self._connection.set_codec(codec)
+
+    @property
+    def bytes_received(self) -> int:
+        """
+        Gets the number of bytes received on this channel so far.
+        :return: number of bytes
+        """
+        return self._connection.bytes_received
+
+    @property
+    def bytes_sent(self) -> int:
+        """
+        Gets the number of bytes sent on this channel so far.
+        :return: number of bytes
+        """
+        return self._connection.bytes_sent
+
+    def read_string(self) -> str:
+        connection = self._connection
+        s = connection.next_message()
+        while s is None:
+            self._limit_wait()
+            connection.receive_data(self._sock.recv(self._buffer_size))
+            s = connection.next_message()
+        return s
+
+    def write_string(self, s: str):
+        self._connection.write_string(s)
+
+    def block_key(self) -> object:
+        return self._connection.block_key()
+
+    def encode_block(self, lines: list[str]) -> bytes:
+        return self._connection.encode_block(lines)
+
+    def write_block(self, block: bytes):
+        self._connection.write_block(block)
+
+    def flush(self):
+        self._connection.flush()
+        data = self._connection.data_to_send()
+        if data:
+            self._limit_wait()
+            self._sock.sendall(data)
+
+    def _limit_wait(self):
+        # the next wait on the socket may last until the deadline at most
+        if self._deadline is not None:
+            remaining = self._deadline - time.monotonic()
+            if remaining <= 0:
+                raise TimeoutError("deadline passed")
+            self._sock.settimeout(remaining if self._timeout is None else min(remaining, self._timeout))
+
+    def set_timeout(self, timeout: float):
+        """
+        Limits how long each receive or send may wait for the peer. When the limit
+        is exceeded, `TimeoutError` is raised; the state of the conversation is
+        then unknown, so the channel should be closed.
+        :param timeout: the limit in seconds for each wait; no limit if None
+        :return: None
+        """
+        self._timeout = timeout
+        self._sock.settimeout(timeout)
+
+    def set_deadline(self, deadline: float):
+        """
+        Limits how long all the receives and sends from now on may take together,
+        e.g. to bound a whole request and response, however slowly the peer
+        trickles its data. When the deadline passes, `TimeoutError` is raised;
+        the state of the conversation is then unknown, so the channel should be
+        closed.
+        :param deadline: the `time.monotonic` time by which every wait must end;
+            no deadline if None
+        :return: None
+        """
+        self._deadline = deadline
+        if deadline is None:
+            self._sock.settimeout(self._timeout)
+
+    def is_idle(self) -> bool:
+        """
+        Checks, without waiting, that the connection is still open and that no
+        message has arrived. A connection that is waiting for the next request
+        should never have anything to read, so a failure means the peer has
+        closed the connection or is not following the protocol.
+        :return: True if the connection can be used for another request
+        """
+        if self._connection.input_size or self._sock.fileno() < 0:
+            return False
+        # peeking without waiting works for any descriptor, unlike select, which
+        # fails for descriptors beyond FD_SETSIZE in a process with many sockets
+        self._sock.settimeout(0)
+        try:
+            # either a message has arrived, or (if nothing is peeked) the peer
+            # has closed the connection
+            self._sock.recv(1, socket.MSG_PEEK)
+            return False
+        except BlockingIOError:
+            return True
+        except OSError:
+            return False
+        finally:
+            self._sock.settimeout(self._timeout)
+
+    def close(self):
+        """
+        Flushes any buffered output and closes the underlying socket.
+        :return: None
+        """
+        try:
+            self.flush()
+        except OSError:
+            pass
+        finally:
+            self._sock.close()
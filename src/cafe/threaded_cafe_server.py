@@ -0,0 +1,171 @@
+import math
+import socket
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Callable
+
+from .cafe_connection import CafeServerConnection
+from .cafe_io import CafeIO
+from .cafe_limits import CafeLimits
+from .cafe_metrics import CafeMetrics
+from .cafe_session import CafeSession
+
+# the most bytes received from a client at a time
+_RECEIVE_SIZE = 65536
+
+
+def serve_connection(sock: socket.socket, session_factory: Callable[[CafeIO], CafeSession],
+                     metrics: CafeMetrics = None, limits: CafeLimits = None):
+    """
+    Serves one client connection until its session is done, the client
+    disconnects, or the client exceeds a limit, then closes the connection.
+    Requests are served by a `CafeServerConnection`, and the responses to all
+    the requests received together are sent together (or sooner, once they
+    reach the write high-water mark).
+    :param sock: the connected socket for the client
+    :param session_factory: called with the channel for the connection to create
+        the session that will serve it
+    :param metrics: where to count the session and the bytes transferred
+    :param limits: the limits placed on the session; none if not specified
+    :return: None
+    """
+    connection = CafeServerConnection(session_factory, limits)
+    idle_timeout = limits.idle_timeout if limits is not None else None
+    write_timeout = limits.write_timeout if limits is not None else None
+    high_water = limits.write_high_water if limits is not None else None
+    if high_water is None:
+        high_water = math.inf
+    # with either timeout, the socket's timeout is set before each send and receive
+    timed = idle_timeout is not None or write_timeout is not None
+    if metrics is not None:
+        metrics.session_opened()
+    try:
+        deadline = None
+        while True:
+            while connection.serve_next_request():
+                deadline = None
+                if connection.output_size >= high_water:
+                    _send(sock, connection.data_to_send(), timed, write_timeout)
+            if connection.pending is not None:
+                # this thread belongs to the connection, so it can simply wait
+                wait((connection.pending,))
+                connection.complete_pending()
+                continue
+            data = connection.data_to_send()
+            if data:
+                _send(sock, data, timed, write_timeout)
+            if connection.done:
+                break
+            if idle_timeout is not None:
+                # the client must complete its next request by the deadline
+                if deadline is None:
+                    deadline = time.monotonic() + idle_timeout
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                sock.settimeout(remaining)
+            elif timed:
+                sock.settimeout(None)
+            connection.receive_data(sock.recv(_RECEIVE_SIZE))
+    except OSError:
+        # including a timeout
+        pass
+    finally:
+        connection.close()
+        sock.close()
+        if metrics is not None:
+            io = connection.io
+            metrics.session_closed(io.bytes_received, io.bytes_sent)
+
+
+def _send(sock: socket.socket, data: bytes, timed: bool, write_timeout: float):
+    if timed:
+        sock.settimeout(write_timeout)
+    sock.sendall(data)
+
+
+class ThreadedCafeServer:
+    """
+    A server that serves each client connection on a thread from a fixed-size pool.
+    When every thread is busy, newly accepted connections wait for a free thread.
+    All sessions run in the same process, so they can share one `CafeService`.
+
+    Each connection holds a thread for as long as it is open, so a server that
+    accepts untrusted clients should be given `CafeLimits`, which close the
+    connections of clients that stop sending requests or reading responses.
+    """
+
+    def __init__(self, session_factory: Callable[[CafeIO], CafeSession],
+                 host: str = "", port: int = 0, max_workers: int = 32,
+                 reuse_port: bool = False, listen_socket: socket.socket = None,
+                 metrics: CafeMetrics = None, limits: CafeLimits = None):
+        """
+        Initializes this server.
+        :param session_factory: called with the channel for each accepted
+            connection to create the session that will serve it
+        :param host: the address on which to listen; all interfaces if empty
+        :param port: the TCP port on which to listen; any free port if zero
+        :param max_workers: the number of threads serving connections
+        :param reuse_port: whether to set `SO_REUSEPORT` so that several
+            processes can listen on the same port
+        :param listen_socket: an already listening socket to accept connections
+            from, instead of creating one from `host` and `port`
+        :param metrics: where to count sessions and the bytes transferred
+        :param limits: the limits placed on each session; none if not specified
+        """
+        self._session_factory = session_factory
+        self._host = host
+        self._port = port
+        self._max_workers = max_workers
+        self._reuse_port = reuse_port
+        self._listen_socket = listen_socket
+        self._metrics = metrics
+        self._limits = limits
+        self._running = False
+
+    @property
+    def port(self) -> int:
+        """
+        Gets the port on which the server is listening, once started.
+        :return: TCP port number
+        """
+        return self._listen_socket.getsockname()[1]
+
+    def start(self):
+        """
+        Starts listening for connections, if not given a listening socket.
+        :return: None
+        """
+        if self._listen_socket is None:
+            self._listen_socket = socket.create_server(
+                (self._host, self._port), reuse_port=self._reuse_port)
+
+    def serve_forever(self, poll_interval: float = 0.5):
+        """
+        Starts the server if needed, and accepts connections until `close`
+        is called. The listening socket is closed before returning.
+        :param poll_interval: how often, in seconds, to check whether the
+            server has been closed
+        :return: None
+        """
+        self.start()
+        self._listen_socket.settimeout(poll_interval)
+        self._running = True
+        with ThreadPoolExecutor(self._max_workers, thread_name_prefix="cafe") as executor:
+            while self._running:
+                try:
+                    sock, _ = self._listen_socket.accept()
+                except socket.timeout:
+                    continue
+                except OSError:
+                    break
+                executor.submit(serve_connection, sock, self._session_factory, self._metrics, self._limits)
+        self._listen_socket.close()
+
+    def close(self):
+        """
+        Stops accepting connections. Connections already accepted are served
+        to completion.
+        :return: None
+        """
+        self._running = False
@@ -0,0 +1,301 @@
+import hashlib
+import hmac
+import itertools
+import os
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, NamedTuple
+
+from .cafe_io import CafeIO
+from .cafe_session import CafeSession
+
+# the first line of a capture file
+CAPTURE_HEADER = "# cafe capture 1"
+
+# buffered records are written to the file once they reach this size
+_WRITE_SIZE = 65536
+
+# the verbs whose argument is a secret (a settlement or session token)
+_SECRET_VERBS = ("COMMIT", "RESUME")
+
+
+class CapturedExchange(NamedTuple):
+    """
+    A request recorded in a capture, with the response that was sent to it.
+    """
+    # seconds from the start of the capture until the request was received
+    offset: float
+    request: str
+    # the lines of the response
+    response: tuple[str, ...]
+
+
+class CapturedSession(NamedTuple):
+    """
+    The requests and responses of one recorded session, in order.
+    """
+    session_id: str
+    exchanges: tuple[CapturedExchange, ...]
+
+
+class TrafficRecorder:
+    """
+    Records the requests received and the responses sent by server sessions in a
+    capture file, with the time of each, so that the traffic can be replayed
+    later (e.g. by `python -m cafe.replay`) as a realistic benchmark workload.
+
+    The file is text with one record per line, `<session> <microseconds> > <request>`
+    for a request, and `<session> <microseconds> < <line>` for each line of a
+    response, with times counted from when the recorder was created. Records are
+    buffered and appended to the file in batches, at least at the end of each
+    session, so the worker processes of a pre-fork server may share one recorder
+    (and file); each process buffers its own records.
+
+    Requests refused by a server's limits (e.g. its rate limit) never reach the
+    session, so they aren't recorded.
+
+    Unless redaction is turned off, the settlement and session tokens in the
+    traffic (the argument of COMMIT and RESUME, and the response to SESSION) are
+    replaced by pseudonyms, so that a capture can be shared without them. Each
+    token always gets the same pseudonym from one recorder, so a replay can still
+    tell which session a RESUME request resumes.
+    """
+
+    def __init__(self, path: str, clock: Callable[[], float] = time.monotonic, redact: bool = True):
+        """
+        Initializes this recorder, creating the capture file or emptying it.
+        :param path: the path of the capture file
+        :param clock: a function that returns the current time in seconds, which
+            must be shared by processes forked from this one
+        :param redact: whether to replace tokens by pseudonyms
+        """
+        self._path = path
+        self._clock = clock
+        # the pseudonyms are keyed, so they can't be reversed by guessing tokens
+        self._redaction_key = os.urandom(32) if redact else None
+        self._started = clock()
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(CAPTURE_HEADER + "\n")
+        self._session_numbers = itertools.count()
+        self._buffer: list[str] = []
+        self._buffered = 0
+        self._lock = threading.Lock()
+        self._fd: int = None
+        self._pid: int = None
+        self._closed = False
+
+    def new_session_id(self) -> str:
+        """
+        Creates an ID for a session, unique among all the processes sharing the file.
+        :return: the session ID
+        """
+        return f"{os.getpid()}.{next(self._session_numbers)}"
+
+    def _pseudonym(self, token: str) -> str:
+        digest = hmac.new(self._redaction_key, token.encode("utf-8"), hashlib.sha256)
+        return "redacted-" + digest.hexdigest()[:16]
+
+    def redact_request(self, request: str) -> str:
+        """
+        Replaces the token in a request by its pseudonym, if redaction is on.
+        :param request: the request
+        :return: the request as it should be recorded
+        """
+        verb, _, argument = request.partition(" ")
+        if self._redaction_key is None or not argument or verb.upper() not in _SECRET_VERBS:
+            return request
+        return f"{verb} {self._pseudonym(argument)}"
+
+    def redact_response(self, request: str, lines: list[str]) -> list[str]:
+        """
+        Replaces the token in the response to a SESSION request by its pseudonym,
+        if redaction is on.
+        :param request: the request the response answers
+        :param lines: the lines of the response
+        :return: the lines as they should be recorded
+        """
+        if self._redaction_key is None or request.split(" ", 1)[0].upper() != "SESSION" \
+                or not lines or not lines[0].startswith("OK "):
+            return lines
+        return [f"OK {self._pseudonym(lines[0][3:])}"] + lines[1:]
+
+    def record(self, session_id: str, direction: str, lines: list[str]):
+        """
+        Records a request or a response.
+        :param session_id: the ID of the session
+        :param direction: `>` for a request, or `<` for a response
+        :param lines: the request, or the lines of the response
+        :return: None
+        """
+        offset = int((self._clock() - self._started) * 1_000_000)
+        prefix = f"{session_id} {offset} {direction} "
+        with self._lock:
+            if self._pid != os.getpid():
+                # records buffered by a parent process are the parent's to write
+                self._buffer = []
+                self._buffered = 0
+                self._fd = None
+                self._pid = os.getpid()
+            for line in lines:
+                record = prefix + line + "\n"
+                self._buffer.append(record)
+                self._buffered += len(record)
+            if self._buffered >= _WRITE_SIZE:
+                self._write_buffer()
+
+    def _write_buffer(self):
+        # called with the lock held
+        if not self._buffer or self._closed:
+            return
+        if self._fd is None:
+            self._fd = os.open(self._path, os.O_WRONLY | os.O_APPEND)
+        view = memoryview("".join(self._buffer).encode("utf-8"))
+        while view:
+            view = view[os.write(self._fd, view):]
+        self._buffer = []
+        self._buffered = 0
+
+    def flush(self):
+        """
+        Appends the buffered records of this process to the file.
+        :return: None
+        """
+        with self._lock:
+            if self._pid == os.getpid():
+                self._write_buffer()
+
+    def wrap_session_factory(self, session_factory: Callable[[CafeIO], CafeSession]) \
+            -> Callable[[CafeIO], CafeSession]:
+        """
+        Wraps a server's session factory, so that each session it creates is recorded.
+        :param session_factory: the factory to wrap
+        :return: a factory that creates recorded sessions
+        """
+        def create_session(io: CafeIO) -> CafeSession:
+            recording_io = RecordingCafeIO(io, self)
+            return _RecordingSession(session_factory(recording_io), recording_io)
+
+        return create_session
+
+    def close(self):
+        """
+        Appends the buffered records of this process to the file, and closes it.
+        :return: None
+        """
+        with self._lock:
+            if self._pid == os.getpid():
+                self._write_buffer()
+                if self._fd is not None:
+                    os.close(self._fd)
+            self._closed = True
+
+
+class RecordingCafeIO(CafeIO):
+    """
+    A `CafeIO` that passes everything through to another channel, and records each
+    request read and each response flushed with a `TrafficRecorder`. Requests that
+    a transport passes to a session without reading them from the channel are
+    recorded by calling `record_request`.
+
+    Blocks of lines are written line by line, so that they can be recorded. Tokens
+    are redacted as the recorder specifies.
+    """
+
+    def __init__(self, io: CafeIO, recorder: TrafficRecorder, session_id: str = None):
+        """
+        Initializes this channel.
+        :param io: the channel to pass everything to
+        :param recorder: where to record the traffic
+        :param session_id: the ID of the recorded session; a new one if not specified
+        """
+        self._io = io
+        self._recorder = recorder
+        self.session_id = session_id or recorder.new_session_id()
+        self._response: list[str] = []
+        # the request that the response being written answers
+        self._request = ""
+
+    def __getattr__(self, name: str):
+        # anything else the channel offers (e.g. `set_codec`) is passed through
+        return getattr(self._io, name)
+
+    def record_request(self, request: str):
+        """
+        Records a request received by other means than `read_string`.
+        :param request: the request
+        :return: None
+        """
+        self._request = request
+        self._recorder.record(self.session_id, ">", [self._recorder.redact_request(request)])
+
+    def read_string(self) -> str:
+        request = self._io.read_string()
+        self.record_request(request)
+        return request
+
+    def write_string(self, s: str):
+        self._io.write_string(s)
+        self._response.append(s)
+
+    def flush(self):
+        if self._response:
+            self._recorder.record(self.session_id, "<",
+                                  self._recorder.redact_response(self._request, self._response))
+            self._response = []
+        self._io.flush()
+
+
+class _RecordingSession(CafeSession):
+    def __init__(self, session: CafeSession, io: RecordingCafeIO):
+        self._session = session
+        self._io = io
+
+    @property
+    def done(self) -> bool:
+        return self._session.done
+
+    def serve_request(self, request: str) -> Future:
+        self._io.record_request(request)
+        return self._session.serve_request(request)
+
+    def complete_request(self, future: Future):
+        self._session.complete_request(future)
+
+    def close(self):
+        self._session.close()
+        self._io._recorder.flush()
+
+
+def read_capture(path: str) -> list[CapturedSession]:
+    """
+    Reads the sessions recorded in a capture file.
+    :param path: the path of the capture file
+    :return: the sessions, in the order in which they started
+    :raises ValueError: if the file isn't a capture, or a record is malformed
+    """
+    exchanges: dict[str, list[list]] = {}
+    with open(path, encoding="utf-8") as f:
+        if f.readline().rstrip("\n") != CAPTURE_HEADER:
+            raise ValueError(f"{path} is not a capture file")
+        for number, line in enumerate(f, 2):
+            try:
+                session_id, offset, direction, message = line.rstrip("\n").split(" ", 3)
+                offset = int(offset) / 1_000_000
+            except ValueError:
+                raise ValueError(f"malformed record on line {number} of {path}")
+            session = exchanges.setdefault(session_id, [])
+            if direction == ">":
+                session.append([offset, message, []])
+            elif direction == "<" and session:
+                session[-1][2].append(message)
+            else:
+                raise ValueError(f"malformed record on line {number} of {path}")
+    sessions = [
+        CapturedSession(session_id, tuple(CapturedExchange(offset, request, tuple(response))
+                                          for offset, request, response in session))
+        for session_id, session in exchanges.items()
+    ]
+    # sessions from different processes may be appended out of order
+    sessions.sort(key=lambda session: session.exchanges[0].offset)
+    return sessions
@@ -0,0 +1,75 @@
+import multiprocessing
+from typing import Callable, Iterable
+
+# the modules a worker serving Cafe clients typically needs
+DEFAULT_PRELOAD = ("cafe.cafe_protocol_server", "cafe.cafe_service", "cafe.socket_cafe_io",
+                   "cafe.threaded_cafe_server")
+
+
+class WarmWorkerLauncher:
+    """
+    Starts worker processes (e.g. a process for each order, or for each batch of
+    connections) from a warm template process that has already imported the
+    modules they need. Starting a worker then costs a fork, instead of starting
+    an interpreter and importing its modules again.
+
+    This uses the `forkserver` start method where the platform has it: a template
+    process is started once, imports the preloaded modules, and forks a worker
+    for each request. The template has no threads, so it is safe to fork even
+    when the launching process has many (unlike forking the launching process).
+    Elsewhere (e.g. on Windows) workers are spawned, paying the full startup.
+
+    A process has only one template, shared by every user of the `forkserver`
+    start method in the process, so the preloaded modules of the first launcher
+    to start it are used by every launcher. Starting a launcher sets the
+    process's preload list with `set_forkserver_preload`, which only matters to
+    a template that isn't already running.
+    """
+
+    def __init__(self, preload: Iterable[str] = DEFAULT_PRELOAD):
+        """
+        Initializes this launcher. The template process isn't started until
+        `start` is called or the first worker is launched.
+        :param preload: the names of the modules the template imports; a
+            worker's target must be defined in one of them, or in a module they
+            import, for the worker to start without importing anything
+        """
+        method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+        self._context = multiprocessing.get_context(method)
+        self._preload = list(preload)
+        self._started = False
+
+    @property
+    def start_method(self) -> str:
+        """
+        Gets the multiprocessing start method used to start workers.
+        :return: `forkserver` or `spawn`
+        """
+        return self._context.get_start_method()
+
+    def start(self):
+        """
+        Starts the template process now, so that launching the first worker
+        doesn't wait for it.
+        :return: None
+        """
+        if self.start_method == "forkserver":
+            from multiprocessing import forkserver
+            self._context.set_forkserver_preload(self._preload)
+            forkserver.ensure_running()
+        self._started = True
+
+    def launch(self, target: Callable, *args, name: str = None) -> multiprocessing.Process:
+        """
+        Starts a worker process.
+        :param target: the function the worker runs; it and the arguments must
+            be picklable (e.g. a function defined at the top level of a module)
+        :param args: the arguments passed to `target`
+        :param name: the name of the process
+        :return: the started process, which can be joined
+        """
+        if not self._started:
+            self.start()
+        process = self._context.Process(target=target, args=args, name=name)
+        process.start()
+        return process
@@ -1,2 +1,32 @@
+import argparse
+
 from demo.simple_demo import run
-run()
+from demo.server_demo import SERVER_MODES, run_server
+
+parser = argparse.ArgumentParser(prog="demo", description="Sad Cafe demo")
+parser.add_argument("--serve", choices=SERVER_MODES,
+                    help="serve clients over TCP instead of the keyboard and display")
+parser.add_argument("--host", default="", help="address on which to listen (default: all)")
+parser.add_argument("--port", type=int, default=4564, help="TCP port on which to listen")
+parser.add_argument("--journal", metavar="PATH",
+                    help="record committed orders in a journal, and resume order numbering from it")
+parser.add_argument("--metrics-port", type=int, metavar="PORT",
+                    help="serve Prometheus metrics over HTTP on this port (with prefork, one port per worker)")
+parser.add_argument("--idle-timeout", type=float, default=300.0, metavar="SECONDS",
+                    help="disconnect a client that takes longer than this to send a request (default: 300)")
+parser.add_argument("--rate-limit", type=float, metavar="N",
+                    help="answer requests beyond N per second in a session with an error (default: no limit)")
+parser.add_argument("--locations", metavar="NAMES",
+                    help="take orders for several locations (comma-separated), chosen with LOCATION requests")
+parser.add_argument("--capture", metavar="PATH",
+                    help="record the requests and responses of every session, to replay with cafe.replay")
+parser.add_argument("--capture-tokens", action="store_true",
+                    help="record settlement and session tokens as sent, instead of pseudonyms")
+args = parser.parse_args()
+
+if args.serve:
+    run_server(args.serve, args.host, args.port, args.journal, args.metrics_port,
+               args.idle_timeout, args.rate_limit, args.locations.split(",") if args.locations else None,
+               args.capture, not args.capture_tokens)
+else:
+    run()
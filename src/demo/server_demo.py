@@ -0,0 +1,101 @@
+import os
+import shutil
+import tempfile
+
+from cafe import (BlockOrderNumberAllocator, CafeLimits, CafeMetrics, CafeService, CafeServiceRouter,
+                  CafeSessionStore, OrderJournal, PreforkCafeServer, SharedOrderNumberAllocator,
+                  SqliteCafeSessionStore, ThreadedCafeServer, TrafficRecorder, run_async_server)
+from .simple_cafe_client_handler import SimpleCafeOrderHandler
+from .simple_demo import _COMBOS, _DISCOUNTS, _MENU_ITEMS
+
+SERVER_MODES = ["async", "threaded", "prefork"]
+
+# the number of order numbers leased at a time by each location's service
+ORDER_NUMBER_BLOCK_SIZE = 1000
+
+
+def run_server(mode: str, host: str, port: int, journal_path: str = None, metrics_port: int = None,
+               idle_timeout: float = 300.0, rate_limit: float = None, locations: list[str] = None,
+               capture_path: str = None, redact_capture: bool = True):
+    # every client session shares one fulfillment service; with worker processes,
+    # the order numbers must come from a counter shared by all the processes
+    journal = OrderJournal(journal_path) if journal_path else None
+    router = None
+    if locations:
+        # each location has its own service; their order numbers come from blocks
+        # leased from one shared counter, so that neither the locations nor the
+        # worker processes coordinate on each order
+        first_block = None
+        if journal is not None and journal.next_order_number is not None:
+            first_block = -(-journal.next_order_number // ORDER_NUMBER_BLOCK_SIZE)
+        blocks = SharedOrderNumberAllocator(first_block)
+        router = CafeServiceRouter({
+            location: CafeService(_MENU_ITEMS, BlockOrderNumberAllocator(blocks, ORDER_NUMBER_BLOCK_SIZE),
+                                  journal=journal, combos=_COMBOS, discounts=_DISCOUNTS)
+            for location in locations
+        })
+        cafe_service = router.service()
+    elif mode == "prefork":
+        first_order_number = journal.next_order_number if journal is not None else None
+        cafe_service = CafeService(_MENU_ITEMS, SharedOrderNumberAllocator(first_order_number),
+                                   journal=journal, combos=_COMBOS, discounts=_DISCOUNTS)
+    else:
+        cafe_service = CafeService(_MENU_ITEMS, journal=journal, combos=_COMBOS, discounts=_DISCOUNTS)
+
+    # orders interrupted by a dropped connection can be resumed for a while; a
+    # client may reconnect to any worker process, so the workers share a database
+    sessions_dir = None
+    if mode == "prefork":
+        sessions_dir = tempfile.mkdtemp(prefix="cafe-sessions-")
+        session_store = SqliteCafeSessionStore(os.path.join(sessions_dir, "sessions.db"))
+    else:
+        session_store = CafeSessionStore()
+
+    # request counts and latencies can be scraped in the Prometheus format; each
+    # worker process has its own counts, so worker n uses the nth port from metrics_port
+    metrics = CafeMetrics() if metrics_port is not None else None
+
+    def serve_metrics(worker_number: int = 0):
+        if metrics is not None:
+            metrics.serve_http(host or "127.0.0.1", metrics_port + worker_number)
+
+    # clients that stop sending requests or reading responses are disconnected,
+    # so they can't hold a thread or connection forever
+    limits = CafeLimits(idle_timeout=idle_timeout, request_rate=rate_limit)
+
+    def create_session(io):
+        return SimpleCafeOrderHandler(io, cafe_service, session_store, metrics, router)
+
+    close_services = router.close if router is not None else cafe_service.close
+
+    # the traffic can be recorded, to be replayed later with `python -m cafe.replay`
+    recorder = TrafficRecorder(capture_path, redact=redact_capture) if capture_path else None
+    if recorder is not None:
+        create_session = recorder.wrap_session_factory(create_session)
+
+    def close_worker():
+        close_services()
+        session_store.close()
+        if recorder is not None:
+            recorder.close()
+
+    print(f"Serving {mode} on port {port}...")
+    try:
+        if mode == "async":
+            serve_metrics()
+            run_async_server(create_session, host, port, metrics, limits)
+        elif mode == "threaded":
+            serve_metrics()
+            ThreadedCafeServer(create_session, host, port, metrics=metrics, limits=limits).serve_forever()
+        elif mode == "prefork":
+            # each worker delivers the orders it queued before it exits
+            PreforkCafeServer(create_session, host, port, worker_exit=close_worker,
+                              worker_init=serve_metrics, metrics=metrics, limits=limits).serve_forever()
+        else:
+            raise ValueError(f"unknown server mode '{mode}'")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        close_worker()
+        if sessions_dir is not None:
+            shutil.rmtree(sessions_dir, ignore_errors=True)
@@ -1,51 +1,187 @@
 
-from cafe import CafeIO, CafeOrderHandler, CafeProtocolServer, CafeService
+from concurrent.futures import Future
 
+from cafe import (CafeIO, CafeMetrics, CafeOrder, CafeOrderHandler, CafeProtocolServer, CafeService,
+                  CafeServiceRouter, CafeSession, CafeSessionStore, RunningTotal)
 
-class SimpleCafeOrderHandler(CafeOrderHandler):
 
-    def __init__(self, cafe_client: CafeIO, cafe_service: CafeService):
+class SimpleCafeOrderHandler(CafeOrderHandler, CafeSession):
+
+    def __init__(self, cafe_client: CafeIO, cafe_service: CafeService,
+                 session_store: CafeSessionStore = None, metrics: CafeMetrics = None,
+                 router: CafeServiceRouter = None):
         self._client = cafe_client
         self._service = cafe_service
-        self._interpreter: CafeProtocolServer = None
-        self._menu_items = cafe_service.menu_items()
-        self._ordered_items: list[int] = []
+        self._interpreter = CafeProtocolServer(self, cafe_client, metrics)
+        self._order = CafeOrder()
+        # the price of the order is kept up to date as items are added and removed
+        self._total = RunningTotal(cafe_service.pricing())
         self._done = False
+        # a committed order is placed in the background, and the response deferred
+        self._commit: Future = None
+        # with a session store, an interrupted order can be resumed on a new connection
+        self._session_store = session_store
+        self._session_token: str = None
+        # with a router, the client can place its order at another location
+        self._router = router
+        self._location = router.default_location if router is not None else None
+
+    def handle_session(self):
+        if self._session_store is None:
+            raise NotImplementedError
+        if self._session_token is None:
+            self._session_token = self._session_store.new_token()
+        self._interpreter.send_session_response(self._session_token)
+
+    def handle_resume(self, token: str):
+        if self._session_store is None:
+            raise NotImplementedError
+        state = self._session_store.take(token)
+        if state is None:
+            self._interpreter.send_error_response("unknown or expired session")
+        else:
+            # the order is resumed at the location where it was started
+            location, order = state
+            if location is not None and self._router is not None:
+                self._service = self._router.service(location) or self._service
+                self._location = location
+            self._session_token = token
+            self._order = order
+            self._total = RunningTotal(self._service.pricing(), order)
+            self._interpreter.send_resume_response(len(self._order))
+
+    def handle_location(self, location: str):
+        if self._router is None:
+            raise NotImplementedError
+        service = self._router.service(location)
+        if service is None:
+            self._interpreter.send_error_response(f"unknown location {location}")
+        elif len(self._order):
+            self._interpreter.send_error_response("order already started")
+        else:
+            self._service = service
+            self._location = location
+            self._total = RunningTotal(service.pricing())
+            self._interpreter.send_location_response(location)
+
+    def _current_total(self) -> int:
+        pricing = self._service.pricing()
+        if self._total.table is not pricing:
+            # the menu has changed since the order was started, so it is repriced once
+            self._total = RunningTotal(pricing, self._order)
+        return self._total.total
+
+    def handle_total(self):
+        self._interpreter.send_total_response(self._current_total())
 
     def handle_list_menu(self):
-        self._interpreter.send_menu_items_response(self._menu_items)
+        self._interpreter.send_menu_response(self._service.menu())
+
+    def handle_list_menu_if_modified(self, version: int):
+        menu = self._service.menu()
+        # the client's version is a tag, which may come from another server process
+        if menu.etag == version:
+            self._interpreter.send_menu_not_modified_response()
+        else:
+            self._interpreter.send_menu_response(menu, versioned=True)
 
     def handle_list_order(self):
-        self._interpreter.send_order_items_response(self._ordered_items)
+        self._interpreter.send_order_response(self._order)
 
     def handle_add_item(self, item_number: int):
-        if item_number < len(self._menu_items):
-            self._ordered_items.append(item_number)
-            self._interpreter.send_add_item_response(len(self._ordered_items))
-        else:
+        if not self._service.menu().is_available(item_number):
             self._interpreter.send_error_response(f"menu item {item_number} does not exist")
+            return
+        try:
+            self._order.add(item_number)
+        except ValueError as err:
+            self._interpreter.send_error_response(str(err))
+            return
+        self._total.add(item_number)
+        self._interpreter.send_add_item_response(len(self._order))
 
     def handle_remove_item(self, item_number: int):
-        if item_number < len(self._ordered_items):
-            self._ordered_items.pop(item_number)
+        if item_number < self._order.num_lines:
+            self._total.remove(self._order.item_id(item_number))
+            self._order.remove_unit(item_number)
             self._interpreter.send_remove_item_response(item_number)
         else:
             self._interpreter.send_error_response(f"order item {item_number} does not exist")
 
+    def handle_add_items(self, item_numbers: list[int]):
+        menu = self._service.menu()
+        quantities: dict[int, int] = {}
+        for item_number in item_numbers:
+            if not menu.is_available(item_number):
+                self._interpreter.send_error_response(f"menu item {item_number} does not exist")
+                return
+            quantities[item_number] = quantities.get(item_number, 0) + 1
+        for item_number, quantity in quantities.items():
+            if self._order.quantity(item_number) + quantity > CafeOrder.MAX_QUANTITY:
+                self._interpreter.send_error_response(f"too many of menu item {item_number}")
+                return
+        for item_number, quantity in quantities.items():
+            self._order.add(item_number, quantity)
+            self._total.add(item_number, quantity)
+        self._interpreter.send_add_item_response(len(self._order))
+
+    def handle_remove_items(self, item_numbers: list[int]):
+        for item_number in item_numbers:
+            if item_number >= self._order.num_lines:
+                self._interpreter.send_error_response(f"order item {item_number} does not exist")
+                return
+        # remove from the last line first, so the indices of the other lines are unaffected
+        for item_number in sorted(item_numbers, reverse=True):
+            self._total.remove(self._order.item_id(item_number))
+            self._order.remove_unit(item_number)
+        self._interpreter.send_remove_items_response(item_numbers)
+
     def handle_commit_order(self, settlement_token: str):
-        order_number = self._service.place_order(settlement_token, self._ordered_items)
-        self._done = True
-        self._interpreter.send_commit_order_response(order_number)
+        # the response waits for the order to be journaled, without blocking the server
+        self._commit = self._service.submit_order(settlement_token, self._order.item_ids(),
+                                                  self._current_total())
+        self._interpreter.defer_response()
 
     def handle_cancel_order(self):
         self._done = True
         self._interpreter.send_cancel_order_response()
 
-    def serve_client(self):
+    @property
+    def done(self) -> bool:
+        return self._done
+
+    def close(self):
+        # an order that was neither committed nor canceled can be resumed later
+        if self._session_token is not None and not self._done:
+            self._session_store.save(self._session_token, (self._location, self._order))
+
+    def serve_request(self, request: str) -> Future:
         # if done is true, this order has already been committed or canceled
         if self._done:
             raise RuntimeError("order handlers cannot be reused")
-        self._interpreter = CafeProtocolServer(self, self._client)
+        self._interpreter.dispatch_request(request)
+        commit, self._commit = self._commit, None
+        return commit
+
+    def complete_request(self, future: Future):
+        try:
+            order_number = future.result()
+        except ValueError as err:
+            self._interpreter.send_error_response(str(err))
+        except OSError:
+            # the order wasn't recorded, so the client may commit it again
+            self._interpreter.send_error_response("order could not be recorded")
+        else:
+            self._done = True
+            self._interpreter.send_commit_order_response(order_number)
+        self._interpreter.finish_deferred_response()
+
+    def serve_client(self):
+        if self._done:
+            raise RuntimeError("order handlers cannot be reused")
         while not self._done:
             self._interpreter.receive_next_request()
+            commit, self._commit = self._commit, None
+            if commit is not None:
+                self.complete_request(commit)
 
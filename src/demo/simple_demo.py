@@ -1,29 +1,40 @@
 
-from cafe import CafeService
+from cafe import CafeMenuItem, CafeService, ComboRule, QuantityDiscount
 from .simple_cafe_io import SimpleCafeIO
 from .simple_cafe_client_handler import SimpleCafeOrderHandler
 
 _MENU_ITEMS = [
-    "Hamburger",
-    "Cheeseburger",
-    "Chicken Wrap",
-    "Veggie Wrap",
-    "Chips",
-    "Garden Salad",
-    "Fountain Drink",
-    "Water",
-    "Iced Tea",
-    "Coffee",
+    CafeMenuItem(0, "Hamburger", 599),
+    CafeMenuItem(1, "Cheeseburger", 649),
+    CafeMenuItem(2, "Chicken Wrap", 699),
+    CafeMenuItem(3, "Veggie Wrap", 649),
+    CafeMenuItem(4, "Chips", 199),
+    CafeMenuItem(5, "Garden Salad", 549),
+    CafeMenuItem(6, "Fountain Drink", 199),
+    CafeMenuItem(7, "Water", 149),
+    CafeMenuItem(8, "Iced Tea", 249),
+    CafeMenuItem(9, "Coffee", 229),
+]
+
+# a meal deal, and lower prices for catering orders
+_COMBOS = [ComboRule("Burger Meal", (0, 4, 6), 849)]
+_DISCOUNTS = [
+    QuantityDiscount(9, 10, 10),
+    QuantityDiscount(9, 50, 20),
+    QuantityDiscount(7, 24, 25),
 ]
 
 def run():
     # our fake fulfillment service simply has takes a list of menu options
     # and "fulfills" orders by printing them on the display
-    cafe_service = CafeService(_MENU_ITEMS)
+    cafe_service = CafeService(_MENU_ITEMS, combos=_COMBOS, discounts=_DISCOUNTS)
     # our fake client receives input from the keyboard and sends output to the display
     client = SimpleCafeIO()
 
     print("Waiting for request...")
     # handle the order interaction for our fake client
     handler = SimpleCafeOrderHandler(client, cafe_service)
-    handler.serve_client()
+    try:
+        handler.serve_client()
+    finally:
+        cafe_service.close()
@@ -0,0 +1,109 @@
+import asyncio
+
+from pytest import raises
+
+from cafe import AsyncCafeIO, AsyncCafeProtocolClient, AsyncCafeServer, CafeClientError, CafeMenuCache, CafeSession
+
+
+class ScriptedSession(CafeSession):
+    """
+    A session that answers each request with the lines given for it in a script,
+    and records the requests it received.
+    """
+    def __init__(self, io: AsyncCafeIO, script: dict[str, list[str]]):
+        self._io = io
+        self._script = script
+        self.requests = []
+
+    @property
+    def done(self) -> bool:
+        return False
+
+    def serve_request(self, request: str):
+        self.requests.append(request)
+        for line in self._script.get(request, ["ERROR unexpected request"]):
+            self._io.write_string(line)
+        self._io.flush()
+
+    def close(self):
+        pass
+
+
+SCRIPT = {
+    "LIST MENU": ["OK 2", "0 Coffee", "1 Tea"],
+    "LIST MENU IF-NOT 0": ["OK 2 VERSION 3", "0 Coffee", "1 Tea"],
+    "ADD 1": ["OK order has 1 item(s)"],
+    "ADD 7": ["ERROR invalid menu item 7"],
+    "LIST ORDER": ["OK 1", "0 1 2"],
+    "COMMIT paid": ["OK 42"],
+}
+
+
+def _run_with_server(scenario, sessions: list):
+    def create_session(io):
+        session = ScriptedSession(io, SCRIPT)
+        sessions.append(session)
+        return session
+
+    async def main():
+        server = AsyncCafeServer(create_session, "127.0.0.1")
+        await server.start()
+        try:
+            await scenario(server.port)
+        finally:
+            await server.close()
+
+    asyncio.run(main())
+
+
+def test_order_conversation():
+    sessions = []
+
+    async def scenario(port):
+        client = await AsyncCafeProtocolClient.connect("127.0.0.1", port)
+        assert await client.send_menu_items_request() == [(0, "Coffee"), (1, "Tea")]
+        await client.send_add_item_request(1)
+        with raises(CafeClientError):
+            await client.send_add_item_request(7)
+        assert await client.send_order_items_request() == [(0, 1, 2)]
+        assert not client.finished
+        assert await client.send_commit_order_response("paid") == 42
+        assert client.finished
+        await client.close()
+
+    _run_with_server(scenario, sessions)
+    assert sessions[0].requests == ["LIST MENU", "ADD 1", "ADD 7", "LIST ORDER", "COMMIT paid"]
+
+
+def test_menu_cache():
+    # The first request fills the cache, and the second is answered from it.
+    sessions = []
+    cache = CafeMenuCache()
+
+    async def scenario(port):
+        client = await AsyncCafeProtocolClient.connect("127.0.0.1", port, cache)
+        assert await client.send_menu_items_request() == [(0, "Coffee"), (1, "Tea")]
+        assert await client.send_menu_items_request() == [(0, "Coffee"), (1, "Tea")]
+        await client.close()
+
+    _run_with_server(scenario, sessions)
+    assert sessions[0].requests == ["LIST MENU IF-NOT 0"]
+    assert cache.version == 3
+
+
+def test_concurrent_clients():
+    sessions = []
+
+    async def customer(port):
+        client = await AsyncCafeProtocolClient.connect("127.0.0.1", port)
+        await client.send_add_item_request(1)
+        order_number = await client.send_commit_order_response("paid")
+        await client.close()
+        return order_number
+
+    async def scenario(port):
+        results = await asyncio.gather(*(customer(port) for _ in range(50)))
+        assert results == [42] * 50
+
+    _run_with_server(scenario, sessions)
+    assert len(sessions) == 50
@@ -0,0 +1,117 @@
+import asyncio
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from cafe import AsyncCafeIO, AsyncCafeServer, CafeSession
+
+
+class EchoSession(CafeSession):
+    """
+    A trivial session that answers every request with OK followed by the request,
+    and is done after a CANCEL request.
+    """
+    def __init__(self, io: AsyncCafeIO):
+        self._io = io
+        self._done = False
+        self.closed = False
+
+    @property
+    def done(self) -> bool:
+        return self._done
+
+    def serve_request(self, request: str):
+        self._io.write_string(f"OK {request}")
+        self._io.flush()
+        self._done = request == "CANCEL"
+
+    def close(self):
+        self.closed = True
+
+
+class DeferredSession(EchoSession):
+    """
+    A session whose COMMIT requests are answered once `release` is set, by work
+    done on another thread.
+    """
+    executor = ThreadPoolExecutor(4)
+    release = threading.Event()
+
+    def serve_request(self, request: str) -> Future:
+        if request != "COMMIT":
+            return super().serve_request(request)
+        return self.executor.submit(self.release.wait)
+
+    def complete_request(self, future: Future):
+        self._io.write_string(f"OK {future.result()}")
+        self._io.flush()
+
+
+async def _exchange(io: AsyncCafeIO, request: str) -> str:
+    io.write_string(request)
+    io.flush()
+    return await io.read_string()
+
+
+def test_serves_concurrent_sessions():
+    # A client that connects and then says nothing shouldn't prevent
+    # other clients from being served.
+    sessions = []
+
+    def create_session(io):
+        session = EchoSession(io)
+        sessions.append(session)
+        return session
+
+    async def scenario():
+        server = AsyncCafeServer(create_session, "127.0.0.1")
+        await server.start()
+        idle = await AsyncCafeIO.connect("127.0.0.1", server.port)
+        busy = await AsyncCafeIO.connect("127.0.0.1", server.port)
+        assert await _exchange(busy, "LIST MENU") == "OK LIST MENU"
+        assert await _exchange(busy, "CANCEL") == "OK CANCEL"
+        await idle.close()
+        await busy.close()
+        await asyncio.sleep(0.05)
+        await server.close()
+
+    asyncio.run(scenario())
+    assert len(sessions) == 2
+    assert all(session.closed for session in sessions)
+
+
+def test_closes_connection_when_done():
+    async def scenario():
+        server = AsyncCafeServer(EchoSession, "127.0.0.1")
+        await server.start()
+        client = await AsyncCafeIO.connect("127.0.0.1", server.port)
+        assert await _exchange(client, "CANCEL") == "OK CANCEL"
+        try:
+            await client.read_string()
+            assert False, "expected end of stream"
+        except EOFError:
+            pass
+        await client.close()
+        await server.close()
+
+    asyncio.run(scenario())
+
+
+def test_deferred_response_does_not_block_loop():
+    # While one session waits for its deferred response, others are served.
+    async def scenario():
+        server = AsyncCafeServer(DeferredSession, "127.0.0.1")
+        await server.start()
+        committing = await AsyncCafeIO.connect("127.0.0.1", server.port)
+        other = await AsyncCafeIO.connect("127.0.0.1", server.port)
+        committing.write_string("COMMIT")
+        committing.write_string("LIST MENU")
+        committing.flush()
+        assert await _exchange(other, "LIST MENU") == "OK LIST MENU"
+        DeferredSession.release.set()
+        assert await committing.read_string() == "OK True"
+        assert await committing.read_string() == "OK LIST MENU"
+        await committing.close()
+        await other.close()
+        await server.close()
+
+    asyncio.run(scenario())
@@ -0,0 +1,12 @@
+from cafe.bench_startup import parse_importtime
+
+REPORT = """\
+import time: self [us] | cumulative | imported package
+import time:       307 |        307 |     warnings
+import time:       295 |        602 |   importlib
+import time:      2362 |       2963 | cafe
+"""
+
+
+def test_parse_importtime():
+    assert parse_importtime(REPORT) == {"warnings": 307, "importlib": 295, "cafe": 2362}
@@ -0,0 +1,73 @@
+import asyncio
+
+from pytest import raises
+
+from cafe import AsyncCafeServer
+from cafe.bench import LoadGenerator, percentile, summarize
+
+from .async_cafe_protocol_client_test import SCRIPT, ScriptedSession
+
+
+def test_percentile():
+    values = [float(n) for n in range(1, 1001)]
+    assert percentile(values, 50.0) == 500.0
+    assert percentile(values, 99.0) == 990.0
+    assert percentile(values, 99.9) == 999.0
+    assert percentile(values, 100.0) == 1000.0
+    assert percentile([3.0], 99.9) == 3.0
+    assert percentile([], 50.0) == 0.0
+
+
+def test_summarize():
+    summary = summarize({"ADD": [0.001, 0.003], "LIST": [0.002]}, 1, 2.0)
+    assert summary["requests"] == 3
+    assert summary["requests_per_sec"] == 1.5
+    assert summary["p50_ms"] == 2.0
+    assert summary["p999_ms"] == 3.0
+    assert summary["errors"] == 1
+    assert summary["verbs"]["ADD"]["requests"] == 2
+    assert summary["verbs"]["LIST"]["p99_ms"] == 2.0
+
+
+def test_load_generator():
+    # Every customer places orders of LIST MENU, ADD and COMMIT requests.
+    script = dict(SCRIPT, **{"ADD 0": ["OK order has 1 item(s)"], "COMMIT bench": ["OK 42"]})
+    sessions = []
+
+    def create_session(io):
+        session = ScriptedSession(io, script)
+        sessions.append(session)
+        return session
+
+    async def scenario():
+        server = AsyncCafeServer(create_session, "127.0.0.1")
+        await server.start()
+        try:
+            return await LoadGenerator("127.0.0.1", server.port, customers=5, items_per_order=2).run(0.2)
+        finally:
+            await server.close()
+
+    summary = asyncio.run(scenario())
+    assert summary["errors"] == 0
+    assert summary["orders"] == len(sessions) > 0
+    assert summary["verbs"]["LIST"]["requests"] == summary["orders"]
+    assert summary["verbs"]["ADD"]["requests"] == 2 * summary["orders"]
+    assert summary["verbs"]["COMMIT"]["requests"] == summary["orders"]
+    assert all(session.requests[0] == "LIST MENU" and session.requests[-1] == "COMMIT bench"
+               for session in sessions)
+
+
+def test_load_generator_with_empty_menu():
+    # A server with nothing to order stops the run, instead of failing every order.
+    script = dict(SCRIPT, **{"LIST MENU": ["OK 0"]})
+
+    async def scenario():
+        server = AsyncCafeServer(lambda io: ScriptedSession(io, script), "127.0.0.1")
+        await server.start()
+        try:
+            return await LoadGenerator("127.0.0.1", server.port, customers=2).run(0.2)
+        finally:
+            await server.close()
+
+    with raises(ValueError, match="menu is empty"):
+        asyncio.run(scenario())
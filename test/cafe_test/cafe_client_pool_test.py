@@ -0,0 +1,89 @@
+import socket
+import threading
+import time
+
+from pytest import fixture, raises
+
+from cafe import CafeClientPool, ThreadedCafeServer
+
+from .threaded_cafe_server_test import EchoSession
+
+
+@fixture
+def server():
+    server = ThreadedCafeServer(EchoSession, "127.0.0.1", max_workers=8)
+    server.start()
+    thread = threading.Thread(target=server.serve_forever, args=(0.05,))
+    thread.start()
+    yield server
+    server.close()
+    thread.join()
+
+
+def _wait_for_idle(pool: CafeClientPool, n: int):
+    deadline = time.monotonic() + 5
+    while pool.num_idle < n and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert pool.num_idle == n
+
+
+def test_pool_keeps_warm_connections(server: ThreadedCafeServer):
+    # Connections are opened ahead of demand, and replaced once handed out.
+    with CafeClientPool("127.0.0.1", server.port, size=2) as pool:
+        _wait_for_idle(pool, 2)
+        with pool.order() as client:
+            assert client.send_add_item_request(3) == "ADD 3"
+            client.send_cancel_order_response()
+            assert client.finished
+        _wait_for_idle(pool, 2)
+
+
+def test_pool_bounds_connections(server: ThreadedCafeServer):
+    with CafeClientPool("127.0.0.1", server.port, size=1, max_connections=1) as pool:
+        client = pool.acquire()
+        with raises(TimeoutError):
+            pool.acquire(timeout=0.1)
+        pool.release(client)
+        pool.release(pool.acquire(timeout=5))
+    with raises(RuntimeError):
+        pool.acquire()
+
+
+def test_pool_call_timeout():
+    # A server that accepts connections but never responds can't block a call
+    # for longer than the call timeout.
+    listener = socket.create_server(("127.0.0.1", 0))
+    with listener, CafeClientPool("127.0.0.1", listener.getsockname()[1], size=0,
+                                  call_timeout=0.1) as pool:
+        with pool.order() as client:
+            with raises(TimeoutError):
+                client.send_add_item_request(3)
+
+
+def test_pool_call_deadline():
+    # A server that trickles its response can't make a call last much longer
+    # than the call timeout, though no single wait reaches it.
+    listener = socket.create_server(("127.0.0.1", 0))
+
+    def trickle():
+        connection, _ = listener.accept()
+        with connection:
+            connection.recv(100)
+            connection.sendall(b"OK 100\n")
+            for k in range(100):
+                time.sleep(0.02)
+                try:
+                    connection.sendall(f"{k} Coffee\n".encode())
+                except OSError:
+                    return
+
+    thread = threading.Thread(target=trickle)
+    thread.start()
+    with listener, CafeClientPool("127.0.0.1", listener.getsockname()[1], size=0,
+                                  call_timeout=0.2) as pool:
+        started = time.monotonic()
+        with pool.order() as client:
+            with raises(TimeoutError):
+                client.send_menu_items_request()
+        assert time.monotonic() - started < 1.0
+    thread.join()
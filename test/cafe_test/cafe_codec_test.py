@@ -0,0 +1,99 @@
+import socket
+import threading
+from unittest.mock import Mock
+
+from pytest import mark, raises
+
+from cafe import (BinaryCafeCodec, CafeProtocolClient, CafeProtocolServer, SocketCafeIO,
+                  TextCafeCodec)
+
+MESSAGES = [
+    "LIST MENU",
+    "ADD 1 4 4 7",
+    "COMMIT AbC123",
+    "OK order has 300 item(s)",
+    "ERROR menu item 99 does not exist",
+    "9 Iced Tea",
+    "REMOVE 007",
+    "0 Café au lait",
+]
+
+
+@mark.parametrize("codec", [TextCafeCodec(), BinaryCafeCodec()])
+def test_round_trip(codec):
+    # Every message should decode to exactly what was encoded, even when
+    # several frames are in the buffer together.
+    buffer = bytearray()
+    for message in MESSAGES:
+        codec.encode(message, buffer)
+    start = 0
+    decoded = []
+    while start < len(buffer):
+        payload_start, payload_end, start = codec.frame_bounds(buffer, start, len(buffer))
+        decoded.append(codec.decode(buffer[payload_start:payload_end]))
+    assert decoded == MESSAGES
+
+
+@mark.parametrize("codec", [TextCafeCodec(), BinaryCafeCodec()])
+def test_incomplete_frame(codec):
+    buffer = bytearray()
+    codec.encode("ADD 1 4 4 7", buffer)
+    assert codec.frame_bounds(buffer, 0, len(buffer) - 1) is None
+
+
+@mark.parametrize("payload", [
+    b"\x7f",             # a keyword code that isn't assigned
+    b"\x05\x80",         # an integer tag with nothing after it
+    b"\x80\x80",         # an integer whose varint is cut short
+    b"\x81\x05ab",       # a string shorter than its length
+    b"\x81\x85",         # a string whose length is cut short
+    b"\x81\x02\xff\xfe",  # a string that isn't UTF-8
+    b"\x90",             # an unknown tag
+])
+def test_binary_malformed_payload(payload):
+    with raises(ValueError):
+        BinaryCafeCodec().decode(payload)
+
+
+def test_binary_is_compact():
+    text = bytearray()
+    binary = bytearray()
+    for message in MESSAGES:
+        TextCafeCodec().encode(message, text)
+        BinaryCafeCodec().encode(message, binary)
+    assert len(binary) < len(text)
+
+
+def test_negotiate_binary_codec():
+    # After negotiating, requests and responses should travel in binary,
+    # and be interpreted just as they would be in text.
+    client_socket, server_socket = socket.socketpair()
+    client_io = SocketCafeIO(client_socket)
+    server_io = SocketCafeIO(server_socket)
+    handler = Mock()
+    server = CafeProtocolServer(handler, server_io)
+    handler.handle_add_items.side_effect = lambda items: server.send_add_item_response(len(items))
+
+    def serve():
+        server.receive_next_request()
+        server.receive_next_request()
+
+    thread = threading.Thread(target=serve)
+    thread.start()
+    client = CafeProtocolClient(client_io)
+    assert client.negotiate_codec("binary")
+    assert client.send_add_items_request([1, 4]) == "order has 2 item(s)"
+    thread.join()
+    handler.handle_add_items.assert_called_once_with([1, 4])
+    assert client_io.codec.name == "BINARY"
+    assert server_io.codec.name == "BINARY"
+    client_io.close()
+    server_io.close()
+
+
+def test_negotiate_unsupported_codec():
+    # A channel that can't switch codecs means the client stays with text.
+    io = Mock(spec=["read_string", "write_string", "flush"])
+    client = CafeProtocolClient(io)
+    assert not client.negotiate_codec("BINARY")
+    io.write_string.assert_not_called()
@@ -0,0 +1,156 @@
+from concurrent.futures import Future
+
+from pytest import raises
+
+from cafe import (BinaryCafeCodec, CafeClientConnection, CafeClientError, CafeConnection, CafeLimits,
+                  CafeServerConnection, NEED_DATA)
+
+from .threaded_cafe_server_test import EchoSession
+
+
+def test_messages_split_across_chunks():
+    connection = CafeConnection()
+    connection.receive_data(b"LIST ME")
+    assert connection.next_message() is None
+    connection.receive_data(b"NU\n\n  ADD 4 \n")
+    assert connection.next_message() == "LIST MENU"
+    assert connection.read_string() == "ADD 4"
+    with raises(BlockingIOError):
+        connection.read_string()
+    connection.receive_data(b"CANCEL")
+    connection.receive_data(b"")
+    with raises(EOFError):
+        connection.next_message()
+
+
+def test_message_too_long():
+    connection = CafeConnection(max_message_size=8)
+    connection.receive_data(b"COMMIT 0123456789")
+    with raises(ValueError):
+        connection.next_message()
+
+
+def test_complete_message_too_long():
+    # A message that arrives whole is held to the limit too.
+    connection = CafeConnection(max_message_size=16)
+    connection.receive_data(b"ADD 1\nADD " + b"1 " * 2000 + b"\n")
+    assert connection.next_message() == "ADD 1"
+    with raises(ValueError):
+        connection.next_message()
+
+
+def test_only_flushed_output_is_sent():
+    connection = CafeConnection()
+    connection.write_string("OK 1")
+    connection.flush()
+    connection.write_string("0 Coffee")
+    assert connection.output_size == 5
+    assert connection.data_to_send() == b"OK 1\n"
+    assert connection.data_to_send() == b""
+    connection.flush()
+    assert connection.data_to_send() == b"0 Coffee\n"
+    assert connection.bytes_sent == 14
+
+
+def test_binary_codec():
+    codec = BinaryCafeCodec()
+    frame = bytearray()
+    codec.encode("ADD 4", frame)
+    connection = CafeConnection()
+    connection.set_codec(codec)
+    connection.receive_data(bytes(frame[:1]))
+    assert connection.next_message() is None
+    connection.receive_data(bytes(frame[1:]))
+    assert connection.next_message() == "ADD 4"
+
+
+def test_server_serves_pipelined_requests():
+    # Requests are served one at a time, until the session is done; requests
+    # after that are ignored.
+    connection = CafeServerConnection(EchoSession)
+    connection.receive_data(b"ADD 3\nADD 5\nCANCEL\nADD 7\n")
+    assert connection.serve_next_request()
+    assert connection.data_to_send() == b"OK ADD 3\n"
+    while connection.serve_next_request():
+        pass
+    assert connection.done
+    assert connection.data_to_send() == b"OK ADD 5\nOK CANCEL\n"
+
+
+def test_server_waits_for_complete_request():
+    connection = CafeServerConnection(EchoSession)
+    connection.receive_data(b"LIST")
+    assert not connection.serve_next_request()
+    assert not connection.done
+    connection.receive_data(b"")
+    assert not connection.serve_next_request()
+    assert connection.done
+
+
+def test_server_deferred_response():
+    # Requests after one whose response is deferred wait until it is completed.
+    future = Future()
+
+    class DeferredSession(EchoSession):
+        def serve_request(self, request: str) -> Future:
+            return future if request == "COMMIT" else super().serve_request(request)
+
+        def complete_request(self, f: Future):
+            self._io.write_string(f"OK {f.result()}")
+            self._io.flush()
+
+    connection = CafeServerConnection(DeferredSession)
+    connection.receive_data(b"COMMIT\nCANCEL\n")
+    assert connection.serve_next_request()
+    assert connection.pending is future
+    assert not connection.serve_next_request()
+    assert not connection.done
+    future.set_result(42)
+    connection.complete_pending()
+    assert connection.pending is None
+    while connection.serve_next_request():
+        pass
+    assert connection.done
+    assert connection.data_to_send() == b"OK 42\nOK CANCEL\n"
+
+
+def test_server_limits():
+    limits = CafeLimits(max_message_size=16, request_rate=0.001, request_burst=1)
+    connection = CafeServerConnection(EchoSession, limits)
+    connection.receive_data(b"ADD 1\nADD 2\n")
+    while connection.serve_next_request():
+        pass
+    assert connection.data_to_send() == b"OK ADD 1\nERROR too many requests\n"
+    connection.receive_data(b"COMMIT " + b"x" * 32)
+    assert not connection.serve_next_request()
+    assert connection.done
+
+
+def test_client_pipelined_responses():
+    client = CafeClientConnection()
+    client.send_request("LIST MENU", client._decode_list_response())
+    client.send_request("ADD 9", client._decode_response())
+    assert client.data_to_send() == b"LIST MENU\nADD 9\n"
+    client.receive_data(b"OK 2\n0 Coffee\n")
+    assert client.next_response() is NEED_DATA
+    client.receive_data(b"1 Tea\nERROR menu item 9 does not exist\n")
+    assert client.next_response() == [(0, "Coffee"), (1, "Tea")]
+    with raises(CafeClientError):
+        client.next_response()
+    assert client.pending == 0
+    with raises(RuntimeError):
+        client.next_response()
+
+
+def test_client_over_own_channel():
+    # A client that reads messages itself writes its requests to its own channel,
+    # and passes it each message of the responses.
+    channel = CafeConnection()
+    client = CafeClientConnection(io=channel)
+    client.send_request("TOTAL", client._decode_number_response())
+    client.send_request("LIST ORDER", client._decode_order_response())
+    assert channel.data_to_send() == b"TOTAL\nLIST ORDER\n"
+    assert client.receive_message("OK 849") == 849
+    assert client.receive_message("OK 1") is NEED_DATA
+    assert client.receive_message("0 4 2") == [(0, 4, 2)]
+    assert client.pending == 0
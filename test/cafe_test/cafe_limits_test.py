@@ -0,0 +1,94 @@
+import asyncio
+import socket
+import threading
+
+from pytest import fixture, raises
+
+from cafe import AsyncCafeIO, AsyncCafeServer, CafeLimits, SocketCafeIO, ThreadedCafeServer, TokenBucket
+
+from . import async_cafe_server_test
+from .cafe_metrics_test import FakeClock
+from .threaded_cafe_server_test import EchoSession, _exchange
+
+
+def test_token_bucket():
+    # The clock advances by an eighth of a second each time the bucket reads it,
+    # so at 4 tokens per second it regains a token every other take.
+    bucket = TokenBucket(4, 2, FakeClock(0.125))
+    assert bucket.take()
+    assert bucket.take()
+    assert bucket.take()
+    assert not bucket.take()
+    assert bucket.take()
+
+
+def test_token_bucket_rejects_invalid_rate():
+    with raises(ValueError):
+        TokenBucket(0, 1)
+
+
+def test_no_rate_limiter_without_rate():
+    assert CafeLimits().rate_limiter() is None
+    assert CafeLimits(request_rate=10).rate_limiter() is not None
+
+
+@fixture
+def limited_server():
+    limits = CafeLimits(idle_timeout=0.2, max_message_size=64, request_rate=0.001, request_burst=2)
+    server = ThreadedCafeServer(EchoSession, "127.0.0.1", max_workers=2, limits=limits)
+    server.start()
+    thread = threading.Thread(target=server.serve_forever, args=(0.05,))
+    thread.start()
+    yield server
+    server.close()
+    thread.join()
+
+
+def _assert_closed_by_server(io: SocketCafeIO):
+    io.set_timeout(5)
+    with raises(EOFError):
+        io.read_string()
+    io.close()
+
+
+def test_idle_client_disconnected(limited_server: ThreadedCafeServer):
+    io = SocketCafeIO.connect("127.0.0.1", limited_server.port)
+    _assert_closed_by_server(io)
+
+
+def test_slow_request_disconnected(limited_server: ThreadedCafeServer):
+    # A request sent a little at a time must be complete by the deadline.
+    sock = socket.create_connection(("127.0.0.1", limited_server.port))
+    sock.sendall(b"LI")
+    _assert_closed_by_server(SocketCafeIO(sock))
+
+
+def test_long_request_disconnected(limited_server: ThreadedCafeServer):
+    sock = socket.create_connection(("127.0.0.1", limited_server.port))
+    sock.sendall(b"COMMIT " + b"x" * 100)
+    _assert_closed_by_server(SocketCafeIO(sock))
+
+
+def test_request_rate_limited(limited_server: ThreadedCafeServer):
+    io = SocketCafeIO.connect("127.0.0.1", limited_server.port)
+    assert _exchange(io, "LIST MENU") == "OK LIST MENU"
+    assert _exchange(io, "LIST ORDER") == "OK LIST ORDER"
+    assert _exchange(io, "CANCEL") == "ERROR too many requests"
+    io.close()
+
+
+def test_async_idle_client_disconnected():
+    limits = CafeLimits(idle_timeout=0.2, request_rate=0.001, request_burst=1)
+
+    async def scenario():
+        server = AsyncCafeServer(async_cafe_server_test.EchoSession, "127.0.0.1", limits=limits)
+        await server.start()
+        client = await AsyncCafeIO.connect("127.0.0.1", server.port)
+        assert await async_cafe_server_test._exchange(client, "LIST MENU") == "OK LIST MENU"
+        assert await async_cafe_server_test._exchange(client, "CANCEL") == "ERROR too many requests"
+        with raises(EOFError):
+            await asyncio.wait_for(client.read_string(), 5)
+        await client.close()
+        await server.close()
+
+    asyncio.run(scenario())
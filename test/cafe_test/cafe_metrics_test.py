@@ -0,0 +1,134 @@
+import threading
+import time
+import urllib.request
+from unittest.mock import Mock
+
+from cafe import CafeMetrics, CafeProtocolServer, SocketCafeIO, ThreadedCafeServer
+from cafe.cafe_metrics import LATENCY_BUCKETS
+
+from .cafe_protocol_server_test import MockCafeIO
+from .threaded_cafe_server_test import EchoSession, _exchange
+
+
+class FakeClock:
+    """
+    A clock that advances by a fixed step each time it is read.
+    """
+    def __init__(self, step: float):
+        self.now = 0.0
+        self.step = step
+
+    def __call__(self) -> float:
+        self.now += self.step
+        return self.now
+
+
+def test_record_request():
+    metrics = CafeMetrics()
+    metrics.record_request("ADD", False, 0.00002, 2.0)
+    metrics.record_request("ADD", True, 0.00002, 0.001)
+    stats = metrics.snapshot()["verbs"]["ADD"]
+    assert stats["requests"] == 2
+    assert stats["errors"] == 1
+    assert stats["parse"]["buckets"][LATENCY_BUCKETS.index(0.000025)] == 2
+    # a latency above the last bound is counted in the overflow bucket
+    assert stats["handle"]["buckets"][-1] == 1
+    assert stats["handle"]["buckets"][LATENCY_BUCKETS.index(0.001)] == 1
+    assert stats["handle"]["sum"] == 2.001
+    # sending the response isn't attributed to a verb
+    assert set(stats) == {"requests", "errors", "parse", "handle"}
+
+
+def test_sessions():
+    metrics = CafeMetrics()
+    metrics.session_opened()
+    metrics.session_opened()
+    metrics.session_closed(10, 20)
+    snapshot = metrics.snapshot()
+    assert snapshot["live_sessions"] == 1
+    assert snapshot["sessions"] == 2
+    assert snapshot["bytes_received"] == 10
+    assert snapshot["bytes_sent"] == 20
+
+
+def test_protocol_server_records_requests():
+    # Each phase reads the clock once more, so each takes one step.
+    metrics = CafeMetrics(FakeClock(0.001))
+    handler = Mock()
+    server = CafeProtocolServer(handler, MockCafeIO(), metrics)
+    server.dispatch_request("LIST MENU")
+    server.dispatch_request("ADD x")
+    server.dispatch_request("FROB 1")
+    verbs = metrics.snapshot()["verbs"]
+    assert verbs["LIST"]["requests"] == 1
+    assert verbs["LIST"]["errors"] == 0
+    assert verbs["ADD"]["errors"] == 1
+    assert verbs["UNRECOGNIZED"]["errors"] == 1
+    for phase in ("parse", "handle"):
+        assert verbs["LIST"][phase]["sum"] == 0.001
+
+
+def test_render_prometheus():
+    metrics = CafeMetrics()
+    metrics.record_request("COMMIT", False, 0.00002, 0.5)
+    text = metrics.render_prometheus()
+    lines = text.splitlines()
+    assert 'cafe_requests_total{verb="COMMIT"} 1' in lines
+    assert 'cafe_request_errors_total{verb="COMMIT"} 0' in lines
+    assert 'cafe_request_phase_seconds_bucket{verb="COMMIT",phase="handle",le="0.25"} 0' in lines
+    assert 'cafe_request_phase_seconds_bucket{verb="COMMIT",phase="handle",le="0.5"} 1' in lines
+    assert 'cafe_request_phase_seconds_bucket{verb="COMMIT",phase="handle",le="+Inf"} 1' in lines
+    assert 'cafe_request_phase_seconds_count{verb="COMMIT",phase="parse"} 1' in lines
+    assert "cafe_live_sessions 0" in lines
+
+
+def test_serve_http():
+    metrics = CafeMetrics()
+    metrics.record_request("LIST", False, 0.0, 0.0)
+    http_server = metrics.serve_http()
+    try:
+        url = f"http://127.0.0.1:{http_server.server_address[1]}/metrics"
+        with urllib.request.urlopen(url, timeout=5) as response:
+            assert response.headers["Content-Type"].startswith("text/plain")
+            assert 'cafe_requests_total{verb="LIST"} 1' in response.read().decode("utf-8")
+    finally:
+        http_server.shutdown()
+        http_server.server_close()
+
+
+def test_start_reporting():
+    metrics = CafeMetrics()
+    reported = []
+    called = threading.Event()
+
+    def callback(snapshot):
+        reported.append(snapshot)
+        called.set()
+
+    stop = metrics.start_reporting(callback, 0.01)
+    assert called.wait(5)
+    stop.set()
+    assert reported[0]["sessions"] == 0
+
+
+def test_threaded_server_counts_sessions():
+    metrics = CafeMetrics()
+    server = ThreadedCafeServer(EchoSession, "127.0.0.1", max_workers=2, metrics=metrics)
+    server.start()
+    thread = threading.Thread(target=server.serve_forever, args=(0.05,))
+    thread.start()
+    try:
+        io = SocketCafeIO.connect("127.0.0.1", server.port)
+        assert _exchange(io, "CANCEL") == "OK CANCEL"
+        deadline = time.monotonic() + 5
+        while metrics.snapshot()["live_sessions"] and time.monotonic() < deadline:
+            time.sleep(0.01)
+        io.close()
+    finally:
+        server.close()
+        thread.join()
+    snapshot = metrics.snapshot()
+    assert snapshot["sessions"] == 1
+    assert snapshot["live_sessions"] == 0
+    assert snapshot["bytes_received"] == len(b"CANCEL\n")
+    assert snapshot["bytes_sent"] == len(b"OK CANCEL\n")
@@ -0,0 +1,56 @@
+from pytest import raises
+
+from cafe import CafeOrder
+
+
+def test_add_items():
+    # Units of the same item share a line.
+    order = CafeOrder()
+    order.add(9)
+    order.add(4)
+    order.add(9, 39)
+    assert len(order) == 41
+    assert order.num_lines == 2
+    assert order.lines() == [(9, 40), (4, 1)]
+    assert order.quantity(9) == 40
+    assert order.quantity(5) == 0
+    assert order.item_ids().count(9) == 40
+
+
+def test_remove_unit():
+    # Removing the last unit of a line removes the line.
+    order = CafeOrder()
+    order.add(9, 2)
+    order.add(4)
+    order.add(7)
+    order.remove_unit(0)
+    assert order.lines() == [(9, 1), (4, 1), (7, 1)]
+    order.remove_unit(1)
+    assert order.lines() == [(9, 1), (7, 1)]
+    assert len(order) == 2
+    with raises(IndexError):
+        order.remove_unit(2)
+    with raises(IndexError):
+        order.remove_unit(-1)
+
+
+def test_quantity_limit():
+    order = CafeOrder()
+    order.add(1, CafeOrder.MAX_QUANTITY)
+    with raises(ValueError):
+        order.add(1)
+    assert len(order) == CafeOrder.MAX_QUANTITY
+
+
+def test_lines_found_after_removal():
+    # Items on lines that moved up are still found on their new lines.
+    order = CafeOrder()
+    order.add(9)
+    order.add(4)
+    order.add(7)
+    order.remove_unit(0)
+    assert order.quantity(9) == 0
+    order.add(7)
+    order.add(9)
+    assert order.lines() == [(4, 1), (7, 2), (9, 1)]
+    assert order.quantity(7) == 2
@@ -0,0 +1,30 @@
+import subprocess
+import sys
+
+from pytest import raises
+
+import cafe
+
+
+def test_import_is_lazy():
+    # Importing the package mustn't import any of its modules until one of
+    # their names is used.
+    statement = ("import sys, cafe; "
+                 "print(sorted(name for name in sys.modules if name.startswith('cafe.')))")
+    result = subprocess.run([sys.executable, "-c", statement], capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == "[]"
+
+
+def test_names_are_loaded_on_use():
+    from cafe.cafe_protocol_client import CafeProtocolClient
+    assert cafe.CafeProtocolClient is CafeProtocolClient
+    assert "CafeProtocolClient" in vars(cafe)
+    assert "SocketCafeIO" in dir(cafe)
+    assert set(cafe.__all__) <= set(dir(cafe))
+
+
+def test_unknown_name():
+    with raises(AttributeError):
+        cafe.NoSuchThing
+    with raises(ImportError):
+        from cafe import NoSuchThing
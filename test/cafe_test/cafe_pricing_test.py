@@ -0,0 +1,109 @@
+import random
+
+from pytest import raises
+
+from cafe import (CafeMenu, CafeMenuItem, CafeOrder, CafeService, ComboRule, FulfillmentOrder, FulfillmentQueue,
+                  LocalOrderNumberAllocator, PricingTable, QuantityDiscount, RunningTotal)
+
+from .fulfillment_queue_test import RecordingSink
+
+MENU = CafeMenu(1, [
+    CafeMenuItem(0, "Burger", 600),
+    CafeMenuItem(1, "Chips", 200),
+    CafeMenuItem(2, "Drink", 200),
+    CafeMenuItem(3, "Coffee", 250),
+    CafeMenuItem(4, "Cookie", 100),
+])
+# a burger with chips and a drink, and two cookies with a coffee
+COMBOS = [ComboRule("Meal", (0, 1, 2), 850), ComboRule("Treat", (4, 3, 4), 380)]
+DISCOUNTS = [QuantityDiscount(3, 10, 10), QuantityDiscount(3, 50, 20)]
+
+
+def test_unit_price():
+    table = PricingTable(MENU, COMBOS, DISCOUNTS)
+    assert table.unit_price(3, 1) == 250
+    assert table.unit_price(3, 9) == 250
+    assert table.unit_price(3, 10) == 225
+    assert table.unit_price(3, 500) == 200
+    assert table.line_price(3, 10) == 2250
+    assert table.line_price(0, 0) == 0
+    # an item that isn't on the menu is priced at zero
+    assert table.unit_price(99) == 0
+
+
+def test_combos():
+    table = PricingTable(MENU, COMBOS, DISCOUNTS)
+    order = CafeOrder()
+    order.add(0, 2)
+    order.add(1)
+    order.add(2, 3)
+    # one meal, a burger and two drinks
+    assert table.price(order) == 850 + 600 + 2 * 200
+    order.add(4, 5)
+    order.add(3)
+    # one treat and three cookies
+    assert table.price(order) == 850 + 600 + 2 * 200 + 380 + 3 * 100
+
+
+def test_invalid_rules():
+    with raises(ValueError):
+        PricingTable(MENU, [ComboRule("Meal", (0, 1), 700), ComboRule("Lunch", (1, 2), 350)])
+    with raises(ValueError):
+        PricingTable(MENU, discounts=[QuantityDiscount(3, 10, 110)])
+    # rules for items that aren't on the menu don't apply
+    table = PricingTable(MENU, [ComboRule("Gone", (0, 99), 1)], [QuantityDiscount(99, 1, 50)])
+    assert table.line_price(0, 1) == 600
+
+
+def _reference_price(quantities: dict[int, int]) -> int:
+    # prices an order from scratch, the long way
+    def loose(item_id: int, quantity: int) -> int:
+        unit = MENU.item(item_id).price
+        if item_id == 3:
+            unit = unit * 80 // 100 if quantity >= 50 else unit * 90 // 100 if quantity >= 10 else unit
+        return quantity * unit
+
+    q = dict.fromkeys(range(5), 0)
+    q.update(quantities)
+    meals = min(q[0], q[1], q[2])
+    treats = min(q[4] // 2, q[3])
+    return (meals * 850 + treats * 380 + sum(loose(i, q[i] - meals) for i in (0, 1, 2))
+            + loose(3, q[3] - treats) + loose(4, q[4] - 2 * treats))
+
+
+def test_running_total_matches_repricing():
+    table = PricingTable(MENU, COMBOS, DISCOUNTS)
+    order = CafeOrder()
+    total = RunningTotal(table)
+    rng = random.Random(7)
+    for _ in range(2000):
+        if order.num_lines and rng.random() < 0.4:
+            k = rng.randrange(order.num_lines)
+            total.remove(order.item_id(k))
+            order.remove_unit(k)
+        else:
+            item_id = rng.randrange(5)
+            quantity = rng.choice((1, 1, 1, 7, 30))
+            order.add(item_id, quantity)
+            total.add(item_id, quantity)
+        assert total.total == _reference_price(dict(order.lines()))
+    assert RunningTotal(table, order).total == total.total
+
+
+def test_service_prices_orders():
+    sink = RecordingSink()
+    service = CafeService(list(MENU.items), LocalOrderNumberAllocator(100), FulfillmentQueue(sink),
+                          combos=COMBOS, discounts=DISCOUNTS)
+    table = service.pricing()
+    assert table.menu_version == 1
+    assert service.place_order("abc", [0, 1, 2, 3]) == 100
+    # a total that is already known is used as it is
+    assert service.place_order("def", [3], total=240) == 101
+    # changing the menu compiles new pricing
+    service.update_menu_items([CafeMenuItem(3, "Coffee", 300)])
+    assert service.pricing() is not table
+    assert service.pricing().line_price(3, 10) == 2700
+    service.close()
+    orders = [order for batch in sink.batches for order in batch]
+    assert [order.total for order in orders] == [1100, 240]
+    assert FulfillmentOrder.from_json(orders[0].to_json()).total == 1100
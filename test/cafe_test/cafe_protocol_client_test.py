@@ -1,7 +1,7 @@
 
 from pytest import fixture, raises
 
-from cafe import CafeIO, CafeProtocolClient, CafeClientError, CafeServerError
+from cafe import CafeIO, CafeMenuCache, CafeProtocolClient, CafeClientError, CafeServerError
 
 
 class MockCafeIO(CafeIO):
@@ -18,6 +18,9 @@ class MockCafeIO(CafeIO):
         # attribute. We can inspect in our test case to determine what the client
         # requested.
         self.request_string = None
+        # Every request string is also appended to the `request_strings` list, so
+        # we can inspect what was sent when the client sends several requests.
+        self.request_strings = []
         # This attribute is used in returning the sequence of response strings for each
         # call to read_string.
         self.response_index = 0
@@ -29,6 +32,7 @@ class MockCafeIO(CafeIO):
 
     def write_string(self, s: str):
         self.request_string = s
+        self.request_strings.append(s)
 
 
 @fixture
@@ -118,3 +122,165 @@ def test_add_item_error(client_protocol: CafeProtocolClient, mock_io: MockCafeIO
 #
 # Write similar test cases for the other (public) methods on the CafeProtocolClient class
 #
+
+
+def test_pipeline(client_protocol: CafeProtocolClient, mock_io: MockCafeIO):
+    # A pipeline sends all of its requests before reading any responses,
+    # and returns the result of each request in order.
+    mock_io.response_strings.extend(["OK order has 1 item(s)", "OK order has 2 item(s)",
+                                     "OK 2", "0 3 1", "1 5 1"])
+    results = client_protocol.pipeline().add(3).add(5).list_order().execute()
+    assert mock_io.request_strings == ["ADD 3", "ADD 5", "LIST ORDER"]
+    assert results == ["order has 1 item(s)", "order has 2 item(s)", [(0, 3, 1), (1, 5, 1)]]
+
+
+def test_pipeline_with_error(client_protocol: CafeProtocolClient, mock_io: MockCafeIO):
+    # An ERROR response for one request shouldn't stop the responses to the
+    # requests that follow it from being read.
+    mock_io.response_strings.extend(["ERROR menu item 99 does not exist", "OK order has 1 item(s)"])
+    with raises(CafeClientError) as err:
+        client_protocol.pipeline().add(99).add(5).execute()
+    assert "99" in str(err)
+    assert mock_io.response_index == 2
+
+
+def test_pipeline_results_with_error(client_protocol: CafeProtocolClient, mock_io: MockCafeIO):
+    mock_io.response_strings.extend(["ERROR menu item 99 does not exist", "OK order has 1 item(s)"])
+    results = client_protocol.pipeline().add(99).add(5).execute(raise_on_error=False)
+    assert isinstance(results[0], CafeClientError)
+    assert results[1] == "order has 1 item(s)"
+
+
+def test_add_items(client_protocol: CafeProtocolClient, mock_io: MockCafeIO):
+    mock_io.response_strings.append("OK order has 4 item(s)")
+    client_protocol.send_add_items_request([1, 4, 4, 7])
+    assert mock_io.request_strings == ["ADD 1 4 4 7"]
+
+
+def test_remove_items(client_protocol: CafeProtocolClient, mock_io: MockCafeIO):
+    mock_io.response_strings.append("OK removed items 2 0")
+    client_protocol.send_remove_items_request([2, 0])
+    assert mock_io.request_strings == ["REMOVE 2 0"]
+
+
+class FakeClock:
+    """
+    A clock that only advances when told to, for testing time to live.
+    """
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_menu_cache(mock_io: MockCafeIO):
+    # The first request fetches the menu; a request within the time to live is
+    # answered from the cache; after that, the cached version is revalidated.
+    clock = FakeClock()
+    cache = CafeMenuCache(ttl=60, clock=clock)
+    mock_io.response_strings += ["OK 2 VERSION 7", "0 Coffee", "1 Tea", "OK NOT-MODIFIED"]
+    expected = [(0, "Coffee"), (1, "Tea")]
+    assert CafeProtocolClient(mock_io, cache).send_menu_items_request() == expected
+    assert mock_io.request_strings == ["LIST MENU IF-NOT 0"]
+    assert cache.version == 7
+    clock.now = 59
+    assert CafeProtocolClient(mock_io, cache).send_menu_items_request() == expected
+    assert len(mock_io.request_strings) == 1
+    clock.now = 60
+    assert CafeProtocolClient(mock_io, cache).send_menu_items_request() == expected
+    assert mock_io.request_strings[1:] == ["LIST MENU IF-NOT 7"]
+    clock.now = 119
+    assert cache.fresh_items() == expected
+
+
+def test_menu_cache_modified(mock_io: MockCafeIO):
+    # A changed menu replaces the cached one.
+    cache = CafeMenuCache(ttl=0)
+    cache.store(7, [(0, "Coffee")])
+    mock_io.response_strings += ["OK 1 VERSION 8", "0 Juice"]
+    assert CafeProtocolClient(mock_io, cache).send_menu_items_request() == [(0, "Juice")]
+    assert mock_io.request_string == "LIST MENU IF-NOT 7"
+    assert cache.version == 8
+
+
+def test_menu_cache_without_version(mock_io: MockCafeIO):
+    # If the server doesn't support conditional requests, its response is used
+    # but not kept for reuse.
+    cache = CafeMenuCache()
+    mock_io.response_strings += ["OK 1", "0 Coffee"]
+    assert CafeProtocolClient(mock_io, cache).send_menu_items_request() == [(0, "Coffee")]
+    assert cache.version == 0
+    assert cache.fresh_items() is None
+
+
+def test_menu_cache_per_location(mock_io: MockCafeIO):
+    # Each location's menu is cached separately, since their versions are unrelated.
+    cache = CafeMenuCache()
+    cache.store(1, [(0, "Coffee")])
+    client = CafeProtocolClient(mock_io, cache)
+    mock_io.response_strings += ["OK b", "OK 1 VERSION 1", "0 Tea"]
+    client.send_location_request("b")
+    assert client.send_menu_items_request() == [(0, "Tea")]
+    assert mock_io.request_string == "LIST MENU IF-NOT 0"
+    assert cache.version_at("b") == 1
+    assert cache.fresh_items("b") == [(0, "Tea")]
+    assert cache.fresh_items() == [(0, "Coffee")]
+    # a location the server refused doesn't change where menus are cached
+    mock_io.response_strings.append("ERROR unknown location mars")
+    with raises(CafeClientError):
+        client.send_location_request("mars")
+    assert client.send_menu_items_request() == [(0, "Tea")]
+
+
+def test_menu_cache_invalid_response(mock_io: MockCafeIO):
+    mock_io.response_strings.append("OK 1 VERSIONS 8")
+    with raises(CafeServerError):
+        CafeProtocolClient(mock_io, CafeMenuCache()).send_menu_items_request()
+
+
+
+def test_resume_session(client_protocol: CafeProtocolClient, mock_io: MockCafeIO):
+    mock_io.response_strings += ["OK Zx9-token", "OK order has 2 item(s)"]
+    token = client_protocol.send_session_request()
+    assert mock_io.request_string == "SESSION"
+    assert token == "Zx9-token"
+    assert client_protocol.send_resume_request(token) == "order has 2 item(s)"
+    assert mock_io.request_string == "RESUME Zx9-token"
+
+
+def test_location(client_protocol: CafeProtocolClient, mock_io: MockCafeIO):
+    mock_io.response_strings += ["OK campus", "ERROR unknown location mars"]
+    client_protocol.send_location_request("campus")
+    assert mock_io.request_string == "LOCATION campus"
+    with raises(CafeClientError):
+        client_protocol.send_location_request("mars")
+
+
+def test_list_order_items(client_protocol: CafeProtocolClient, mock_io: MockCafeIO):
+    # Each line of the order has a quantity, which may be omitted if it's 1.
+    mock_io.response_strings += ["OK 2", "0 9 40", "1 4"]
+    assert client_protocol.send_order_items_request() == [(0, 9, 40), (1, 4, 1)]
+    assert mock_io.request_string == "LIST ORDER"
+    mock_io.response_strings += ["OK 1", "0 Coffee 2"]
+    with raises(CafeServerError):
+        client_protocol.send_order_items_request()
+
+
+
+def test_finished(client_protocol: CafeProtocolClient, mock_io: MockCafeIO):
+    # The client is finished once the server accepts a COMMIT, but not after an ERROR.
+    mock_io.response_strings += ["ERROR order is empty", "OK 123"]
+    with raises(CafeClientError):
+        client_protocol.send_commit_order_response("abc")
+    assert not client_protocol.finished
+    assert client_protocol.send_commit_order_response("abc") == 123
+    assert client_protocol.finished
+
+
+def test_total(client_protocol: CafeProtocolClient, mock_io: MockCafeIO):
+    mock_io.response_strings += ["OK 1247", "OK lots"]
+    assert client_protocol.send_total_request() == 1247
+    assert mock_io.request_string == "TOTAL"
+    with raises(CafeServerError):
+        client_protocol.send_total_request()
@@ -2,7 +2,7 @@ from unittest.mock import Mock
 
 from pytest import fixture
 
-from cafe import CafeIO, CafeProtocolServer
+from cafe import CafeIO, CafeLimits, CafeMenu, CafeMenuItem, CafeOrder, CafeOrderHandler, CafeProtocolServer
 
 
 class MockCafeIO(CafeIO):
@@ -220,4 +220,221 @@ def test_send_list_order_response(server_protocol: CafeProtocolServer, mock_io:
     # `send_list_order_response` method, and confirm that the strings in the generated
     # response are a match for the menu items we passed to it. Use the `test_send_list_menu_response`
     # test case as a guide to implement this test case.
-    assert False        # remove this line when implementing the test
\ No newline at end of file
+    assert False        # remove this line when implementing the test
+
+def test_commit_order_request_preserves_token_case(server_protocol: CafeProtocolServer,
+                                                   mock_handler: Mock,
+                                                   mock_io: MockCafeIO):
+    # Only the request verb is case-insensitive; the settlement token must be
+    # passed to the handler exactly as the client sent it.
+    mock_io.request_string = "commit AbC123xyz"
+    server_protocol.receive_next_request()
+    mock_handler.handle_commit_order.assert_called_once_with("AbC123xyz")
+
+
+def test_list_request_keyword_is_case_insensitive(server_protocol: CafeProtocolServer,
+                                                  mock_handler: Mock,
+                                                  mock_io: MockCafeIO):
+    mock_io.request_string = "list menu"
+    server_protocol.receive_next_request()
+    mock_handler.handle_list_menu.assert_called_once()
+
+
+def test_unrecognized_request(server_protocol: CafeProtocolServer, mock_io: MockCafeIO):
+    mock_io.request_string = "REFUND 42"
+    server_protocol.receive_next_request()
+    assert mock_io.response_strings == ["ERROR unrecognized request action"]
+
+
+def test_registered_request(server_protocol: CafeProtocolServer, mock_io: MockCafeIO):
+    # A verb registered with the interpreter should be dispatched to its action,
+    # and the declared argument count should be enforced.
+    requests = []
+    server_protocol.register_request("ping", requests.append, 0, 1)
+    mock_io.request_string = "PING hello"
+    server_protocol.receive_next_request()
+    assert requests == [["hello"]]
+    mock_io.request_string = "PING hello there"
+    server_protocol.receive_next_request()
+    assert requests == [["hello"]]
+    assert mock_io.response_strings == ["ERROR unrecognized PING request"]
+
+
+def test_registered_request_is_not_shared(server_protocol: CafeProtocolServer,
+                                          mock_handler: Mock):
+    # Registering a verb with one interpreter shouldn't affect other instances.
+    server_protocol.register_request("PING", lambda args: None)
+    other_io = MockCafeIO()
+    other = CafeProtocolServer(mock_handler, other_io)
+    other_io.request_string = "PING"
+    other.receive_next_request()
+    assert other_io.response_strings[0].startswith("ERROR ")
+
+
+def test_total_request(server_protocol: CafeProtocolServer, mock_handler: Mock,
+                       mock_io: MockCafeIO):
+    mock_io.request_string = "total"
+    server_protocol.receive_next_request()
+    mock_handler.handle_total.assert_called_once_with()
+    mock_io.request_string = "TOTAL 1"
+    server_protocol.receive_next_request()
+    assert mock_io.response_strings == ["ERROR unrecognized TOTAL request"]
+
+
+def test_unsupported_total_request(mock_io: MockCafeIO):
+    # A handler that doesn't override the hook refuses the request.
+    handler = Mock(handle_total=Mock(side_effect=NotImplementedError))
+    server_protocol = CafeProtocolServer(handler, mock_io)
+    mock_io.request_string = "TOTAL"
+    server_protocol.receive_next_request()
+    assert mock_io.response_strings == ["ERROR unsupported TOTAL request"]
+
+
+def test_add_items_request(server_protocol: CafeProtocolServer,
+                           mock_handler: Mock,
+                           mock_io: MockCafeIO):
+    # An ADD request with several item numbers is a batch, which the
+    # interpreter passes to the handler as a list.
+    mock_io.request_string = "ADD 1 4 4 7"
+    server_protocol.receive_next_request()
+    mock_handler.handle_add_items.assert_called_once_with([1, 4, 4, 7])
+    mock_handler.handle_add_item.assert_not_called()
+
+
+def test_add_items_request_with_invalid_item_number(server_protocol: CafeProtocolServer,
+                                                    mock_handler: Mock,
+                                                    mock_io: MockCafeIO):
+    # If any item number in a batch is invalid, none of them should be added.
+    mock_io.request_string = "ADD 1 x 7"
+    server_protocol.receive_next_request()
+    mock_handler.handle_add_items.assert_not_called()
+    mock_handler.handle_add_item.assert_not_called()
+    assert mock_io.response_strings == ["ERROR invalid item number"]
+
+
+def test_remove_items_request_with_duplicate_item_number(server_protocol: CafeProtocolServer,
+                                                         mock_handler: Mock,
+                                                         mock_io: MockCafeIO):
+    mock_io.request_string = "REMOVE 2 0 2"
+    server_protocol.receive_next_request()
+    mock_handler.handle_remove_items.assert_not_called()
+    assert mock_io.response_strings[0].startswith("ERROR ")
+
+
+class SingleItemOrderHandler(CafeOrderHandler):
+    """
+    A handler that only implements the single-item methods, so batch requests
+    use the default implementations in `CafeOrderHandler`.
+    """
+    def __init__(self):
+        self.server: CafeProtocolServer = None
+        self.items = []
+
+    def handle_list_menu(self):
+        pass
+
+    def handle_list_order(self):
+        pass
+
+    def handle_add_item(self, item_number: int):
+        if item_number < 10:
+            self.items.append(item_number)
+            self.server.send_add_item_response(len(self.items))
+        else:
+            self.server.send_error_response(f"menu item {item_number} does not exist")
+
+    def handle_remove_item(self, item_number: int):
+        self.items.pop(item_number)
+        self.server.send_remove_item_response(item_number)
+
+    def handle_commit_order(self, settlement_token: str):
+        pass
+
+    def handle_cancel_order(self):
+        pass
+
+
+def test_add_items_default_sends_one_response(mock_io: MockCafeIO):
+    # The default batch implementation calls `handle_add_item` for each item,
+    # but the client must still get exactly one response to its request.
+    handler = SingleItemOrderHandler()
+    handler.server = CafeProtocolServer(handler, mock_io)
+    mock_io.request_string = "ADD 1 2 3"
+    handler.server.receive_next_request()
+    assert handler.items == [1, 2, 3]
+    assert mock_io.response_strings == ["OK order has 3 item(s)"]
+    mock_io.request_string = "ADD 4 99 5"
+    handler.server.receive_next_request()
+    assert mock_io.response_strings[1:] == ["ERROR menu item 99 does not exist"]
+    # the default isn't atomic: the valid items were added despite the error
+    assert handler.items == [1, 2, 3, 4, 5]
+
+
+def test_largest_batch_fits_in_message():
+    # A batch of the most items allowed fits in a request of the default size.
+    request = "REMOVE" + " 0" * CafeProtocolServer.MAX_BATCH_ITEMS
+    assert len(request) <= CafeLimits().max_message_size
+
+
+def test_remove_items_default_removes_highest_first(mock_io: MockCafeIO):
+    handler = SingleItemOrderHandler()
+    handler.server = CafeProtocolServer(handler, mock_io)
+    handler.items = [5, 6, 7, 8]
+    mock_io.request_string = "REMOVE 0 2"
+    handler.server.receive_next_request()
+    assert handler.items == [6, 8]
+    assert len(mock_io.response_strings) == 1
+    assert mock_io.response_strings[0].startswith("OK ")
+
+
+def test_send_menu_response(server_protocol: CafeProtocolServer, mock_io: MockCafeIO):
+    # A menu snapshot should produce the same response as its list of items,
+    # and the encoded response should be kept with the snapshot for reuse.
+    menu = CafeMenu(1, ["Cheeseburger", "Chips", "Water"])
+    server_protocol.send_menu_response(menu)
+    server_protocol.send_menu_response(menu)
+    expected = ["OK 3", "0 Cheeseburger", "1 Chips", "2 Water"]
+    assert mock_io.response_strings == expected + expected
+    assert menu.encoded_response(("LIST MENU", False, mock_io.block_key())) == tuple(expected)
+
+
+def test_list_menu_if_not_request(server_protocol: CafeProtocolServer,
+                                  mock_handler: Mock,
+                                  mock_io: MockCafeIO):
+    # The version number in a conditional request is passed to the handler.
+    mock_io.request_string = "LIST MENU if-not 7"
+    server_protocol.receive_next_request()
+    mock_handler.handle_list_menu_if_modified.assert_called_once_with(7)
+    mock_io.request_string = "LIST MENU IF-NOT -1"
+    server_protocol.receive_next_request()
+    mock_io.request_string = "LIST ORDER IF-NOT 7"
+    server_protocol.receive_next_request()
+    assert mock_io.response_strings == ["ERROR invalid menu version", "ERROR unrecognized LIST request"]
+
+
+def test_send_versioned_menu_response(server_protocol: CafeProtocolServer, mock_io: MockCafeIO):
+    menu = CafeMenu(7, ["Coffee"])
+    server_protocol.send_menu_response(menu, versioned=True)
+    server_protocol.send_menu_response(menu)
+    server_protocol.send_menu_not_modified_response()
+    assert mock_io.response_strings == [f"OK 1 VERSION {menu.etag}", "0 Coffee", "OK 1", "0 Coffee",
+                                        "OK NOT-MODIFIED"]
+
+
+def test_send_menu_response_lists_available_items(server_protocol: CafeProtocolServer,
+                                                  mock_io: MockCafeIO):
+    # Items are listed by their IDs, and items that are out of stock are left out.
+    menu = CafeMenu(1, [CafeMenuItem(10, "Coffee", 250),
+                        CafeMenuItem(42, "Tea", 200, available=False),
+                        CafeMenuItem(7, "Juice", 300)])
+    server_protocol.send_menu_response(menu)
+    assert mock_io.response_strings == ["OK 2", "10 Coffee", "7 Juice"]
+
+
+def test_send_order_response(server_protocol: CafeProtocolServer, mock_io: MockCafeIO):
+    order = CafeOrder()
+    for item_id in [9, 4, 9]:
+        order.add(item_id)
+    server_protocol.send_order_response(order)
+    assert mock_io.response_strings == ["OK 2", "0 9 2", "1 4 1"]
+
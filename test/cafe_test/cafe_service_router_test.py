@@ -0,0 +1,27 @@
+from pytest import raises
+
+from cafe import CafeService, CafeServiceRouter, LocalOrderNumberAllocator
+
+
+def test_route_by_location():
+    downtown = CafeService(["Coffee"], LocalOrderNumberAllocator(100))
+    campus = CafeService(["Tea"], LocalOrderNumberAllocator(200))
+    router = CafeServiceRouter({"downtown": downtown, "campus": campus})
+    assert router.locations == ("downtown", "campus")
+    assert router.default_location == "downtown"
+    assert router.service() is downtown
+    assert router.service("campus") is campus
+    assert router.service("mars") is None
+    assert router.service("campus").place_order("token", [0]) == 200
+    router.close()
+
+
+def test_invalid_locations():
+    service = CafeService(["Coffee"])
+    with raises(ValueError):
+        CafeServiceRouter({})
+    with raises(ValueError):
+        CafeServiceRouter({"north side": service})
+    with raises(ValueError):
+        CafeServiceRouter({"downtown": service}, "campus")
+    service.close()
@@ -0,0 +1,53 @@
+from pytest import raises
+
+from cafe import CafeMenu, CafeMenuItem, CafeService, LocalOrderNumberAllocator
+
+
+def test_menu_items_from_strings():
+    # Items given as strings are identified by their position in the list.
+    menu = CafeMenu(1, ["Coffee", "Tea"])
+    assert menu.item(1) == CafeMenuItem(1, "Tea")
+    assert menu.is_available(0)
+    assert not menu.is_available(2)
+
+
+def test_menu_item_ids_are_unique():
+    with raises(ValueError):
+        CafeMenu(1, [CafeMenuItem(3, "Coffee"), CafeMenuItem(3, "Tea")])
+
+
+def test_menu_etag_identifies_items():
+    # Menus at the same version in different services differ in their tags, and
+    # equal menus have equal tags whatever their versions.
+    burgers = CafeService([CafeMenuItem(0, "Hamburger", 599), CafeMenuItem(1, "Chips", 199)]).menu()
+    bowls = CafeService([CafeMenuItem(0, "Tofu Bowl", 899)]).menu()
+    assert burgers.version == bowls.version
+    assert burgers.etag != bowls.etag
+    repriced = CafeMenu(1, [CafeMenuItem(0, "Hamburger", 649), CafeMenuItem(1, "Chips", 199)])
+    assert repriced.etag != burgers.etag
+    assert repriced.updated([CafeMenuItem(0, "Hamburger", 599)]).etag == burgers.etag
+
+
+def test_update_menu_items_keeps_ids():
+    # Updating the menu adds and replaces items without renumbering the others.
+    service = CafeService([CafeMenuItem(10, "Coffee", 250), CafeMenuItem(20, "Tea", 200)])
+    menu = service.update_menu_items([CafeMenuItem(20, "Tea", 225), CafeMenuItem(5, "Juice", 300)])
+    assert menu.version == 2
+    assert [item.item_id for item in menu.items] == [10, 20, 5]
+    assert menu.item(20).price == 225
+    assert service.menu() is menu
+
+
+def test_unavailable_item():
+    # An item that is out of stock stays in the catalog, but can't be ordered.
+    service = CafeService(["Coffee", "Tea"], LocalOrderNumberAllocator(100))
+    service.set_menu_item_available(0, False)
+    assert service.menu().item(0).label == "Coffee"
+    assert service.menu_items() == (CafeMenuItem(1, "Tea"),)
+    with raises(ValueError):
+        service.place_order("token", [0, 1])
+    service.set_menu_item_available(0, True)
+    assert service.place_order("token", [0, 1]) == 100
+    with raises(KeyError):
+        service.set_menu_item_available(99, False)
+    service.close()
@@ -0,0 +1,76 @@
+import os
+
+from pytest import fixture
+
+from cafe import CafeSessionStore, SqliteCafeSessionStore
+
+from .cafe_protocol_client_test import FakeClock
+
+
+@fixture(params=["memory", "sqlite"])
+def create_store(request, tmp_path):
+    stores = []
+
+    def create(**kwargs) -> CafeSessionStore:
+        if request.param == "memory":
+            store = CafeSessionStore(**kwargs)
+        else:
+            store = SqliteCafeSessionStore(str(tmp_path / "sessions.db"), **kwargs)
+        stores.append(store)
+        return store
+
+    yield create
+    for store in stores:
+        store.close()
+
+
+def test_take_session(create_store):
+    # A saved session can be taken once.
+    store = create_store()
+    token = store.new_token()
+    assert token != store.new_token()
+    store.save(token, [1, 2])
+    assert store.take(token) == [1, 2]
+    assert store.take(token) is None
+    assert store.take("unknown") is None
+
+
+def test_session_expires(create_store):
+    clock = FakeClock()
+    store = create_store(ttl=10, clock=clock)
+    store.save("a", [1])
+    clock.now = 5
+    store.save("b", [2])
+    clock.now = 10
+    assert store.take("a") is None
+    store.save("c", [3])        # evicts expired sessions
+    assert len(store) == 2
+    assert store.take("b") == [2]
+
+
+def test_least_recently_saved_session_is_evicted(create_store):
+    store = create_store(max_sessions=2)
+    store.save("a", [1])
+    store.save("b", [2])
+    store.save("a", [1, 1])
+    store.save("c", [3])
+    assert store.take("b") is None
+    assert store.take("a") == [1, 1]
+    assert store.take("c") == [3]
+
+
+def test_sqlite_store_is_shared_by_forked_processes(tmp_path):
+    # A session saved by one worker process can be resumed in another.
+    store = SqliteCafeSessionStore(str(tmp_path / "sessions.db"))
+    store.save("a", [1])
+    pid = os.fork()
+    if pid == 0:
+        status = 0 if store.take("a") == [1] else 1
+        store.save("b", [2])
+        store.close()
+        os._exit(status)
+    _, status = os.waitpid(pid, 0)
+    assert status == 0
+    assert store.take("a") is None
+    assert store.take("b") == [2]
+    store.close()
@@ -0,0 +1,165 @@
+import io
+import json
+import queue
+import socket
+import sqlite3
+import threading
+
+from pytest import raises
+
+from cafe import (CafeMenuItem, CafeService, FileFulfillmentSink, FulfillmentOrder, FulfillmentQueue,
+                  FulfillmentSink, LocalOrderNumberAllocator, PrintFulfillmentSink, SocketFulfillmentSink,
+                  SqliteFulfillmentSink)
+
+ORDERS = [
+    FulfillmentOrder(100, "abc", (CafeMenuItem(1, "Coffee"),)),
+    FulfillmentOrder(101, "def", (CafeMenuItem(1, "Coffee"), CafeMenuItem(4, "Chips"))),
+]
+
+
+class RecordingSink(FulfillmentSink):
+    """
+    A sink that records each batch it is given, optionally waiting for an event
+    before accepting a batch.
+    """
+    def __init__(self, gate: threading.Event = None):
+        self.batches = []
+        self.closed = False
+        self.gate = gate
+        self.delivering = threading.Event()
+
+    def deliver(self, orders):
+        self.delivering.set()
+        if self.gate is not None:
+            self.gate.wait()
+        self.batches.append(list(orders))
+
+    def close(self):
+        self.closed = True
+
+
+def test_orders_are_delivered_in_batches():
+    # Orders that queue up while the sink is busy are delivered together.
+    gate = threading.Event()
+    sink = RecordingSink(gate)
+    fulfillment = FulfillmentQueue(sink, max_batch_size=2)
+    for order_number in range(5):
+        fulfillment.put(FulfillmentOrder(order_number, "token", ()))
+    gate.set()
+    fulfillment.close()
+    delivered = [order.order_number for batch in sink.batches for order in batch]
+    assert delivered == [0, 1, 2, 3, 4]
+    assert all(len(batch) <= 2 for batch in sink.batches)
+    assert len(sink.batches) < 5
+    assert sink.closed
+
+
+class FlakySink(RecordingSink):
+    """
+    A sink that fails to accept its first few batches.
+    """
+    def __init__(self, failures: int):
+        super().__init__()
+        self.failures = failures
+
+    def deliver(self, orders):
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("fulfillment service unavailable")
+        super().deliver(orders)
+
+
+def test_failed_batch_is_retried():
+    sink = FlakySink(1)
+    fulfillment = FulfillmentQueue(sink, retry_delay=0.01)
+    fulfillment.put(ORDERS[0])
+    fulfillment.put(ORDERS[1])
+    fulfillment.close()
+    assert [order for batch in sink.batches for order in batch] == ORDERS
+
+
+def test_batch_dropped_after_last_attempt(capsys):
+    sink = FlakySink(3)
+    fulfillment = FulfillmentQueue(sink, max_attempts=3, retry_delay=0.01)
+    fulfillment.put(ORDERS[0])
+    fulfillment.close()
+    assert sink.batches == []
+    assert "failed to deliver orders [100]" in capsys.readouterr().err
+
+
+def test_full_queue_applies_backpressure():
+    gate = threading.Event()
+    sink = RecordingSink(gate)
+    fulfillment = FulfillmentQueue(sink, max_size=1)
+    fulfillment.put(ORDERS[0])      # taken by the worker, which then waits
+    sink.delivering.wait()
+    fulfillment.put(ORDERS[1])      # fills the queue
+    with raises(queue.Full):
+        fulfillment.put(ORDERS[1], timeout=0.05)
+    gate.set()
+    fulfillment.close()
+    with raises(RuntimeError):
+        fulfillment.put(ORDERS[0])
+
+
+def test_service_queues_orders():
+    sink = RecordingSink()
+    service = CafeService(["Coffee", "Tea"], LocalOrderNumberAllocator(100), FulfillmentQueue(sink))
+    assert service.place_order("abc", [1, 0]) == 100
+    service.close()
+    assert sink.batches == [[FulfillmentOrder(100, "abc", (CafeMenuItem(1, "Tea"), CafeMenuItem(0, "Coffee")))]]
+
+
+def test_file_sink(tmp_path):
+    path = tmp_path / "orders.jsonl"
+    sink = FileFulfillmentSink(str(path))
+    sink.deliver(ORDERS)
+    sink.close()
+    lines = [json.loads(line) for line in path.read_text().splitlines()]
+    assert lines[1] == {"order_number": 101, "settlement_token": "def", "items": [[1, "Coffee"], [4, "Chips"]]}
+
+
+def test_sqlite_sink(tmp_path):
+    path = str(tmp_path / "orders.db")
+    sink = SqliteFulfillmentSink(path)
+    sink.deliver(ORDERS)
+    sink.close()
+    with sqlite3.connect(path) as db:
+        rows = db.execute("SELECT order_number, settlement_token FROM orders ORDER BY order_number").fetchall()
+    assert rows == [(100, "abc"), (101, "def")]
+
+
+def test_sqlite_sink_adds_total(tmp_path):
+    # A table created before totals were kept gains the column.
+    path = str(tmp_path / "orders.db")
+    with sqlite3.connect(path) as db:
+        db.execute("CREATE TABLE orders (order_number INTEGER PRIMARY KEY, settlement_token TEXT, items TEXT)")
+        db.execute("INSERT INTO orders VALUES (99, 'xyz', '[]')")
+    db.close()
+    sink = SqliteFulfillmentSink(path)
+    sink.deliver([ORDERS[0]._replace(total=849)])
+    sink.close()
+    with sqlite3.connect(path) as db:
+        rows = db.execute("SELECT order_number, total FROM orders ORDER BY order_number").fetchall()
+    db.close()
+    assert rows == [(99, 0), (100, 849)]
+
+
+def test_print_sink_shows_total():
+    out = io.StringIO()
+    PrintFulfillmentSink(out).deliver([ORDERS[1]._replace(total=3321)])
+    assert out.getvalue() == ("sending order 101 to fulfillment; settlement_token=def "
+                              "items=Coffee, Chips total=33.21\n")
+
+
+def test_socket_sink(tmp_path):
+    path = str(tmp_path / "fulfillment.sock")
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    listener.bind(path)
+    listener.listen()
+    sink = SocketFulfillmentSink(path)
+    sink.deliver(ORDERS)
+    sink.close()
+    conn, _ = listener.accept()
+    with conn, listener, conn.makefile(encoding="utf-8") as f:
+        assert [json.loads(line)["order_number"] for line in f] == [100, 101]
@@ -0,0 +1,86 @@
+import threading
+
+from pytest import raises
+
+from cafe import CafeMenuItem, CafeService, FulfillmentOrder, FulfillmentQueue, OrderJournal
+
+from .fulfillment_queue_test import RecordingSink
+
+
+def order(order_number: int) -> FulfillmentOrder:
+    return FulfillmentOrder(order_number, f"token{order_number}", (CafeMenuItem(3, "Coffee"),))
+
+
+def journaled(path: str) -> list[FulfillmentOrder]:
+    with open(path) as f:
+        return [FulfillmentOrder.from_json(line) for line in f]
+
+
+def test_recover_orders(tmp_path):
+    path = str(tmp_path / "orders.jsonl")
+    journal = OrderJournal(path)
+    assert journal.next_order_number is None
+    journal.append(order(7))
+    journal.append(order(5))
+    journal.close()
+    assert journaled(path) == [order(7), order(5)]
+    assert OrderJournal(path).next_order_number == 8
+
+
+def test_concurrent_appends_share_syncs(tmp_path, monkeypatch):
+    # Orders appended while a sync is pending are synced with it.
+    syncs = []
+    monkeypatch.setattr("os.fsync", syncs.append)
+    path = str(tmp_path / "orders.jsonl")
+    journal = OrderJournal(path, commit_window=0.05)
+    threads = [threading.Thread(target=journal.append, args=(order(n),)) for n in range(20)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    journal.close()
+    assert len(syncs) < 20
+    assert sorted(o.order_number for o in journaled(path)) == list(range(20))
+
+
+def test_torn_record_is_discarded(tmp_path):
+    path = tmp_path / "orders.jsonl"
+    path.write_text(order(1).to_json() + "\n" + order(2).to_json()[:10])
+    journal = OrderJournal(str(path))
+    assert journaled(str(path)) == [order(1)]
+    assert journal.next_order_number == 2
+    journal.append(order(2))
+    journal.close()
+    assert journaled(str(path)) == [order(1), order(2)]
+
+
+def test_corrupt_record(tmp_path):
+    path = tmp_path / "orders.jsonl"
+    path.write_text("garbage\n" + order(1).to_json() + "\n")
+    with raises(ValueError):
+        OrderJournal(str(path))
+
+
+def test_service_resumes_numbering(tmp_path):
+    path = str(tmp_path / "orders.jsonl")
+    journal = OrderJournal(path)
+    journal.append(order(500))
+    journal.close()
+    sink = RecordingSink()
+    service = CafeService(["Coffee"], fulfillment=FulfillmentQueue(sink), journal=OrderJournal(path))
+    assert service.place_order("abc", [0]) == 501
+    service.close()
+    assert OrderJournal(path).next_order_number == 502
+
+
+def test_submitted_orders_share_syncs(tmp_path, monkeypatch):
+    # Orders submitted without waiting for each other are synced together.
+    syncs = []
+    monkeypatch.setattr("os.fsync", syncs.append)
+    path = str(tmp_path / "orders.jsonl")
+    service = CafeService(["Coffee"], fulfillment=FulfillmentQueue(RecordingSink()),
+                          journal=OrderJournal(path, commit_window=0.05))
+    futures = [service.submit_order(f"token{n}", [0]) for n in range(10)]
+    assert len({future.result() for future in futures}) == 10
+    service.close()
+    assert len(syncs) < 10
@@ -0,0 +1,98 @@
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor
+
+from pytest import raises
+
+from cafe import (BlockOrderNumberAllocator, LocalOrderNumberAllocator, SharedOrderNumberAllocator,
+                  SnowflakeOrderNumberAllocator)
+from cafe.order_number_allocator import SNOWFLAKE_EPOCH
+
+
+def test_local_allocator_is_sequential():
+    allocator = LocalOrderNumberAllocator(100)
+    assert [allocator.allocate() for _ in range(3)] == [100, 101, 102]
+
+
+def test_local_allocator_with_many_threads():
+    # Numbers allocated concurrently by many threads must all be different.
+    allocator = LocalOrderNumberAllocator(1)
+    with ThreadPoolExecutor(8) as executor:
+        numbers = list(executor.map(lambda _: allocator.allocate(), range(2000)))
+    assert sorted(numbers) == list(range(1, 2001))
+
+
+def _allocate_many(allocator: SharedOrderNumberAllocator, count: int, results):
+    for _ in range(count):
+        results.put(allocator.allocate())
+
+
+def test_shared_allocator_with_many_processes():
+    # Numbers allocated by forked processes must all be different.
+    context = multiprocessing.get_context("fork")
+    allocator = SharedOrderNumberAllocator(1)
+    results = context.Queue()
+    processes = [context.Process(target=_allocate_many, args=(allocator, 200, results))
+                 for _ in range(4)]
+    for process in processes:
+        process.start()
+    numbers = [results.get() for _ in range(800)]
+    for process in processes:
+        process.join()
+    assert sorted(numbers) == list(range(1, 801))
+
+
+def test_snowflake_allocator_number_layout():
+    # Each number is the milliseconds since the epoch, then the node ID, then
+    # the sequence number within the millisecond.
+    now = (SNOWFLAKE_EPOCH + 5) / 1000
+    allocator = SnowflakeOrderNumberAllocator(3, node_bits=4, sequence_bits=2, clock=lambda: now)
+    numbers = [allocator.allocate() for _ in range(5)]
+    assert numbers[:4] == [5 << 6 | 3 << 2 | n for n in range(4)]
+    # once the sequence runs out, the next millisecond is borrowed
+    assert numbers[4] == 6 << 6 | 3 << 2
+
+
+def test_snowflake_allocator_clock_set_back():
+    times = iter([10.0, 10.5, 9.0])
+    allocator = SnowflakeOrderNumberAllocator(0, epoch=0, clock=lambda: next(times))
+    numbers = [allocator.allocate() for _ in range(3)]
+    assert numbers == sorted(numbers)
+    assert len(set(numbers)) == 3
+
+
+def test_snowflake_allocators_with_different_nodes():
+    first = SnowflakeOrderNumberAllocator(1)
+    second = SnowflakeOrderNumberAllocator(2)
+    with ThreadPoolExecutor(8) as executor:
+        numbers = list(executor.map(lambda n: (first if n % 2 else second).allocate(), range(4000)))
+    assert len(set(numbers)) == 4000
+
+
+def test_snowflake_allocator_node_id_range():
+    with raises(ValueError):
+        SnowflakeOrderNumberAllocator(1024)
+
+
+def test_block_allocator_leases_blocks():
+    blocks = LocalOrderNumberAllocator(7)
+    first = BlockOrderNumberAllocator(blocks, block_size=10)
+    second = BlockOrderNumberAllocator(blocks, block_size=10)
+    assert [first.allocate() for _ in range(3)] == [70, 71, 72]
+    assert second.allocate() == 80
+    assert [first.allocate() for _ in range(8)][-1] == 90
+
+
+def test_block_allocator_with_many_processes():
+    # A forked process leases its own blocks, even if its parent had one.
+    context = multiprocessing.get_context("fork")
+    allocator = BlockOrderNumberAllocator(SharedOrderNumberAllocator(0), block_size=16)
+    results = context.Queue()
+    first = allocator.allocate()
+    processes = [context.Process(target=_allocate_many, args=(allocator, 50, results))
+                 for _ in range(4)]
+    for process in processes:
+        process.start()
+    numbers = [results.get() for _ in range(200)] + [first]
+    for process in processes:
+        process.join()
+    assert len(set(numbers)) == 201
@@ -0,0 +1,74 @@
+import os
+import socket
+import time
+
+from pytest import mark
+
+from cafe import CafeSession, PreforkCafeServer, SocketCafeIO, WarmWorkerLauncher
+
+
+class PidSession(CafeSession):
+    """
+    A session that answers every request with OK followed by the ID of the
+    process serving it.
+    """
+    def __init__(self, io: SocketCafeIO):
+        self._io = io
+
+    @property
+    def done(self) -> bool:
+        return False
+
+    def serve_request(self, request: str):
+        self._io.write_string(f"OK {os.getpid()}")
+        self._io.flush()
+
+
+def _serving_pids(server: PreforkCafeServer, processes: int) -> set[str]:
+    # connects clients until each worker has served one, or for 10 seconds
+    pids = set()
+    deadline = time.monotonic() + 10
+    while len(pids) < processes and time.monotonic() < deadline:
+        try:
+            io = SocketCafeIO.connect("127.0.0.1", server.port, 10)
+        except ConnectionRefusedError:
+            # no worker is listening yet
+            time.sleep(0.05)
+            continue
+        try:
+            io.write_string("PID")
+            io.flush()
+            pids.add(io.read_string())
+        finally:
+            io.close()
+    return pids
+
+
+def test_launched_workers_serve_clients():
+    # Workers started from a launcher's template serve clients like forked ones.
+    launcher = WarmWorkerLauncher()
+    server = PreforkCafeServer(PidSession, "127.0.0.1", processes=2, threads_per_process=2,
+                               launcher=launcher)
+    server.start()
+    try:
+        pids = _serving_pids(server, 2)
+    finally:
+        server.close()
+    assert len(pids) == 2
+    assert f"OK {os.getpid()}" not in pids
+
+
+@mark.parametrize("reuse_port", [True, False])
+def test_forked_workers_serve_clients(monkeypatch, reuse_port: bool):
+    # Each of the worker processes accepts and serves clients on the one port,
+    # from a socket of its own or from one they inherit where there's no SO_REUSEPORT.
+    if not reuse_port:
+        monkeypatch.delattr(socket, "SO_REUSEPORT", raising=False)
+    server = PreforkCafeServer(PidSession, "127.0.0.1", processes=2, threads_per_process=2)
+    server.start()
+    try:
+        pids = _serving_pids(server, 2)
+    finally:
+        server.close()
+    assert len(pids) == 2
+    assert f"OK {os.getpid()}" not in pids
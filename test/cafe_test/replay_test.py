@@ -0,0 +1,118 @@
+import asyncio
+import secrets
+
+from cafe import AsyncCafeServer, CafeSession, CapturedExchange, CapturedSession
+from cafe.replay import Replayer, response_length, responses_match
+
+from .async_cafe_protocol_client_test import SCRIPT, ScriptedSession
+
+
+def test_response_length():
+    assert response_length("LIST MENU", "OK 2") == 2
+    assert response_length("list order", "OK 1") == 1
+    assert response_length("LIST MENU IF-NOT 3", "OK 2 VERSION 4") == 2
+    assert response_length("LIST MENU IF-NOT 3", "OK NOT-MODIFIED") == 0
+    assert response_length("LIST MENU", "ERROR busy") == 0
+    assert response_length("ADD 1", "OK 1") == 0
+
+
+def test_responses_match():
+    assert responses_match("ADD 1", ("OK order has 1 item(s)",), ("OK order has 1 item(s)",))
+    assert not responses_match("ADD 1", ("OK order has 1 item(s)",), ("OK order has 2 item(s)",))
+    # the server assigns order numbers, so only the status is compared
+    assert responses_match("COMMIT paid", ("OK 42",), ("OK 43",))
+    assert not responses_match("COMMIT paid", ("OK 42",), ("ERROR empty order",))
+
+
+def _replay(sessions: list[CapturedSession], script: dict[str, list[str]], speed: float,
+            session_factory=None) -> tuple:
+    async def main():
+        server = AsyncCafeServer(session_factory or (lambda io: ScriptedSession(io, script)), "127.0.0.1")
+        await server.start()
+        try:
+            replayer = Replayer("127.0.0.1", server.port, sessions, speed, verify=True)
+            return await replayer.run(), replayer.mismatches
+        finally:
+            await server.close()
+
+    return asyncio.run(main())
+
+
+SESSIONS = [
+    CapturedSession("1.0", (
+        CapturedExchange(0.0, "LIST MENU", ("OK 2", "0 Coffee", "1 Tea")),
+        CapturedExchange(0.1, "ADD 1", ("OK order has 1 item(s)",)),
+        CapturedExchange(0.2, "COMMIT paid", ("OK 41",)),
+    )),
+    CapturedSession("1.1", (
+        CapturedExchange(0.05, "ADD 7", ("ERROR invalid menu item 7",)),
+    )),
+]
+
+
+def test_replay():
+    summary, mismatches = _replay(SESSIONS, SCRIPT, speed=0.0)
+    assert summary["sessions"] == 2
+    assert summary["requests"] == 4
+    assert summary["errors"] == summary["mismatches"] == 0
+    assert mismatches == []
+
+
+def test_replay_keeps_recorded_pace():
+    # at twice the recorded speed, the last request is sent after 0.1 seconds
+    summary, _ = _replay(SESSIONS, SCRIPT, speed=2.0)
+    assert summary["elapsed_sec"] >= 0.1
+    assert summary["mismatches"] == 0
+
+
+def test_replay_reports_mismatches():
+    script = dict(SCRIPT, **{"LIST MENU": ["OK 1", "0 Coffee"]})
+    summary, mismatches = _replay(SESSIONS, script, speed=0.0)
+    assert summary["mismatches"] == 1
+    assert mismatches == [("1.0", "LIST MENU", ("OK 2", "0 Coffee", "1 Tea"), ("OK 1", "0 Coffee"))]
+
+
+class ResumableSession(CafeSession):
+    """
+    A session that issues a new token for each SESSION request, and accepts a
+    RESUME request with the token of a session that has ended.
+    """
+    def __init__(self, io, ended: set[str]):
+        self._io = io
+        self._ended = ended
+        self._token = None
+
+    @property
+    def done(self) -> bool:
+        return False
+
+    def serve_request(self, request: str):
+        verb, _, token = request.partition(" ")
+        if verb == "SESSION":
+            self._token = secrets.token_hex(8)
+            self._io.write_string(f"OK {self._token}")
+        elif verb == "RESUME" and token in self._ended:
+            self._io.write_string("OK order has 0 item(s)")
+        else:
+            self._io.write_string("ERROR unknown session")
+        self._io.flush()
+
+    def close(self):
+        if self._token is not None:
+            self._ended.add(self._token)
+
+
+def test_replay_resumes_with_replayed_tokens():
+    ended = set()
+    sessions = [
+        CapturedSession("1.0", (CapturedExchange(0.0, "SESSION", ("OK recorded-token",)),)),
+        CapturedSession("1.1", (
+            CapturedExchange(0.01, "RESUME recorded-token", ("OK order has 0 item(s)",)),
+        )),
+    ]
+    # at full speed both sessions start at once, so the RESUME must wait for the first to end
+    summary, mismatches = _replay(sessions, SCRIPT, speed=0.0,
+                                  session_factory=lambda io: ResumableSession(io, ended))
+    assert summary["requests"] == 2
+    assert summary["errors"] == 0
+    assert mismatches == []
@@ -0,0 +1,133 @@
+import os
+import socket
+
+from pytest import fixture, raises
+
+from cafe import BinaryCafeCodec, CafeProtocolServer, CafeService, SocketCafeIO
+
+
+# A connected pair of sockets lets us test the channel without a network.
+# The `io` fixture wraps one end; the test plays the peer using the other.
+@fixture
+def socket_pair():
+    a, b = socket.socketpair()
+    yield a, b
+    a.close()
+    b.close()
+
+
+@fixture
+def io(socket_pair):
+    return SocketCafeIO(socket_pair[0], buffer_size=8)
+
+
+@fixture
+def peer(socket_pair):
+    return socket_pair[1]
+
+
+def test_read_string_splits_lines(io: SocketCafeIO, peer: socket.socket):
+    # Several lines arriving in one chunk should be returned one at a time,
+    # with whitespace removed and blank lines skipped.
+    peer.sendall(b"LIST MENU\r\n\n  ADD 4  \n")
+    assert io.read_string() == "LIST MENU"
+    assert io.read_string() == "ADD 4"
+
+
+def test_read_string_longer_than_buffer(io: SocketCafeIO, peer: socket.socket):
+    # A line longer than the initial read buffer should still be read intact.
+    peer.sendall(b"COMMIT 0123456789abcdef\n")
+    assert io.read_string() == "COMMIT 0123456789abcdef"
+
+
+def test_read_string_at_end_of_stream(io: SocketCafeIO, peer: socket.socket):
+    peer.sendall(b"CANCEL")
+    peer.shutdown(socket.SHUT_WR)
+    with raises(EOFError):
+        io.read_string()
+
+
+def test_write_string_is_buffered_until_flush(io: SocketCafeIO, peer: socket.socket):
+    # Nothing should reach the peer until the response is flushed, and then
+    # all the lines should arrive together.
+    io.write_string("OK 2")
+    io.write_string("0 Coffee")
+    io.write_string("1 Water")
+    peer.setblocking(False)
+    with raises(BlockingIOError):
+        peer.recv(1024)
+    io.flush()
+    peer.setblocking(True)
+    assert peer.recv(1024) == b"OK 2\n0 Coffee\n1 Water\n"
+
+
+def test_codec_switch_after_flush(socket_pair, peer: socket.socket):
+    # Input that arrived with a request to switch codecs must be framed using
+    # the new codec.
+    io = SocketCafeIO(socket_pair[0])
+    io.set_timeout(5)
+    binary = BinaryCafeCodec()
+    frame = bytearray()
+    binary.encode("ADD 4", frame)
+    peer.sendall(b"CODEC BINARY\n" + frame)
+    assert io.read_string() == "CODEC BINARY"
+    io.write_string("OK BINARY")
+    io.flush()
+    io.set_codec(binary)
+    assert io.read_string() == "ADD 4"
+
+
+def test_write_empty_string(io: SocketCafeIO):
+    with raises(ValueError):
+        io.write_string("")
+
+
+def test_menu_response_is_encoded_once(io: SocketCafeIO, peer: socket.socket):
+    # Channels with the same encoding share the menu's encoded response, and
+    # replacing the menu with a new version discards it.
+    service = CafeService(["Coffee", "Tea"])
+    other = SocketCafeIO(peer)
+    menu = service.menu()
+    CafeProtocolServer(None, io).send_menu_response(menu)
+    io.flush()
+    block = menu.encoded_response(("LIST MENU", False, io.block_key()))
+    assert block == b"OK 2\n0 Coffee\n1 Tea\n"
+    assert other.read_string() == "OK 2"
+    CafeProtocolServer(None, other).send_menu_response(menu)
+    assert menu.encoded_response(("LIST MENU", False, other.block_key())) is block
+    updated = service.update_menu(["Coffee", "Tea", "Juice"])
+    assert updated.version == menu.version + 1
+    assert service.menu() is updated
+    assert updated.encoded_response(("LIST MENU", False, io.block_key())) is None
+
+
+
+def test_is_idle(io: SocketCafeIO, peer: socket.socket):
+    # A connection is idle until something arrives from the peer, or it closes.
+    assert io.is_idle()
+    peer.sendall(b"OK\n")
+    assert not io.is_idle()
+    assert io.read_string() == "OK"
+    assert io.is_idle()
+    peer.close()
+    assert not io.is_idle()
+
+
+def test_message_too_long(socket_pair, peer: socket.socket):
+    io = SocketCafeIO(socket_pair[0], buffer_size=8, max_message_size=16)
+    peer.sendall(b"COMMIT " + b"x" * 32)
+    with raises(ValueError):
+        io.read_string()
+
+
+def test_is_idle_with_high_descriptor(peer: socket.socket, socket_pair):
+    # A connection whose descriptor is beyond select's FD_SETSIZE can be checked.
+    high = os.dup2(socket_pair[0].fileno(), 1500)
+    io = SocketCafeIO(socket.socket(fileno=high))
+    try:
+        assert io.is_idle()
+        peer.sendall(b"OK\n")
+        assert not io.is_idle()
+        assert io.read_string() == "OK"
+    finally:
+        io.close()
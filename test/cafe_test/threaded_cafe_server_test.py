@@ -0,0 +1,61 @@
+import threading
+
+from pytest import fixture
+
+from cafe import CafeProtocolClient, CafeSession, SocketCafeIO, ThreadedCafeServer
+
+
+class EchoSession(CafeSession):
+    """
+    A trivial session that answers every request with OK followed by the request,
+    and is done after a CANCEL request.
+    """
+    def __init__(self, io: SocketCafeIO):
+        self._io = io
+        self._done = False
+
+    @property
+    def done(self) -> bool:
+        return self._done
+
+    def serve_request(self, request: str):
+        self._io.write_string(f"OK {request}")
+        self._io.flush()
+        self._done = request == "CANCEL"
+
+
+@fixture
+def server():
+    server = ThreadedCafeServer(EchoSession, "127.0.0.1", max_workers=4)
+    server.start()
+    thread = threading.Thread(target=server.serve_forever, args=(0.05,))
+    thread.start()
+    yield server
+    server.close()
+    thread.join()
+
+
+def _exchange(io: SocketCafeIO, request: str) -> str:
+    io.write_string(request)
+    io.flush()
+    return io.read_string()
+
+
+def test_serves_concurrent_sessions(server: ThreadedCafeServer):
+    first = SocketCafeIO.connect("127.0.0.1", server.port)
+    second = SocketCafeIO.connect("127.0.0.1", server.port)
+    assert _exchange(second, "LIST MENU") == "OK LIST MENU"
+    assert _exchange(first, "LIST ORDER") == "OK LIST ORDER"
+    assert _exchange(first, "CANCEL") == "OK CANCEL"
+    assert _exchange(second, "CANCEL") == "OK CANCEL"
+    first.close()
+    second.close()
+
+
+def test_serves_pipelined_requests(server: ThreadedCafeServer):
+    # Requests that arrive back to back should each be served, in order.
+    io = SocketCafeIO.connect("127.0.0.1", server.port)
+    client = CafeProtocolClient(io)
+    results = client.pipeline().add(3).add(5).cancel().execute()
+    assert results == ["ADD 3", "ADD 5", "CANCEL"]
+    io.close()
@@ -0,0 +1,121 @@
+import os
+
+from pytest import raises
+
+from cafe import (CafeConnection, CafeServerConnection, CapturedExchange, RecordingCafeIO, TrafficRecorder,
+                  read_capture)
+from cafe.traffic_capture import CAPTURE_HEADER
+
+from .async_cafe_protocol_client_test import SCRIPT, ScriptedSession
+from .cafe_metrics_test import FakeClock
+
+
+def _serve(connection: CafeServerConnection, *requests: str):
+    connection.receive_data("".join(request + "\n" for request in requests).encode())
+    while connection.serve_next_request():
+        pass
+
+
+def test_records_sessions(tmp_path):
+    path = str(tmp_path / "capture.txt")
+    recorder = TrafficRecorder(path, FakeClock(0.5), redact=False)
+    create_session = recorder.wrap_session_factory(lambda io: ScriptedSession(io, SCRIPT))
+    first = CafeServerConnection(create_session)
+    second = CafeServerConnection(create_session)
+    _serve(first, "LIST MENU")
+    _serve(second, "ADD 7")
+    _serve(first, "ADD 1", "COMMIT paid")
+    # the session's responses are still sent to the client
+    assert first.data_to_send() == b"OK 2\n0 Coffee\n1 Tea\nOK order has 1 item(s)\nOK 42\n"
+    first.close()
+    second.close()
+    recorder.close()
+
+    first_session, second_session = read_capture(path)
+    assert first_session.exchanges == (
+        CapturedExchange(0.5, "LIST MENU", ("OK 2", "0 Coffee", "1 Tea")),
+        CapturedExchange(2.5, "ADD 1", ("OK order has 1 item(s)",)),
+        CapturedExchange(3.5, "COMMIT paid", ("OK 42",)),
+    )
+    assert second_session.exchanges == (CapturedExchange(1.5, "ADD 7", ("ERROR invalid menu item 7",)),)
+    assert first_session.session_id != second_session.session_id
+
+
+def test_records_requests_read(tmp_path):
+    path = str(tmp_path / "capture.txt")
+    recorder = TrafficRecorder(path, FakeClock(1.0))
+    connection = CafeConnection()
+    io = RecordingCafeIO(connection, recorder, "s1")
+    connection.receive_data(b"LIST ORDER\n")
+    assert io.read_string() == "LIST ORDER"
+    io.write_string("OK 0")
+    io.flush()
+    # anything else is passed through to the channel
+    assert io.bytes_received == 11
+    assert connection.data_to_send() == b"OK 0\n"
+    recorder.close()
+    with open(path) as f:
+        assert f.read() == f"{CAPTURE_HEADER}\ns1 1000000 > LIST ORDER\ns1 2000000 < OK 0\n"
+
+
+def test_redacts_tokens(tmp_path):
+    path = str(tmp_path / "capture.txt")
+    script = dict(SCRIPT, SESSION=["OK secret-session"], **{"RESUME secret-session": ["OK order has 0 item(s)"],
+                                                            "commit secret-card": ["OK 42"]})
+    recorder = TrafficRecorder(path, FakeClock(0.5))
+    create_session = recorder.wrap_session_factory(lambda io: ScriptedSession(io, script))
+    first = CafeServerConnection(create_session)
+    second = CafeServerConnection(create_session)
+    _serve(first, "SESSION", "LIST ORDER", "commit secret-card")
+    _serve(second, "RESUME secret-session")
+    # the client still gets the token
+    assert first.data_to_send().startswith(b"OK secret-session\n")
+    first.close()
+    second.close()
+    recorder.close()
+
+    with open(path) as f:
+        assert "secret" not in f.read()
+    first_session, second_session = read_capture(path)
+    session, list_order, commit = first_session.exchanges
+    pseudonym = session.response[0].split()[1]
+    assert session.request == "SESSION" and session.response[0].startswith("OK ")
+    assert list_order.response == ("OK 1", "0 1 2")
+    assert commit.request.startswith("commit ") and commit.response == ("OK 42",)
+    # a token gets the same pseudonym wherever it appears
+    assert second_session.exchanges[0].request == f"RESUME {pseudonym}"
+
+
+def test_records_forked_sessions(tmp_path):
+    # Sessions in worker processes append their records to the same file.
+    path = str(tmp_path / "capture.txt")
+    recorder = TrafficRecorder(path)
+    create_session = recorder.wrap_session_factory(lambda io: ScriptedSession(io, SCRIPT))
+    pids = []
+    for _ in range(2):
+        pid = os.fork()
+        if pid == 0:
+            connection = CafeServerConnection(create_session)
+            _serve(connection, "LIST ORDER")
+            connection.close()
+            os._exit(0)
+        pids.append(pid)
+    for pid in pids:
+        os.waitpid(pid, 0)
+    recorder.close()
+    sessions = read_capture(path)
+    assert sorted(session.session_id.split(".")[0] for session in sessions) == sorted(map(str, pids))
+    assert all(session.exchanges[0].response == ("OK 1", "0 1 2") for session in sessions)
+
+
+def test_read_capture_rejects_malformed_files(tmp_path):
+    path = tmp_path / "capture.txt"
+    path.write_text("LIST MENU\n")
+    with raises(ValueError):
+        read_capture(str(path))
+    path.write_text(f"{CAPTURE_HEADER}\ns1 10 < OK 0\n")
+    with raises(ValueError):
+        read_capture(str(path))
+    path.write_text(f"{CAPTURE_HEADER}\ns1 soon > LIST MENU\n")
+    with raises(ValueError):
+        read_capture(str(path))
@@ -0,0 +1,23 @@
+import time
+
+from pytest import skip
+
+from cafe import WarmWorkerLauncher
+
+
+def test_launch():
+    launcher = WarmWorkerLauncher()
+    launcher.start()
+    process = launcher.launch(time.sleep, 0, name="cafe-worker")
+    process.join(10)
+    assert process.exitcode == 0
+
+
+def test_worker_starts_with_preloaded_modules():
+    # A worker forked from the template has the preloaded modules without importing them.
+    launcher = WarmWorkerLauncher()
+    if launcher.start_method != "forkserver":
+        skip("workers are spawned on this platform")
+    process = launcher.launch(exec, "import sys; sys.exit('cafe.cafe_service' not in sys.modules)")
+    process.join(10)
+    assert process.exitcode == 0
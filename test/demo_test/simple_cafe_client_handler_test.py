@@ -0,0 +1,197 @@
+from concurrent.futures import wait
+
+from cafe import (CafeMenuItem, CafeMetrics, CafeServerConnection, CafeService, CafeServiceRouter, CafeSessionStore, ComboRule,
+                  FulfillmentQueue, LocalOrderNumberAllocator, QuantityDiscount)
+from demo.simple_cafe_client_handler import SimpleCafeOrderHandler
+
+from cafe_test.fulfillment_queue_test import RecordingSink
+
+MENU = [CafeMenuItem(0, "Hamburger", 599), CafeMenuItem(1, "Chips", 199), CafeMenuItem(2, "Fountain Drink", 199),
+        CafeMenuItem(3, "Coffee", 229)]
+COMBOS = [ComboRule("Burger Meal", (0, 1, 2), 849)]
+DISCOUNTS = [QuantityDiscount(3, 10, 10)]
+
+
+class Client:
+    """
+    Drives a demo handler the way the servers do, through a `CafeServerConnection`,
+    without a socket.
+    """
+    def __init__(self, service: CafeService, session_store: CafeSessionStore = None,
+                 router: CafeServiceRouter = None, metrics: CafeMetrics = None):
+        self.connection = CafeServerConnection(
+            lambda io: SimpleCafeOrderHandler(io, service, session_store, metrics, router))
+
+    def request(self, request: str) -> list[str]:
+        connection = self.connection
+        connection.receive_data(request.encode() + b"\n")
+        while connection.serve_next_request() or connection.pending is not None:
+            if connection.pending is not None:
+                # as a server does once the request's work is done
+                wait((connection.pending,))
+                connection.complete_pending()
+        return connection.data_to_send().decode().splitlines()
+
+    def close(self):
+        self.connection.close()
+
+
+def _service(items: list[CafeMenuItem], first_order_number: int, sink: RecordingSink) -> CafeService:
+    return CafeService(items, LocalOrderNumberAllocator(first_order_number), FulfillmentQueue(sink),
+                       combos=COMBOS, discounts=DISCOUNTS)
+
+
+def test_total():
+    # The total follows every change to the order, and goes with it to fulfillment.
+    sink = RecordingSink()
+    service = _service(MENU, 100, sink)
+    client = Client(service)
+    assert client.request("TOTAL") == ["OK 0"]
+    assert client.request("ADD 0 1 2") == ["OK order has 3 item(s)"]
+    assert client.request("TOTAL") == ["OK 849"]
+    assert client.request("ADD " + " ".join(["3"] * 10)) == ["OK order has 13 item(s)"]
+    assert client.request("TOTAL") == ["OK 2909"]
+    assert client.request("REMOVE 1") == ["OK removed item 1"]
+    assert client.request("TOTAL") == ["OK 2858"]
+    assert client.request("COMMIT paid") == ["OK 100"]
+    assert client.connection.done
+    service.close()
+    [[order]] = sink.batches
+    assert order.total == 2858
+
+
+def test_add_items_is_atomic():
+    # A batch with an invalid item adds nothing.
+    service = _service(MENU, 100, RecordingSink())
+    client = Client(service)
+    assert client.request("ADD 0 9 1") == ["ERROR menu item 9 does not exist"]
+    assert client.request("LIST ORDER") == ["OK 0"]
+    assert client.request("TOTAL") == ["OK 0"]
+    assert client.request("ADD 0 1") == ["OK order has 2 item(s)"]
+    assert client.request("REMOVE 0 5") == ["ERROR order item 5 does not exist"]
+    assert client.request("LIST ORDER") == ["OK 2", "0 0 1", "1 1 1"]
+    service.close()
+
+
+def test_location():
+    sink = RecordingSink()
+    router = CafeServiceRouter({
+        "a": _service([CafeMenuItem(0, "Coffee", 200)], 100, sink),
+        "b": _service([CafeMenuItem(0, "Tea", 300)], 200, sink),
+    })
+    client = Client(router.service(), router=router)
+    assert client.request("LOCATION c") == ["ERROR unknown location c"]
+    assert client.request("LOCATION b") == ["OK b"]
+    assert client.request("LIST MENU") == ["OK 1", "0 Tea"]
+    assert client.request("ADD 0") == ["OK order has 1 item(s)"]
+    assert client.request("LOCATION a") == ["ERROR order already started"]
+    assert client.request("COMMIT paid") == ["OK 200"]
+    router.close()
+    [[order]] = sink.batches
+    assert order.total == 300
+
+
+def test_session_resume():
+    # An interrupted order is resumed on a new connection, and only once.
+    sink = RecordingSink()
+    service = _service(MENU, 100, sink)
+    store = CafeSessionStore()
+    first = Client(service, store)
+    token = first.request("SESSION")[0].split()[1]
+    assert first.request("ADD 0 1 2") == ["OK order has 3 item(s)"]
+    first.close()
+
+    second = Client(service, store)
+    assert second.request("RESUME unknown") == ["ERROR unknown or expired session"]
+    assert second.request(f"RESUME {token}") == ["OK order has 3 item(s)"]
+    assert second.request("TOTAL") == ["OK 849"]
+    assert Client(service, store).request(f"RESUME {token}") == ["ERROR unknown or expired session"]
+    assert second.request("COMMIT paid") == ["OK 100"]
+    service.close()
+    [[order]] = sink.batches
+    assert order.total == 849
+
+
+def test_sessions_without_store():
+    # Without a session store, sessions can't be resumed, so both verbs are refused.
+    service = _service(MENU, 100, RecordingSink())
+    client = Client(service)
+    assert client.request("SESSION") == ["ERROR unsupported SESSION request"]
+    assert client.request("RESUME token") == ["ERROR unsupported RESUME request"]
+    service.close()
+
+
+def test_location_without_router():
+    # A handler without a router serves only its own service's location.
+    service = _service(MENU, 100, RecordingSink())
+    assert Client(service).request("LOCATION b") == ["ERROR unsupported LOCATION request"]
+    service.close()
+
+
+def test_resume_at_location():
+    # A resumed order is priced and committed at the location where it was started.
+    sink = RecordingSink()
+    router = CafeServiceRouter({
+        "a": _service([CafeMenuItem(0, "Coffee", 200)], 100, sink),
+        "b": _service([CafeMenuItem(0, "Tea", 300)], 200, sink),
+    })
+    store = CafeSessionStore()
+    first = Client(router.service(), store, router)
+    assert first.request("LOCATION b") == ["OK b"]
+    token = first.request("SESSION")[0].split()[1]
+    assert first.request("ADD 0 0 0") == ["OK order has 3 item(s)"]
+    assert first.request("TOTAL") == ["OK 900"]
+    first.close()
+
+    second = Client(router.service(), store, router)
+    assert second.request(f"RESUME {token}") == ["OK order has 3 item(s)"]
+    assert second.request("TOTAL") == ["OK 900"]
+    assert second.request("COMMIT paid") == ["OK 200"]
+    router.close()
+    [[order]] = sink.batches
+    assert order.total == 900
+    assert [item.label for item in order.items] == ["Tea"] * 3
+
+
+def test_menu_version_identifies_the_menu():
+    # A restarted server (or another worker) with a different menu never answers
+    # a client's cached version with NOT-MODIFIED, and one with the same menu does.
+    sink = RecordingSink()
+    first = _service(MENU, 100, sink)
+    [header, *_] = Client(first).request("LIST MENU IF-NOT 0")
+    version = header.split()[3]
+    assert header.startswith("OK 4 VERSION ")
+    restarted = _service([CafeMenuItem(0, "Tofu Bowl", 899), CafeMenuItem(1, "Soup", 499)], 100, sink)
+    assert Client(restarted).request(f"LIST MENU IF-NOT {version}")[:3] == [
+        f"OK 2 VERSION {restarted.menu().etag}", "0 Tofu Bowl", "1 Soup"]
+    same = _service(MENU, 100, sink)
+    assert Client(same).request(f"LIST MENU IF-NOT {version}") == ["OK NOT-MODIFIED"]
+    for service in (first, restarted, same):
+        service.close()
+
+
+class FailingJournal:
+    """
+    A journal that can't record any order.
+    """
+    next_order_number = None
+
+    def append(self, order):
+        raise OSError("disk full")
+
+    def close(self):
+        pass
+
+
+def test_failed_commit_is_counted():
+    # A commit whose response is deferred is recorded once the response is sent.
+    metrics = CafeMetrics()
+    service = CafeService(MENU, LocalOrderNumberAllocator(100), FulfillmentQueue(RecordingSink()),
+                          journal=FailingJournal())
+    client = Client(service, metrics=metrics)
+    assert client.request("ADD 0") == ["OK order has 1 item(s)"]
+    assert client.request("COMMIT paid") == ["ERROR order could not be recorded"]
+    client.close()
+    service.close()
+    commit = metrics.snapshot()["verbs"]["COMMIT"]
+    assert commit["requests"] == commit["errors"] == 1